@@ -68,6 +68,7 @@ grant CREATE INTEGRATION on account to role {{ env.EVENT_ATTENDEE_ROLE }};
 grant CREATE APPLICATION PACKAGE on account to role {{ env.EVENT_ATTENDEE_ROLE }};
 grant CREATE APPLICATION on account to role {{ env.EVENT_ATTENDEE_ROLE }};
 grant IMPORT SHARE on account to role {{ env.EVENT_ATTENDEE_ROLE }};
+grant EXECUTE TASK on account to role {{ env.EVENT_ATTENDEE_ROLE }};
 
 -- Create the users
 use role USERADMIN;
@@ -715,6 +716,495 @@ INSERT INTO {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_DOCUMENTAT
 'green,energy,efficiency,sustainability,renewable,carbon', CURRENT_DATE() - 52);
 
 
+-- 7. TIME ROLLUP PYRAMID
+-- Mergeable aggregates (count, sum, min, max, sum of squares, percentile sketch) of the
+-- network KPIs at 1-minute, 15-minute, hourly and daily resolution. The 1-minute level
+-- reads the raw table; each coarser level merges the level below it. The apps query the
+-- coarsest level that satisfies the requested resolution (streamlit/shared/time_pyramid.py).
+{% set rollup_sources = [
+    {"table": "NETWORK_PERFORMANCE", "time": "MEASUREMENT_TIMESTAMP",
+     "dimensions": ["REGION", "NETWORK_TYPE"],
+     "metrics": ["LATENCY_MS", "THROUGHPUT_MBPS", "PACKET_LOSS_PERCENT", "UPTIME_PERCENT"]},
+    {"table": "SERVICE_QUALITY_METRICS", "time": "QUALITY_MEASUREMENT_TIME",
+     "dimensions": ["SERVICE_TYPE", "GEOGRAPHIC_AREA"],
+     "metrics": ["CALL_DROP_RATE", "DATA_SUCCESS_RATE", "CUSTOMER_SATISFACTION_SCORE"]}
+] %}
+{% set rollup_levels = [
+    {"suffix": "1M", "seconds": 60, "lag": "1 minute"},
+    {"suffix": "15M", "seconds": 900, "lag": "15 minutes"},
+    {"suffix": "1H", "seconds": 3600, "lag": "1 hour"},
+    {"suffix": "1D", "seconds": 86400, "lag": "1 hour"}
+] %}
+{%- for source in rollup_sources %}
+{%- for level in rollup_levels %}
+{%- set finer = rollup_levels[loop.index0 - 1] %}
+CREATE OR REPLACE DYNAMIC TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.{{ source.table }}_ROLLUP_{{ level.suffix }}
+    TARGET_LAG = '{{ level.lag }}'
+    WAREHOUSE = {{ env.EVENT_WAREHOUSE }}
+AS
+{%- if loop.first %}
+SELECT
+    TIME_SLICE({{ source.time }}, {{ level.seconds }}, 'SECOND') AS BUCKET_START,
+    {{ source.dimensions | join(', ') }},
+{%- for metric in source.metrics %}
+    COUNT({{ metric }}) AS {{ metric }}_N,
+    SUM({{ metric }}) AS {{ metric }}_SUM,
+    MIN({{ metric }}) AS {{ metric }}_MIN,
+    MAX({{ metric }}) AS {{ metric }}_MAX,
+    SUM(SQUARE({{ metric }})) AS {{ metric }}_SUMSQ,
+    APPROX_PERCENTILE_ACCUMULATE({{ metric }}) AS {{ metric }}_SKETCH{{ ',' if not loop.last }}
+{%- endfor %}
+FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.{{ source.table }}
+{%- else %}
+SELECT
+    TIME_SLICE(BUCKET_START, {{ level.seconds }}, 'SECOND') AS BUCKET_START,
+    {{ source.dimensions | join(', ') }},
+{%- for metric in source.metrics %}
+    SUM({{ metric }}_N) AS {{ metric }}_N,
+    SUM({{ metric }}_SUM) AS {{ metric }}_SUM,
+    MIN({{ metric }}_MIN) AS {{ metric }}_MIN,
+    MAX({{ metric }}_MAX) AS {{ metric }}_MAX,
+    SUM({{ metric }}_SUMSQ) AS {{ metric }}_SUMSQ,
+    APPROX_PERCENTILE_COMBINE({{ metric }}_SKETCH) AS {{ metric }}_SKETCH{{ ',' if not loop.last }}
+{%- endfor %}
+FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.{{ source.table }}_ROLLUP_{{ finer.suffix }}
+{%- endif %}
+GROUP BY ALL;
+{% endfor %}
+{%- endfor %}
+
+-- 8. INCIDENT KPI IMPACT
+-- Mean network KPIs of the affected region in the 24 hours before each incident and while
+-- it lasted (still-open incidents run until now), read from the 15-minute rollup. Precomputed
+-- for the semantic model; the network ops app computes the same deltas in-process
+-- (streamlit/shared/incident_correlation.py).
+CREATE OR REPLACE DYNAMIC TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.INCIDENT_KPI_IMPACT
+    TARGET_LAG = '15 minutes'
+    WAREHOUSE = {{ env.EVENT_WAREHOUSE }}
+    REFRESH_MODE = FULL
+AS
+SELECT
+    i.INCIDENT_ID,
+    i.INCIDENT_TYPE,
+    i.SEVERITY_LEVEL,
+    i.AFFECTED_REGION,
+    i.INCIDENT_START_TIME,
+    i.INCIDENT_END_TIME,
+    i.INCIDENT_END_TIME IS NULL AS IS_OPEN,
+    i.CUSTOMERS_AFFECTED,
+{%- for metric in rollup_sources[0].metrics %}
+    SUM(IFF(r.BUCKET_START < i.INCIDENT_START_TIME, r.{{ metric }}_SUM, 0))
+        / NULLIF(SUM(IFF(r.BUCKET_START < i.INCIDENT_START_TIME, r.{{ metric }}_N, 0)), 0) AS {{ metric }}_BEFORE,
+    SUM(IFF(r.BUCKET_START >= i.INCIDENT_START_TIME, r.{{ metric }}_SUM, 0))
+        / NULLIF(SUM(IFF(r.BUCKET_START >= i.INCIDENT_START_TIME, r.{{ metric }}_N, 0)), 0) AS {{ metric }}_DURING,
+    {{ metric }}_DURING - {{ metric }}_BEFORE AS {{ metric }}_DELTA{{ ',' if not loop.last }}
+{%- endfor %}
+FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS i
+LEFT JOIN {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_PERFORMANCE_ROLLUP_15M r
+    ON r.REGION = i.AFFECTED_REGION
+    AND r.BUCKET_START >= DATEADD(hour, -24, i.INCIDENT_START_TIME)
+    AND r.BUCKET_START < COALESCE(i.INCIDENT_END_TIME, CURRENT_TIMESTAMP())
+GROUP BY ALL;
+
+-- 9. ACTIVE ALERT FEED
+-- ACTIVE_ALERTS holds the open incidents. A task consumes a stream on NETWORK_INCIDENTS and
+-- merges the changes into it, bumping ALERT_FEED_STATE.VERSION in the same transaction. The
+-- apps poll the one-row version and reload the alerts only when it moves
+-- (streamlit/shared/alert_feed.py).
+CREATE OR REPLACE TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.ACTIVE_ALERTS AS
+SELECT INCIDENT_ID, INCIDENT_TYPE, SEVERITY_LEVEL, AFFECTED_REGION, INCIDENT_START_TIME, CUSTOMERS_AFFECTED
+FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS
+WHERE INCIDENT_END_TIME IS NULL;
+
+CREATE OR REPLACE TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.ALERT_FEED_STATE (
+    VERSION INTEGER,
+    UPDATED_AT TIMESTAMP_NTZ
+);
+
+INSERT INTO {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.ALERT_FEED_STATE VALUES (1, CURRENT_TIMESTAMP());
+
+CREATE OR REPLACE STREAM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_STREAM
+    ON TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS;
+
+CREATE OR REPLACE TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_ACTIVE_ALERTS
+    WAREHOUSE = {{ env.EVENT_WAREHOUSE }}
+    SCHEDULE = '1 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('{{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_STREAM')
+AS
+EXECUTE IMMEDIATE $$
+    BEGIN
+        BEGIN TRANSACTION;
+        -- Updates arrive as a DELETE/INSERT pair; keep the new image and real deletes
+        MERGE INTO {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.ACTIVE_ALERTS a
+        USING (
+            SELECT *, METADATA$ACTION AS CHANGE_ACTION
+            FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_STREAM
+            WHERE NOT (METADATA$ACTION = 'DELETE' AND METADATA$ISUPDATE)
+        ) c
+        ON a.INCIDENT_ID = c.INCIDENT_ID
+        WHEN MATCHED AND (c.CHANGE_ACTION = 'DELETE' OR c.INCIDENT_END_TIME IS NOT NULL) THEN DELETE
+        WHEN MATCHED THEN UPDATE SET
+            INCIDENT_TYPE = c.INCIDENT_TYPE,
+            SEVERITY_LEVEL = c.SEVERITY_LEVEL,
+            AFFECTED_REGION = c.AFFECTED_REGION,
+            INCIDENT_START_TIME = c.INCIDENT_START_TIME,
+            CUSTOMERS_AFFECTED = c.CUSTOMERS_AFFECTED
+        WHEN NOT MATCHED AND c.CHANGE_ACTION = 'INSERT' AND c.INCIDENT_END_TIME IS NULL THEN INSERT
+            (INCIDENT_ID, INCIDENT_TYPE, SEVERITY_LEVEL, AFFECTED_REGION, INCIDENT_START_TIME, CUSTOMERS_AFFECTED)
+            VALUES (c.INCIDENT_ID, c.INCIDENT_TYPE, c.SEVERITY_LEVEL, c.AFFECTED_REGION, c.INCIDENT_START_TIME, c.CUSTOMERS_AFFECTED);
+        UPDATE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.ALERT_FEED_STATE
+            SET VERSION = VERSION + 1, UPDATED_AT = CURRENT_TIMESTAMP();
+        COMMIT;
+    END;
+$$
+;
+
+ALTER TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_ACTIVE_ALERTS RESUME;
+
+-- 10. PHYSICAL LAYOUT
+-- Clustering keys on the time and region columns the app queries filter on, and search
+-- optimization for point lookups. Per table, an empty cluster_by or search_optimization
+-- leaves it out. Search optimization needs Enterprise Edition; without it the block returns
+-- a message and the deployment carries on. streamlit/tools/pruning_benchmark.py applies the
+-- same layouts to a generated large dataset and reports partition pruning before and after.
+{% set table_layouts = [
+    {"table": "NETWORK_PERFORMANCE", "cluster_by": "TO_DATE(MEASUREMENT_TIMESTAMP), REGION",
+     "search_optimization": "EQUALITY(CELL_TOWER_ID)"},
+    {"table": "CUSTOMER_USAGE", "cluster_by": "USAGE_DATE",
+     "search_optimization": "EQUALITY(CUSTOMER_ID)"},
+    {"table": "SERVICE_QUALITY_METRICS", "cluster_by": "TO_DATE(QUALITY_MEASUREMENT_TIME), GEOGRAPHIC_AREA",
+     "search_optimization": ""},
+    {"table": "NETWORK_INCIDENTS", "cluster_by": "TO_DATE(INCIDENT_START_TIME), AFFECTED_REGION",
+     "search_optimization": ""},
+    {"table": "NETWORK_DOCUMENTATION", "cluster_by": "",
+     "search_optimization": "EQUALITY(DOCUMENT_ID)"}
+] %}
+{%- for layout in table_layouts %}
+{%- if layout.cluster_by %}
+ALTER TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.{{ layout.table }} CLUSTER BY ({{ layout.cluster_by }});
+{%- endif %}
+{%- if layout.search_optimization %}
+EXECUTE IMMEDIATE $$
+    BEGIN
+        ALTER TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.{{ layout.table }}
+            ADD SEARCH OPTIMIZATION ON {{ layout.search_optimization }};
+        RETURN 'search optimization added to {{ layout.table }}';
+    EXCEPTION
+        WHEN OTHER THEN
+            RETURN 'search optimization not available for {{ layout.table }}: ' || SQLERRM;
+    END;
+$$
+;
+{%- endif %}
+{% endfor %}
+
+-- 11. CONVERSATION HISTORY
+-- One row per answered chat turn from the three apps. The apps queue the turns in memory and
+-- insert them in batches from a background thread, and restore a conversation from here
+-- after a reload (streamlit/shared/conversation_log.py). Kept across redeployments.
+CREATE TABLE IF NOT EXISTS {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CONVERSATION_HISTORY (
+    APP VARCHAR,
+    CONVERSATION_ID VARCHAR,
+    TURN INTEGER,
+    USER_NAME VARCHAR,
+    QUESTION VARCHAR,
+    ANSWER VARCHAR,
+    SQL_TEXT VARCHAR,
+    MODEL VARCHAR,
+    ROUTE VARCHAR,
+    AGENT_MS FLOAT,
+    ANSWER_MS FLOAT,
+    ASKED_AT TIMESTAMP_NTZ
+);
+
+-- 12. RESULT EXPORTS
+-- The apps' result grid copies a filtered and sorted query result into this stage with COPY INTO
+-- from RESULT_SCAN and hands out a presigned URL, so that large exports never pass through the
+-- app (streamlit/shared/result_grid.py). Presigned URLs need server-side encryption.
+CREATE STAGE IF NOT EXISTS {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.RESULT_EXPORTS
+    ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE')
+    COMMENT = 'Query result exports from the Streamlit apps';
+
+-- 13. USAGE METERING
+-- One row per agent call, Cortex Complete call and warehouse query of the three apps, with the
+-- user and Streamlit session it served: tokens in and out (estimated from the text when the
+-- response reports none), query ID, bytes scanned, elapsed time and estimated credits. The apps
+-- insert the rows in batches from a background thread and budget each user's and the app's
+-- hourly spend in memory (streamlit/shared/usage_meter.py). Kept across redeployments.
+CREATE TABLE IF NOT EXISTS {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.USAGE_METERING (
+    APP VARCHAR,
+    USER_NAME VARCHAR,
+    SESSION_ID VARCHAR,
+    KIND VARCHAR,
+    MODEL VARCHAR,
+    TOKENS_IN INTEGER,
+    TOKENS_OUT INTEGER,
+    TOKENS_ESTIMATED BOOLEAN,
+    QUERY_ID VARCHAR,
+    BYTES_SCANNED INTEGER,
+    ELAPSED_MS FLOAT,
+    CREDITS FLOAT,
+    RECORDED_AT TIMESTAMP_NTZ
+);
+
+-- Usage per app, user and hour, read by the admin panel of the network ops app
+CREATE OR REPLACE VIEW {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.USAGE_BY_USER_HOUR AS
+SELECT
+    APP,
+    USER_NAME,
+    DATE_TRUNC('hour', RECORDED_AT) AS HOUR,
+    COUNT_IF(KIND <> 'query') AS CALLS,
+    SUM(TOKENS_IN) AS TOKENS_IN,
+    SUM(TOKENS_OUT) AS TOKENS_OUT,
+    COUNT_IF(KIND = 'query') AS QUERIES,
+    SUM(BYTES_SCANNED) / POWER(1024, 3) AS GB_SCANNED,
+    SUM(CREDITS) AS CREDITS
+FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.USAGE_METERING
+GROUP BY APP, USER_NAME, DATE_TRUNC('hour', RECORDED_AT);
+
+-- 14. CUSTOMER CHURN RISK
+-- One churn risk score per customer, so that churn questions read one indexed table instead of
+-- improvised SQL over CUSTOMER_USAGE. CUSTOMER_CHURN_FEATURES computes per-customer features:
+-- usage trend slopes, bill change, plan and device changes, days since the last usage, and
+-- exposure to poor service quality and to major incidents. CUSTOMER_USAGE has no region
+-- column, so exposure is taken from the services the customer uses (voice drop rate, data
+-- session failures over the last 30 days) and from the incidents while the customer was
+-- active. CHURN_RISK_MODEL scores a whole partition of customers at once with NumPy.
+-- REFRESH_CHURN_SCORES rescores only the customers whose usage changed; a change in quality
+-- metrics or incidents moves every customer's exposure, so it rescores everyone. Days since
+-- the last usage and the 30-day exposure also move with the date alone, and a customer who
+-- stopped using the service adds no usage rows, so everyone is also rescored once a day.
+CREATE OR REPLACE VIEW {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_FEATURES AS
+WITH usage AS (
+    SELECT
+        CUSTOMER_ID,
+        MAX_BY(SERVICE_PLAN, USAGE_DATE) AS SERVICE_PLAN,
+        MAX_BY(DEVICE_TYPE, USAGE_DATE) AS DEVICE_TYPE,
+        MIN(USAGE_DATE) AS FIRST_USAGE_DATE,
+        MAX(USAGE_DATE) AS LAST_USAGE_DATE,
+        COUNT(DISTINCT USAGE_DATE) AS USAGE_DAYS,
+        AVG(DATA_USAGE_GB) AS AVG_DATA_GB,
+        AVG(MONTHLY_BILL_AMOUNT) AS AVG_BILL,
+        -- Slope of the least-squares line through the daily values, relative to their mean
+        REGR_SLOPE(DATA_USAGE_GB, DATEDIFF(day, '2000-01-01'::DATE, USAGE_DATE))
+            / NULLIF(AVG(DATA_USAGE_GB), 0) AS DATA_TREND,
+        REGR_SLOPE(VOICE_MINUTES, DATEDIFF(day, '2000-01-01'::DATE, USAGE_DATE))
+            / NULLIF(AVG(VOICE_MINUTES), 0) AS VOICE_TREND,
+        MAX_BY(MONTHLY_BILL_AMOUNT, USAGE_DATE) / NULLIF(MIN_BY(MONTHLY_BILL_AMOUNT, USAGE_DATE), 0) - 1 AS BILL_CHANGE,
+        COUNT(DISTINCT SERVICE_PLAN) - 1 AS PLAN_CHANGES,
+        COUNT(DISTINCT DEVICE_TYPE) - 1 AS DEVICE_CHANGES,
+        SUM(VOICE_MINUTES) > 0 AS USES_VOICE,
+        SUM(DATA_USAGE_GB) > 0 AS USES_DATA
+    FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE
+    GROUP BY CUSTOMER_ID
+),
+quality AS (
+    SELECT
+        AVG(IFF(SERVICE_TYPE = 'VOICE_CALL', CALL_DROP_RATE, NULL)) AS VOICE_DROP_RATE,
+        100 - AVG(IFF(SERVICE_TYPE NOT IN ('VOICE_CALL', 'SMS_MMS'), DATA_SUCCESS_RATE, NULL)) AS DATA_FAILURE_RATE
+    FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.SERVICE_QUALITY_METRICS
+    WHERE QUALITY_MEASUREMENT_TIME >= DATEADD(day, -30, CURRENT_TIMESTAMP())
+),
+incidents AS (
+    SELECT u.CUSTOMER_ID, COUNT(*) AS MAJOR_INCIDENTS
+    FROM usage u
+    JOIN {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS i
+        ON i.INCIDENT_START_TIME < DATEADD(day, 1, u.LAST_USAGE_DATE)
+        AND COALESCE(i.INCIDENT_END_TIME, CURRENT_TIMESTAMP()) >= u.FIRST_USAGE_DATE
+    WHERE i.SEVERITY_LEVEL IN ('HIGH', 'CRITICAL')
+    GROUP BY u.CUSTOMER_ID
+)
+SELECT
+    u.* EXCLUDE (USES_VOICE, USES_DATA),
+    DATEDIFF(day, u.LAST_USAGE_DATE, CURRENT_DATE()) AS DAYS_INACTIVE,
+    u.SERVICE_PLAN LIKE 'PREPAID%' AS IS_PREPAID,
+    IFF(u.USES_VOICE, COALESCE(q.VOICE_DROP_RATE, 0), 0) AS CALL_DROP_EXPOSURE,
+    IFF(u.USES_DATA, COALESCE(q.DATA_FAILURE_RATE, 0), 0) AS DATA_FAILURE_EXPOSURE,
+    COALESCE(n.MAJOR_INCIDENTS, 0) AS MAJOR_INCIDENTS
+FROM usage u
+CROSS JOIN quality q
+LEFT JOIN incidents n ON n.CUSTOMER_ID = u.CUSTOMER_ID;
+
+-- Logistic model over the features. Each weight is the change in log-odds per unit of its
+-- feature, and features are clipped to their range first so that one outlier cannot decide
+-- the score. TOP_DRIVER is the feature that raised the risk most.
+CREATE OR REPLACE FUNCTION {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RISK_MODEL(
+    CUSTOMER_ID VARCHAR,
+    DATA_TREND FLOAT,
+    VOICE_TREND FLOAT,
+    BILL_CHANGE FLOAT,
+    DAYS_INACTIVE FLOAT,
+    PLAN_CHANGES FLOAT,
+    DEVICE_CHANGES FLOAT,
+    IS_PREPAID BOOLEAN,
+    CALL_DROP_EXPOSURE FLOAT,
+    DATA_FAILURE_EXPOSURE FLOAT,
+    MAJOR_INCIDENTS FLOAT
+)
+RETURNS TABLE (CUSTOMER_ID VARCHAR, CHURN_RISK FLOAT, RISK_BAND VARCHAR, TOP_DRIVER VARCHAR)
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+PACKAGES = ('numpy', 'pandas')
+HANDLER = 'ChurnRiskModel'
+AS $$
+import numpy as np
+import pandas as pd
+from _snowflake import vectorized
+
+# (feature, weight, low, high) in argument order after CUSTOMER_ID
+FEATURES = [
+    ("DATA_TREND", -15.0, -0.2, 0.2),
+    ("VOICE_TREND", -8.0, -0.2, 0.2),
+    ("BILL_CHANGE", 2.5, -1.0, 1.0),
+    ("DAYS_INACTIVE", 0.04, 0.0, 90.0),
+    ("PLAN_CHANGES", 0.5, 0.0, 3.0),
+    ("DEVICE_CHANGES", 0.4, 0.0, 3.0),
+    ("IS_PREPAID", 0.6, 0.0, 1.0),
+    ("CALL_DROP_EXPOSURE", 0.8, 0.0, 5.0),
+    ("DATA_FAILURE_EXPOSURE", 0.25, 0.0, 10.0),
+    ("MAJOR_INCIDENTS", 0.3, 0.0, 10.0),
+]
+BIAS = -3.0
+NAMES = np.array([f[0] for f in FEATURES])
+WEIGHTS = np.array([f[1] for f in FEATURES])
+LOW = np.array([f[2] for f in FEATURES])
+HIGH = np.array([f[3] for f in FEATURES])
+
+
+class ChurnRiskModel:
+    @vectorized(input=pd.DataFrame)
+    def end_partition(self, df):
+        x = np.clip(np.nan_to_num(df.iloc[:, 1:].to_numpy(dtype=float)), LOW, HIGH)
+        contributions = x * WEIGHTS
+        risk = 1.0 / (1.0 + np.exp(-(BIAS + contributions.sum(axis=1))))
+        return pd.DataFrame({
+            "CUSTOMER_ID": df.iloc[:, 0].to_numpy(),
+            "CHURN_RISK": risk,
+            "RISK_BAND": np.select([risk >= 0.6, risk >= 0.3], ["HIGH", "MEDIUM"], "LOW"),
+            "TOP_DRIVER": np.where(contributions.max(axis=1) > 0, NAMES[contributions.argmax(axis=1)], "NONE"),
+        })
+$$;
+
+CREATE OR REPLACE TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_SCORES (
+    CUSTOMER_ID VARCHAR(20),
+    SERVICE_PLAN VARCHAR(30),
+    DEVICE_TYPE VARCHAR(20),
+    FIRST_USAGE_DATE DATE,
+    LAST_USAGE_DATE DATE,
+    USAGE_DAYS INTEGER,
+    AVG_DATA_GB FLOAT,
+    AVG_BILL FLOAT,
+    DATA_TREND FLOAT,
+    VOICE_TREND FLOAT,
+    BILL_CHANGE FLOAT,
+    PLAN_CHANGES INTEGER,
+    DEVICE_CHANGES INTEGER,
+    DAYS_INACTIVE INTEGER,
+    IS_PREPAID BOOLEAN,
+    CALL_DROP_EXPOSURE FLOAT,
+    DATA_FAILURE_EXPOSURE FLOAT,
+    MAJOR_INCIDENTS INTEGER,
+    CHURN_RISK FLOAT,
+    RISK_BAND VARCHAR(10),
+    TOP_DRIVER VARCHAR(30),
+    SCORED_AT TIMESTAMP_NTZ
+);
+
+-- Customers waiting to be rescored, filled from the streams or with everyone
+CREATE OR REPLACE TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RESCORE (
+    CUSTOMER_ID VARCHAR(20)
+);
+
+CREATE OR REPLACE STREAM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE_CHURN_STREAM
+    ON TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE;
+
+CREATE OR REPLACE STREAM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.SERVICE_QUALITY_CHURN_STREAM
+    ON TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.SERVICE_QUALITY_METRICS;
+
+CREATE OR REPLACE STREAM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_CHURN_STREAM
+    ON TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS;
+
+CREATE OR REPLACE PROCEDURE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES(RESCORE_ALL BOOLEAN)
+RETURNS INTEGER
+LANGUAGE SQL
+AS
+$$
+DECLARE
+    rescored INTEGER DEFAULT 0;
+BEGIN
+    BEGIN TRANSACTION;
+    -- Reading the streams in this transaction consumes them
+    INSERT INTO {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RESCORE (CUSTOMER_ID)
+        SELECT CUSTOMER_ID FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE_CHURN_STREAM
+        UNION
+        SELECT CUSTOMER_ID FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE
+        WHERE :RESCORE_ALL
+           OR EXISTS (SELECT 1 FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.SERVICE_QUALITY_CHURN_STREAM)
+           OR EXISTS (SELECT 1 FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_CHURN_STREAM);
+    -- Rescored customers are replaced; one whose usage rows were all deleted is not re-inserted
+    DELETE FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_SCORES
+        WHERE CUSTOMER_ID IN (SELECT CUSTOMER_ID FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RESCORE);
+    INSERT INTO {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_SCORES
+        WITH features AS (
+            SELECT *, ABS(HASH(CUSTOMER_ID)) % 16 AS SCORE_BATCH
+            FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_FEATURES
+            WHERE CUSTOMER_ID IN (SELECT CUSTOMER_ID FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RESCORE)
+        ),
+        scores AS (
+            SELECT s.*
+            FROM features f,
+                TABLE({{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RISK_MODEL(
+                    f.CUSTOMER_ID, f.DATA_TREND, f.VOICE_TREND, f.BILL_CHANGE, f.DAYS_INACTIVE,
+                    f.PLAN_CHANGES, f.DEVICE_CHANGES, f.IS_PREPAID, f.CALL_DROP_EXPOSURE,
+                    f.DATA_FAILURE_EXPOSURE, f.MAJOR_INCIDENTS) OVER (PARTITION BY f.SCORE_BATCH)) s
+        )
+        SELECT f.* EXCLUDE (SCORE_BATCH), s.CHURN_RISK, s.RISK_BAND, s.TOP_DRIVER, CURRENT_TIMESTAMP()
+        FROM features f
+        JOIN scores s ON s.CUSTOMER_ID = f.CUSTOMER_ID;
+    rescored := SQLROWCOUNT;
+    DELETE FROM {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CHURN_RESCORE;
+    COMMIT;
+    RETURN rescored;
+END;
+$$
+;
+
+-- First scoring of every customer
+CALL {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES(TRUE);
+
+CREATE OR REPLACE TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES
+    WAREHOUSE = {{ env.EVENT_WAREHOUSE }}
+    SCHEDULE = '15 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('{{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_USAGE_CHURN_STREAM')
+      OR SYSTEM$STREAM_HAS_DATA('{{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.SERVICE_QUALITY_CHURN_STREAM')
+      OR SYSTEM$STREAM_HAS_DATA('{{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.NETWORK_INCIDENTS_CHURN_STREAM')
+AS
+CALL {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES(FALSE);
+
+ALTER TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES RESUME;
+
+-- Daily rescoring of every customer, for the features that depend on the current date
+CREATE OR REPLACE TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.RESCORE_ALL_CHURN_SCORES
+    WAREHOUSE = {{ env.EVENT_WAREHOUSE }}
+    SCHEDULE = 'USING CRON 0 2 * * * UTC'
+AS
+CALL {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.REFRESH_CHURN_SCORES(TRUE);
+
+ALTER TASK {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.RESCORE_ALL_CHURN_SCORES RESUME;
+
+-- Lookups of one customer's score; needs Enterprise Edition like the layouts in section 10
+EXECUTE IMMEDIATE $$
+    BEGIN
+        ALTER TABLE {{ env.DATAOPS_DATABASE }}.{{ env.EVENT_SCHEMA }}.CUSTOMER_CHURN_SCORES
+            ADD SEARCH OPTIMIZATION ON EQUALITY(CUSTOMER_ID);
+        RETURN 'search optimization added to CUSTOMER_CHURN_SCORES';
+    EXCEPTION
+        WHEN OTHER THEN
+            RETURN 'search optimization not available for CUSTOMER_CHURN_SCORES: ' || SQLERRM;
+    END;
+$$
+;
+
 -- If data sharing enambled, create a database from the share
 {% if env.EVENT_DATA_SHARING == "true" %}
 use role {{ env.EVENT_ATTENDEE_ROLE }};
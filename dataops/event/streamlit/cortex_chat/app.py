@@ -1,42 +1,214 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import json
 import _snowflake
 import re
+import time
+import yaml
 from snowflake.snowpark.context import get_active_session
+from resilient_agent import (AgentCallError, AnswerCache, CircuitOpenError,
+                             ResilientCaller, fallback_events, match_verified_query)
+from model_router import ModelRouter
+from arrow_results import describe_footprint, result_frame
+from downsample import render_chart
+from freshness import Watermarks, answer_tables, markers_sql
+from query_reuse import QueryReuse, async_result
+from query_scheduler import DeadlineExceeded, QueryScheduler
+from conversation_log import RESTORE_SQL as CONVERSATION_SQL, ConversationLog, new_conversation_id
+from bulk_questions import agent_asker, render_bulk_questions
+from result_grid import render_result_grid
+from prewarm import Prewarm, prewarm_sql
+from rerun_profiler import run_profiled
+from usage_meter import UsageMeter, complete_response, describe_usage
 logo = 'snowflake_logo_color_rgb.svg'
+
+@st.cache_resource
+def get_stylesheet():
+    """extra.css, read from disk once per process"""
+    with open('extra.css') as ab:
+        return f"<style>{ab.read()}</style>"
+
 session = get_active_session()
-model = 'llama3.3-70b'
 st.set_page_config(layout="wide")
-with open('extra.css') as ab:
-    st.markdown(f"<style>{ab.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
 
 st.logo(logo)
-session = get_active_session()
 #st.write(session)
 
 
 
 
 API_ENDPOINT = "/api/v2/cortex/agent:run"
-API_TIMEOUT = 50000  # in milliseconds
+API_TIMEOUT = 50000  # upper bound in milliseconds; the caller adapts below it
 
 CORTEX_SEARCH_SERVICES = "DEFAULT_SCHEMA.NETWORK_DOCUMENTATION"
 SEMANTIC_MODELS = "@CORTEX_ANALYST.CORTEX_ANALYST/telco_semantic_model.yaml"
+QUERY_TAG = "cortex_chat"  # finds this app's statements in the query history
+ECONOMY_CHART = "st.bar_chart(analysis_results, color='#29B5E8')"  # chart without a suggestion call
+
+if session.query_tag != QUERY_TAG:
+    session.query_tag = QUERY_TAG
+
+@st.cache_resource
+def get_query_scheduler():
+    """Priority admission of warehouse queries and agent calls, shared by every session"""
+    return QueryScheduler()
+
+@st.cache_resource
+def get_usage_meter():
+    """Tokens, credits and warehouse queries per user and session, written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return UsageMeter.from_config(
+        'usage_budgets.yaml', QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda sql: result_frame(session.sql(sql)), "background"))
 
-def run_snowflake_query(query):
-    """Run Snowflake SQL Query"""
+def usage_context():
+    """User name and Streamlit session ID that usage is attributed to"""
+    ctx = get_script_run_ctx()
+    return st.experimental_user.get('user_name'), ctx.session_id if ctx else None
+
+def run_snowflake_query(query, priority="interactive"):
+    """Run Snowflake SQL Query in the scheduler's ``priority`` class, metered to the current user"""
+    user, session_id = usage_context()
     try:
-        df = session.sql(query.replace(';',''))
+        started = time.perf_counter()
+        df = get_query_scheduler().run(
+            lambda: result_frame(session.sql(query.replace(';','')).collect_nowait(), session=session), priority)
+        get_usage_meter().record_query(user, session_id, df.attrs["footprint"]["query_id"],
+                                       (time.perf_counter() - started) * 1000)
         return df
 
+    except DeadlineExceeded:
+        # Dropped while queued behind higher-priority work; the next rerun asks again
+        return None
     except Exception as e:
         st.error(f"Error executing SQL: {str(e)}")
-        return None, None
+        return None
 
-def snowflake_api_call(query: str, limit: int = 10):
-    """Make an Agent API Call"""
-    payload = {
-        "model": f"{model}",
+@st.cache_resource
+def get_agent_caller():
+    """One resilient agent caller per app process, shared by every session"""
+    return ResilientCaller(max_timeout_ms=API_TIMEOUT)
+
+@st.cache_resource
+def get_answer_cache():
+    """Last good agent answer per question, used while the agent is unavailable"""
+    return AnswerCache()
+
+@st.cache_resource
+def get_watermarks():
+    """Per-table data versions shared by every session, for invalidating cached results"""
+    return Watermarks(get_query_scheduler().wrap(
+        lambda: result_frame(session.sql(markers_sql())), "background"))
+
+@st.cache_resource
+def get_query_reuse():
+    """Agent SQL results by normalized fingerprint and table versions, shared by every session"""
+    return QueryReuse(get_query_scheduler().wrap(
+        lambda sql: async_result(session.sql(sql).collect_nowait(), session), "interactive"))
+
+def run_agent_query(sql):
+    """Run agent SQL, reusing the result of an equivalent query while its tables are unchanged"""
+    sql = sql.replace(';', '')
+    df = get_query_reuse().run(sql, get_watermarks().tag_sql(sql))
+    footprint = df.attrs.get("footprint", {})
+    if footprint.get("source") != "memory":
+        get_usage_meter().record_query(*usage_context(), footprint.get("query_id"))
+    return df
+
+@st.cache_resource
+def get_conversation_log():
+    """Answered turns queued for CONVERSATION_HISTORY and written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return ConversationLog(
+        QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda user, app, cid: result_frame(session.sql(CONVERSATION_SQL, params=[user, app, cid])),
+                       "interactive"))
+
+def conversation_id():
+    """ID of this conversation, kept in the URL so that a reload restores it"""
+    if "conversation" not in st.query_params:
+        st.query_params["conversation"] = new_conversation_id()
+    return st.query_params["conversation"]
+
+def restore_messages(key="messages"):
+    """This session's chat messages; after a reload they are read back from the history table"""
+    if key not in st.session_state:
+        reloaded = "conversation" in st.query_params
+        cid = conversation_id()
+        messages = get_conversation_log().restore(cid, st.experimental_user.get('user_name')) if reloaded else []
+        if messages is None:
+            # A shared link to another user's conversation: start this user's own
+            st.query_params["conversation"] = new_conversation_id()
+            messages = []
+        st.session_state[key] = messages
+    return st.session_state[key]
+
+def log_turn(query, text, sql, started):
+    """Queue an answered turn for the history table; adds no latency to the answer"""
+    call = st.session_state.get('last_agent_call', {})
+    get_conversation_log().record(conversation_id(), query, text, sql=sql, model=call.get('model'),
+                                  route=call.get('route'), agent_ms=call.get('agent_ms'),
+                                  answer_ms=(time.perf_counter() - started) * 1000,
+                                  user=st.experimental_user.get('user_name'))
+
+@st.cache_data(ttl=3600)
+def get_semantic_model():
+    """Semantic model YAML from the Cortex Analyst stage"""
+    try:
+        with session.file.get_stream(SEMANTIC_MODELS) as f:
+            return yaml.safe_load(f) or {}
+    except Exception:
+        return {}
+
+def get_verified_queries():
+    """Verified queries from the semantic model, used while the agent is unavailable"""
+    return get_semantic_model().get('verified_queries', [])
+
+@st.cache_resource
+def build_model_router():
+    """Routes each request to a model by complexity, shared by every session"""
+    return ModelRouter.from_config('model_routes.yaml')
+
+def get_model_router():
+    """The shared router, given the semantic model's table vocabulary once the model can be read"""
+    router = build_model_router()
+    if not router.vocabulary:
+        # A failed stage read returns {}; try again rather than route without tables for good
+        router.set_semantic_model(get_semantic_model())
+    return router
+
+@st.cache_resource
+def get_prewarm():
+    """Reads the semantic model and resumes the warehouse once per process, alongside the first page load"""
+    scheduler = get_query_scheduler()
+    prewarm = Prewarm([
+        ("semantic model", get_semantic_model),
+        ("warehouse", lambda: scheduler.run(
+            lambda: session.sql(prewarm_sql(get_semantic_model())).collect(), "background")),
+    ])
+    # The step thread reads the semantic model through st.cache_data
+    add_script_run_ctx(prewarm.thread)
+    return prewarm.start()
+
+def fallback_response(query):
+    """Answer from the answer cache or the closest verified query"""
+    cached = get_answer_cache().get(query, get_watermarks().is_current)
+    if cached is not None:
+        st.info("ℹ️ Showing the last answer to this question while the agent is unavailable.")
+        return cached
+    verified = match_verified_query(query, get_verified_queries())
+    if verified:
+        st.info("ℹ️ Answering from the closest verified query while the agent is unavailable.")
+        return fallback_events(f"Closest verified question: **{verified['question']}**", verified['sql'])
+    return None
+
+def agent_payload(query, model):
+    """Agent request body with the analyst and search tools"""
+    return {
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -71,17 +243,25 @@ def snowflake_api_call(query: str, limit: int = 10):
             }
         }
     }
+
+def snowflake_api_call(query: str, limit: int = 10):
+    """Make an Agent API Call, within this hour's usage budget"""
+    user, session_id = usage_context()
+    route, agent_model = get_model_router().route(query)
+    agent_model = get_usage_meter().agent_model(user, agent_model)
+    if agent_model is None:
+        st.warning("⚠️ This hour's usage budget is spent; answering from cached and verified answers only.")
+        return fallback_response(query)
+    payload = agent_payload(query, agent_model)
     
+    started = time.perf_counter()
+    answered = False
     try:
-        resp = _snowflake.send_snow_api_request(
-            "POST",  # method
-            API_ENDPOINT,  # path
-            {},  # headers
-            {},  # params
-            payload,  # body
-            None,  # request_guid
-            API_TIMEOUT,  # timeout in milliseconds,
-        )
+        resp = get_query_scheduler().run(lambda: get_agent_caller().call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ))
         
         if resp["status"] != 200:
             st.error(f"❌ HTTP Error: {resp['status']} - {resp.get('reason', 'Unknown reason')}")
@@ -95,11 +275,24 @@ def snowflake_api_call(query: str, limit: int = 10):
             st.error(f"Raw response: {resp['content'][:200]}...")
             return None
             
+        get_answer_cache().put(query, response_content, get_watermarks().tag(answer_tables(resp["content"])))
+        text, sql, _ = process_sse_response(response_content)
+        get_usage_meter().record_agent(user, session_id, agent_model, query, response_content,
+                                       lambda: text + sql, (time.perf_counter() - started) * 1000)
+        # Route quality counts answers with SQL or text, not just a successful HTTP call
+        answered = bool(sql or text.strip())
         return response_content
             
+    except (CircuitOpenError, AgentCallError) as e:
+        st.warning(f"⚠️ Cortex Agent unavailable: {str(e)}")
+        return fallback_response(query)
     except Exception as e:
         st.error(f"Error making request: {str(e)}")
         return None
+    finally:
+        get_model_router().record(route, time.perf_counter() - started, answered)
+        st.session_state.last_agent_call = {"route": route, "model": agent_model,
+                                            "agent_ms": (time.perf_counter() - started) * 1000}
 
 def process_sse_response(response):
     """Process SSE response"""
@@ -141,15 +334,29 @@ def process_sse_response(response):
     return text, sql, citations
 
 @st.cache_data
-def execute_cortex_complete_sql(prompt):
+def execute_cortex_complete_sql(prompt, model_name):
     """
-    Execute Cortex Complete using the SQL API
+    Execute Cortex Complete using the SQL API; the options argument makes it report token usage
     """
-    cmd = "SELECT snowflake.cortex.complete(?, ?) AS response"
-    df_response = session.sql(cmd, params=[f"{model}", prompt]).collect()
-    response_txt = df_response[0].RESPONSE
+    user, session_id = usage_context()
+    cmd = ("SELECT snowflake.cortex.complete(?, ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', ?)), "
+           "OBJECT_CONSTRUCT()) AS response")
+    started = time.perf_counter()
+    df_response = get_query_scheduler().run(lambda: session.sql(cmd, params=[model_name, prompt]).collect())
+    response_txt, tokens_in, tokens_out, estimated = complete_response(df_response[0].RESPONSE, prompt)
+    get_usage_meter().record_tokens("complete", user, session_id, model_name, tokens_in, tokens_out, estimated,
+                                    (time.perf_counter() - started) * 1000)
     return response_txt
 
+def suggest_chart(prompt, model_name):
+    """Chart code from Cortex Complete, or in economy mode a plain bar chart without the call"""
+    meter = get_usage_meter()
+    if meter.level(usage_context()[0]) != "normal":
+        meter.degraded("economy")
+        st.caption("No chart suggestion while this hour's usage budget is nearly spent.")
+        return ECONOMY_CHART
+    return execute_cortex_complete_sql(prompt, model_name)
+
 @st.cache_data
 def extract_python_code(text):
     """
@@ -167,21 +374,64 @@ def extract_python_code(text):
 def replace_chart_function(chart_string, new_chart_type):
     return re.sub(r"st\.(\w+_chart)", f"st.{new_chart_type}", chart_string)
 
+def run_export_sql(sql, params=None):
+    """Run a result export statement and return its rows"""
+    return get_query_scheduler().run(lambda: session.sql(sql, params=params).collect())
+
+def bulk_asker():
+    """Thread-safe answer and query callables for bulk runs, bound to the shared resources"""
+    scheduler, caller, reuse, watermarks = get_query_scheduler(), get_agent_caller(), get_query_reuse(), get_watermarks()
 
+    def send(question, model):
+        payload = agent_payload(question, model)
+        resp = scheduler.run(lambda: caller.call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ), "bulk")
+        if resp["status"] != 200:
+            raise RuntimeError(f"HTTP {resp['status']} - {resp.get('reason', 'Unknown reason')}")
+        return json.loads(resp["content"])
+
+    def parse(events):
+        text, sql, _ = process_sse_response(events)
+        return text.replace("【†", "[").replace("†】", "]"), sql
 
+    return agent_asker(send, parse, lambda sql: scheduler.run(lambda: reuse.run(sql, watermarks.tag_sql(sql)), "bulk"),
+                       get_model_router(), get_usage_meter(), *usage_context())
 
 def main():
+    get_prewarm()
     st.markdown('<h0black>SNOWFLAKE | </h0black><h0blue>TELCO OPERATIONS AI</h0blue><BR>', unsafe_allow_html=True)
 
     # Sidebar for new chat
     with st.sidebar:
         if st.button("NEW CONVERSATION", key="new_chat", type="secondary"):
             st.session_state.messages = []
+            st.query_params["conversation"] = new_conversation_id()
             st.rerun()
 
+        with st.expander("⚙️ Model routing"):
+            # Building the router reads the semantic model, which the first page load does not wait for
+            if get_prewarm().done("semantic model"):
+                st.dataframe([dict(route=r, **s) for r, s in get_model_router().stats().items()], hide_index=True)
+            else:
+                st.caption("Loading the semantic model…")
+
+        with st.expander("⏱️ Query scheduling"):
+            st.dataframe([dict(priority=p, **s) for p, s in get_query_scheduler().stats().items()], hide_index=True)
+
+        with st.expander("🚀 Startup"):
+            st.dataframe(get_prewarm().stats(), hide_index=True)
+
+        with st.expander("💳 Usage"):
+            st.caption(describe_usage(get_usage_meter().usage(usage_context()[0])))
+            st.dataframe([get_usage_meter().stats()], hide_index=True)
+
+    render_bulk_questions(bulk_asker)
+
     # Initialize session state
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    restore_messages()
 
     for message in st.session_state.messages:
         with st.chat_message(message['role'],avatar='🦋'):
@@ -195,6 +445,7 @@ def main():
         
         # Get response from API
         with st.spinner("Processing your request..."):
+            started = time.perf_counter()
             response = snowflake_api_call(query, 1)
             text, sql, citations = process_sse_response(response)
             
@@ -203,6 +454,7 @@ def main():
                 text = text.replace("【†", "[")
                 text = text.replace("†】", "]")
                 st.session_state.messages.append({"role": "assistant", "content": text})
+                log_turn(query, text, sql, started)
                 
                 with st.chat_message("assistant", avatar="🐬"):
                     st.markdown(text.replace("•", "\n\n"))
@@ -214,9 +466,8 @@ def main():
                             doc_id = citation.get("doc_id", "")
                             if doc_id:
                                 query = f"SELECT CONTENT FROM DEFAULT_SCHEMA.NETWORK_DOCUMENTATION WHERE DOCUMENT_ID = '{doc_id}'"
-                                result = run_snowflake_query(query)
-                                if result:
-                                    result_df = result.to_pandas()
+                                result_df = run_snowflake_query(query)
+                                if result_df is not None:
                                     if not result_df.empty:
                                         transcript_text = result_df.iloc[0, 0]
                                     else:
@@ -234,17 +485,20 @@ def main():
                     st.code(sql, language="sql")
 
                 with st.expander("Data Analysis", expanded=True):
-                    analysis_results = run_snowflake_query(sql).to_pandas()
+                    analysis_results = run_agent_query(sql)
 
                     if len(analysis_results.index) > 1:
                         data_tab, suggested_plot, line_tab, bar_tab, scatter_tab = st.tabs(
                          ["Data", "Suggested Plot", "Line Chart", "Bar Chart","Scatter Chart"]
                      )
-                        data_tab.dataframe(analysis_results)
+                        with data_tab:
+                            render_result_grid(analysis_results, run_export_sql)
+                        data_tab.caption(describe_footprint(analysis_results))
                         
                         if len(analysis_results.columns) > 1:
                             analysis_results = analysis_results.set_index(analysis_results.columns[0])
                         
+                        execution_code = None
                         with suggested_plot:
                             try:
                                 prompt = f'''
@@ -259,43 +513,34 @@ def main():
                                             Choose only 1 value for X and 1 value for Y. for each chart, add color='#29B5E8'
                                             
                                             '''
-                                code = execute_cortex_complete_sql(prompt)
+                                chart_route, chart_model = get_model_router().route(prompt, chart=True)
+                                started = time.perf_counter()
+                                code = suggest_chart(prompt, chart_model)
                                 #st.write(code)
                                 execution_code = extract_python_code(code)
+                                get_model_router().record(chart_route, time.perf_counter() - started, execution_code is not None)
                                 
                                 st.code(execution_code, language="python", line_numbers=False)
-                                exec(execution_code)
+                                render_chart(analysis_results, execution_code, key="zoom_suggested")
                             except:
                                 pass
                         
                         with line_tab:
-
-                            
-                            
-                            try:
-                                exec(replace_chart_function(execution_code, 'line_chart'))
-                                #st.line_chart(analysis_results,color='#29B5E8')
-                            except:
-                                pass
+                            if execution_code:
+                                render_chart(analysis_results, replace_chart_function(execution_code, 'line_chart'), key="zoom_line")
                         
                         with bar_tab:
-                            try: 
-                                exec(replace_chart_function(execution_code, 'bar_chart'))
-                                #st.bar_chart(analysis_results,color='#29B5E8')
-                            except:
-                                pass
+                            if execution_code:
+                                render_chart(analysis_results, replace_chart_function(execution_code, 'bar_chart'), key="zoom_bar")
                                 
                         with scatter_tab:
-                            try: 
-                                exec(replace_chart_function(execution_code, 'scatter_chart'))
-                                #st.bar_chart(analysis_results,color='#29B5E8')
-                            except:
-                                pass
+                            if execution_code:
+                                render_chart(analysis_results, replace_chart_function(execution_code, 'scatter_chart'), key="zoom_scatter")
                     else:
                         st.dataframe(analysis_results)
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main, f"{QUERY_TAG} rerun")
 
 # Sample Telco Questions to try:
     
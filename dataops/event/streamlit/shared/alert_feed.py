@@ -0,0 +1,74 @@
+"""
+Shared in-process copy of the active incident alerts.
+
+``configure_attendee_account.sql`` keeps ``ACTIVE_ALERTS`` (the open
+incidents) up to date from a stream on ``NETWORK_INCIDENTS``. Each time the
+task consumes the stream it bumps ``ALERT_FEED_STATE.VERSION`` in the same
+transaction.
+
+``AlertFeed`` holds the alerts for every session of an app. At most once
+every ``check_s`` seconds it reads the one-row version. It reloads the alerts
+only when the version has moved, that is, when the stream offset has
+advanced. The cost of a sidebar render therefore does not grow with the
+incident history or the number of open sessions.
+"""
+import threading
+import time
+
+VERSION_SQL = "SELECT version, updated_at FROM alert_feed_state"
+
+ALERTS_SQL = """
+SELECT incident_id, incident_type, severity_level, affected_region,
+       incident_start_time, customers_affected
+FROM active_alerts
+ORDER BY incident_start_time DESC
+"""
+
+
+class AlertFeed:
+    """Active alerts shared by all sessions, reloaded when the feed version changes"""
+
+    def __init__(self, version_loader, alerts_loader, check_s=15):
+        self.version_loader = version_loader
+        self.alerts_loader = alerts_loader
+        self.check_s = check_s
+        self.version = None
+        self.alerts = None
+        self.checked_at = 0.0
+        self.checks = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+
+    def _check(self):
+        self.checked_at = time.time()
+        self.checks += 1
+        state = self.version_loader()
+        version = None if state is None or state.empty else state["VERSION"].iloc[0]
+        if self.alerts is None or version != self.version:
+            self.alerts = self.alerts_loader()
+            self.version = version
+            self.reloads += 1
+
+    def get(self):
+        """Current alerts; one session at a time checks the version, the others read the last copy"""
+        if time.time() - self.checked_at >= self.check_s or self.alerts is None:
+            # Block only while there is no copy yet
+            if self._lock.acquire(blocking=self.alerts is None):
+                try:
+                    if time.time() - self.checked_at >= self.check_s or self.alerts is None:
+                        self._check()
+                finally:
+                    self._lock.release()
+        return self.alerts
+
+    def critical(self, limit=5):
+        alerts = self.get()
+        return alerts[alerts["SEVERITY_LEVEL"] == "CRITICAL"].head(limit)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "age_s": time.time() - self.checked_at if self.checked_at else None,
+        }
@@ -0,0 +1,170 @@
+"""
+Streaming per-tower anomaly detection on network KPIs.
+
+``TowerAnomalyDetector`` keeps an exponentially weighted mean and variance
+per tower for ``LATENCY_MS``, ``PACKET_LOSS_PERCENT``, ``THROUGHPUT_MBPS`` and
+``UPTIME_PERCENT`` in flat NumPy arrays. A batch of new measurements is
+scored and folded into that state with array operations across all towers.
+A batch that holds several measurements per tower is processed in rounds
+(the first measurement of every tower, then the second, ...), so each round
+is one vectorized step.
+
+A measurement is anomalous when it lies more than ``threshold`` standard
+deviations from the tower's running mean in the bad direction: up for
+latency and packet loss, down for throughput and uptime. ``AnomalyMonitor``
+pulls new rows since its watermark and keeps the ranked anomalies for the
+sidebar. The watermark is the (timestamp, tower) of the last row read, so a
+batch cut short by the row limit in the middle of a timestamp resumes with
+the next tower instead of skipping the rest of that timestamp.
+"""
+import threading
+import time
+
+# Metric and the sign of a bad deviation
+METRICS = {"LATENCY_MS": 1, "PACKET_LOSS_PERCENT": 1, "THROUGHPUT_MBPS": -1, "UPTIME_PERCENT": -1}
+
+MEASUREMENTS_SQL = """
+SELECT cell_tower_id, region, network_type, measurement_timestamp,
+       latency_ms, packet_loss_percent, throughput_mbps, uptime_percent
+FROM network_performance
+WHERE measurement_timestamp > ?
+   OR (measurement_timestamp = ? AND cell_tower_id > ?)
+ORDER BY measurement_timestamp, cell_tower_id
+LIMIT {limit}
+"""
+
+
+def measurements_sql(limit=1_000_000):
+    return MEASUREMENTS_SQL.format(limit=int(limit))
+
+
+class TowerAnomalyDetector:
+    """EWMA mean/variance state per (tower, metric), updated a batch at a time"""
+
+    def __init__(self, alpha=0.1, threshold=4.0, warmup=20, min_std=None):
+        import numpy as np
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.metrics = list(METRICS)
+        self.direction = np.array([METRICS[m] for m in self.metrics], dtype=np.float64)
+        # Floor on the standard deviation so a perfectly flat history does not flag noise
+        self.min_std = np.array([(min_std or {}).get(m, 0.0) for m in self.metrics], dtype=np.float64)
+        self.towers = {}
+        self.mean = np.zeros((0, len(self.metrics)))
+        self.var = np.zeros((0, len(self.metrics)))
+        self.count = np.zeros((0, len(self.metrics)), dtype=np.int64)
+
+    def _tower_index(self, tower_ids):
+        import numpy as np
+        import pandas as pd
+        new = [t for t in pd.unique(tower_ids) if t not in self.towers]
+        if new:
+            for t in new:
+                self.towers[t] = len(self.towers)
+            grow = np.zeros((len(new), len(self.metrics)))
+            self.mean = np.vstack([self.mean, grow])
+            self.var = np.vstack([self.var, grow])
+            self.count = np.vstack([self.count, grow.astype(np.int64)])
+        return np.fromiter((self.towers[t] for t in tower_ids), dtype=np.int64, count=len(tower_ids))
+
+    def update(self, batch):
+        """Score a batch of measurements, fold it into the state, and return the anomalies.
+
+        ``batch`` needs ``CELL_TOWER_ID`` and the metric columns and should be
+        in time order. Every other column is carried into the anomaly rows.
+        """
+        import numpy as np
+        import pandas as pd
+        if batch is None or batch.empty:
+            return pd.DataFrame()
+        batch = batch.reset_index(drop=True)
+        towers = self._tower_index(batch["CELL_TOWER_ID"].to_numpy())
+        values = batch[self.metrics].to_numpy(dtype=np.float64, na_value=np.nan)
+        rounds = batch.groupby("CELL_TOWER_ID", sort=False, observed=True).cumcount().to_numpy()
+
+        scores = np.full(values.shape, np.nan)
+        expected = np.full(values.shape, np.nan)
+        for r in range(rounds.max() + 1):
+            rows = np.flatnonzero(rounds == r)
+            idx = towers[rows]
+            x = values[rows]
+            mean, var, count = self.mean[idx], self.var[idx], self.count[idx]
+            std = np.maximum(np.sqrt(var), self.min_std)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = (x - mean) / std * self.direction
+            ready = (count >= self.warmup) & (std > 0)
+            scores[rows] = np.where(ready, z, np.nan)
+            expected[rows] = np.where(ready, mean, np.nan)
+
+            # Weight 1/n until it drops below alpha: the plain running mean and
+            # variance while a tower warms up, the exponential average after
+            seen = ~np.isnan(x)
+            weight = np.maximum(self.alpha, 1.0 / (count + 1))
+            diff = np.where(seen, x - mean, 0.0)
+            step = weight * diff
+            self.mean[idx] = mean + step
+            self.var[idx] = np.where(seen, (1 - weight) * (var + diff * step), var)
+            self.count[idx] = count + seen
+
+        hits = np.argwhere(scores > self.threshold)
+        if not len(hits):
+            return pd.DataFrame()
+        rows, cols = hits[:, 0], hits[:, 1]
+        anomalies = batch.drop(columns=self.metrics).iloc[rows].reset_index(drop=True)
+        anomalies["METRIC"] = np.array(self.metrics)[cols]
+        anomalies["VALUE"] = values[rows, cols]
+        anomalies["EXPECTED"] = expected[rows, cols]
+        anomalies["SCORE"] = scores[rows, cols]
+        return anomalies
+
+
+class AnomalyMonitor:
+    """Feeds new ``NETWORK_PERFORMANCE`` rows to a detector and keeps the latest anomalies.
+
+    ``loader(since, tower)`` returns the measurements after ``(since, tower)``
+    ordered by timestamp and tower.
+    """
+
+    def __init__(self, loader, detector=None, lookback_hours=24, refresh_s=60, keep_hours=6):
+        import pandas as pd
+        self.loader = loader
+        self.detector = detector or TowerAnomalyDetector()
+        self.refresh_s = refresh_s
+        self.keep = pd.Timedelta(hours=keep_hours)
+        self.watermark = pd.Timestamp.now() - pd.Timedelta(hours=lookback_hours)
+        self.watermark_tower = ""
+        self.anomalies = pd.DataFrame()
+        self.last_refresh = None
+        self.last_batch = {"rows": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Process measurements past the watermark if the last refresh is older than ``refresh_s``"""
+        import pandas as pd
+        with self._lock:
+            if not force and self.last_refresh and time.time() - self.last_refresh < self.refresh_s:
+                return
+            self.last_refresh = time.time()
+            batch = self.loader(self.watermark.to_pydatetime(), self.watermark_tower)
+            if batch is None or batch.empty:
+                return
+            started = time.perf_counter()
+            found = self.detector.update(batch)
+            self.last_batch = {"rows": len(batch), "seconds": time.perf_counter() - started}
+            last = batch.iloc[-1]
+            self.watermark = pd.Timestamp(last["MEASUREMENT_TIMESTAMP"])
+            self.watermark_tower = last["CELL_TOWER_ID"]
+            if not found.empty:
+                self.anomalies = pd.concat([self.anomalies, found], ignore_index=True)
+            if not self.anomalies.empty:
+                recent = self.anomalies["MEASUREMENT_TIMESTAMP"] >= self.watermark - self.keep
+                self.anomalies = self.anomalies[recent].reset_index(drop=True)
+
+    def ranked(self, limit=5):
+        """Worst current anomaly per (tower, metric), highest score first"""
+        with self._lock:
+            if self.anomalies.empty:
+                return self.anomalies
+            latest = self.anomalies.drop_duplicates(["CELL_TOWER_ID", "METRIC"], keep="last")
+            return latest.sort_values("SCORE", ascending=False).head(limit).reset_index(drop=True)
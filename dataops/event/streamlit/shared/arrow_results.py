@@ -0,0 +1,151 @@
+"""
+Arrow-native query results with compact dtypes.
+
+The apps used to materialize every result with ``to_pandas()``, which leaves
+text as object-dtype Python strings, fixed-point numbers as ``Decimal``
+objects and every number at 64 bits. ``result_frame`` keeps the result in
+Arrow until the last step and compacts it on the way:
+
+* low-cardinality text (``REGION``, ``SERVICE_PLAN``, ``DEVICE_TYPE``) is
+  dictionary-encoded and arrives in pandas as a categorical
+* ``NUMBER(p, 0)`` becomes ``int64`` when every value fits, and other
+  decimals become ``float64``; a column out of ``int64`` range, such as a
+  ``HASH``, stays decimal
+* integers shrink to the narrowest signed type holding their range only with
+  ``narrow_ints=True``, for frames that are not handed to arithmetic (``int8``
+  wraps around at 127), and floats become ``float32`` only with
+  ``downcast_floats=True``, for charts that can lose digits past the seventh
+* dates become ``datetime64`` instead of Python ``date`` objects
+
+The Arrow-to-pandas conversion splits blocks and frees Arrow buffers as it
+goes, so the two copies never coexist in full. Each frame carries its
+footprint in ``df.attrs["footprint"]``, with the query ID when the result
+comes from a Snowpark ``AsyncJob``. The result of a job is read the way
+Snowpark's own ``result("pandas")`` reads it, through a connector cursor
+attached to the query ID, but as Arrow batches rather than a pandas frame.
+"""
+
+# Text columns with at most this share of distinct values are dictionary-encoded
+CATEGORY_MAX_RATIO = 0.5
+
+INT_TYPES = ["int8", "int16", "int32", "int64"]
+
+
+def job_arrow(job, session):
+    """Arrow table of a Snowpark ``AsyncJob``, waiting for the query to finish"""
+    import pyarrow as pa
+    cursor = session.connection.cursor()
+    try:
+        cursor.get_results_from_sfqid(job.query_id)
+        table = cursor.fetch_arrow_all()
+    finally:
+        cursor.close()
+    if table is None:
+        # The connector returns no table for an empty result; the job's own fetch keeps its columns
+        return pa.Table.from_pandas(job.result("pandas"), preserve_index=False)
+    return table
+
+
+def fetch_arrow(result, session=None):
+    """Arrow table for a Snowpark DataFrame, or for an ``AsyncJob`` of ``session``"""
+    import pyarrow as pa
+    if hasattr(result, "query_id"):
+        return job_arrow(result, session)
+    to_arrow = getattr(result, "to_arrow", None)
+    if to_arrow is not None:
+        return to_arrow()
+    return pa.Table.from_pandas(result.to_pandas(), preserve_index=False)
+
+
+def _narrowest_int(column):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    bounds = pc.min_max(column).as_py()
+    low, high = bounds["min"], bounds["max"]
+    if low is None:
+        return pa.int8()
+    for name in INT_TYPES:
+        info = np.iinfo(name)
+        if info.min <= low and high <= info.max:
+            return getattr(pa, name)()
+    return column.type
+
+
+def compact_column(column, category_max_ratio=CATEGORY_MAX_RATIO, downcast_floats=False, narrow_ints=False):
+    """Smallest Arrow representation of one column holding the same values.
+
+    ``downcast_floats`` trades precision and ``narrow_ints`` trades headroom
+    for arithmetic on the result.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    kind = column.type
+    if pa.types.is_decimal(kind):
+        try:
+            column = column.cast(pa.int64() if kind.scale == 0 else pa.float64(), safe=True)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Out of int64 range: keep the exact decimal rather than fail the query
+            return column
+        kind = column.type
+    if pa.types.is_integer(kind) and narrow_ints:
+        return column.cast(_narrowest_int(column))
+    if pa.types.is_float64(kind) and downcast_floats:
+        return column.cast(pa.float32())
+    if (pa.types.is_string(kind) or pa.types.is_large_string(kind)) and len(column):
+        if pc.count_distinct(column).as_py() <= category_max_ratio * len(column):
+            return column.dictionary_encode()
+    return column
+
+
+def compact_table(table, category_max_ratio=CATEGORY_MAX_RATIO, downcast_floats=False, narrow_ints=False):
+    """Apply ``compact_column`` to every column of an Arrow table"""
+    import pyarrow as pa
+    columns = [compact_column(table.column(i), category_max_ratio, downcast_floats, narrow_ints)
+               for i in range(table.num_columns)]
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+def to_frame(table):
+    """pandas view of an Arrow table, releasing the Arrow buffers as columns convert"""
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+def footprint(df):
+    """Bytes held by a DataFrame, including string payloads"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def result_frame(result, category_max_ratio=CATEGORY_MAX_RATIO, downcast_floats=False, session=None,
+                 narrow_ints=False):
+    """Compact pandas frame for a Snowpark DataFrame, or an ``AsyncJob`` of ``session``, with its footprint in ``attrs``"""
+    table = fetch_arrow(result, session)
+    fetched_bytes = table.nbytes
+    table = compact_table(table, category_max_ratio, downcast_floats, narrow_ints)
+    compact_bytes = table.nbytes
+    df = to_frame(table)
+    df.attrs["footprint"] = {
+        "rows": len(df),
+        "fetched_bytes": fetched_bytes,
+        "arrow_bytes": compact_bytes,
+        "pandas_bytes": footprint(df),
+        "query_id": getattr(result, "query_id", None),
+    }
+    return df
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def describe_footprint(df):
+    """One-line memory summary for a result frame, or an empty string"""
+    fp = df.attrs.get("footprint")
+    if not fp:
+        return ""
+    reused = {"memory": " · reused result", "result_scan": " · reused via RESULT_SCAN"}.get(fp.get("source"), "")
+    return (f"{fp['rows']:,} rows · {format_bytes(fp['pandas_bytes'])} in memory "
+            f"(fetched {format_bytes(fp['fetched_bytes'])} from Snowflake){reused}")
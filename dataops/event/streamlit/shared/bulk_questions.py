@@ -0,0 +1,225 @@
+"""
+Bulk question runs: a file of questions through the agent and its SQL.
+
+Weekly reviews and per-region checks need dozens of answers at once.
+``read_questions`` takes an uploaded ``.txt`` file (one question per line) or
+``.csv`` file (a ``question`` column, else the first column). ``run_bulk``
+answers the questions on a thread pool of ``max_concurrency`` workers, starts
+at most ``per_minute`` questions a minute, and yields one result row per
+question as it finishes. The app can stream the rows into a table while the
+run is still going. When the caller stops reading, as Streamlit does when the
+user interacts mid-run, the questions not yet started are dropped instead of
+run to the end.
+
+The ``answer(question) -> (text, sql)`` and ``query(sql) -> DataFrame``
+callables run on worker threads. They must not call Streamlit. ``agent_asker``
+builds them from an app's agent and SQL calls, with model routing and usage
+metering; the apps run those calls in the scheduler's ``bulk`` class, below
+interactive and sidebar work. ``render_bulk_questions`` is the upload, run and
+download view the apps share.
+"""
+import csv
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+MAX_QUESTIONS = 500
+
+# Rows of each SQL result kept in the downloadable results
+MAX_RESULT_ROWS = 1000
+
+# Seconds between redraws of the live results table during a run
+LIVE_REFRESH_S = 1.0
+
+RESULT_COLUMNS = ["INDEX", "QUESTION", "STATUS", "ANSWER", "SQL", "ROWS", "AGENT_S", "SQL_S", "TOTAL_S",
+                  "ERROR", "RESULT_JSON"]
+
+
+def read_questions(name, data, limit=MAX_QUESTIONS):
+    """Distinct non-empty questions of an uploaded file, in file order"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if name.lower().endswith(".csv"):
+        rows = list(csv.reader(io.StringIO(text)))
+        header = [h.strip().lower() for h in rows[0]] if rows else []
+        column = header.index("question") if "question" in header else 0
+        body = rows[1:] if "question" in header else rows
+        candidates = [row[column] for row in body if len(row) > column]
+    else:
+        candidates = text.splitlines()
+    questions = list(dict.fromkeys(q.strip() for q in candidates if q.strip()))
+    return questions[:limit]
+
+
+class RateLimiter:
+    """Spaces call starts evenly at ``per_minute``, across threads"""
+
+    def __init__(self, per_minute):
+        self.interval_s = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval_s
+        if start > now:
+            time.sleep(start - now)
+
+
+def _answer_one(index, question, answer, query, limiter, stopped):
+    limiter.acquire()
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(INDEX=index, QUESTION=question, STATUS="ok")
+    if stopped.is_set():
+        row["STATUS"] = "cancelled"
+        return row
+    started = time.perf_counter()
+    try:
+        text, sql = answer(question)
+        row["AGENT_S"] = time.perf_counter() - started
+        row.update(ANSWER=text or None, SQL=sql or None)
+        if sql:
+            sql_started = time.perf_counter()
+            frame = query(sql)
+            row["SQL_S"] = time.perf_counter() - sql_started
+            row["ROWS"] = len(frame)
+            row["RESULT_JSON"] = frame.head(MAX_RESULT_ROWS).to_json(orient="records", date_format="iso")
+        if not text and not sql:
+            row["STATUS"] = "no answer"
+    except Exception as e:
+        row.update(STATUS="failed", ERROR=str(e))
+    row["TOTAL_S"] = time.perf_counter() - started
+    return row
+
+
+def run_bulk(questions, answer, query, max_concurrency=4, per_minute=60):
+    """Result rows in completion order; a failed question yields a row with STATUS 'failed'"""
+    limiter = RateLimiter(per_minute)
+    stopped = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bulk-question")
+    try:
+        futures = [pool.submit(_answer_one, i, q, answer, query, limiter, stopped)
+                   for i, q in enumerate(questions, 1)]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Closing the generator lands here; questions waiting on the rate limiter are skipped too
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def results_frame(rows):
+    """Result rows as a DataFrame in question order"""
+    import pandas as pd
+    frame = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    return frame.sort_values("INDEX").reset_index(drop=True)
+
+
+def summarize(frame, elapsed_s):
+    """Throughput, failures and latency percentiles of a run"""
+    import numpy as np
+    latency = frame["TOTAL_S"].dropna().to_numpy(dtype=float)
+    return {
+        "questions": len(frame),
+        "answered": int((frame["STATUS"] == "ok").sum()),
+        "failed": int((frame["STATUS"] == "failed").sum()),
+        "per_minute": len(frame) / elapsed_s * 60 if elapsed_s else 0.0,
+        "p50_s": float(np.percentile(latency, 50)) if len(latency) else None,
+        "p95_s": float(np.percentile(latency, 95)) if len(latency) else None,
+    }
+
+
+def to_csv_bytes(frame):
+    return frame.to_csv(index=False).encode("utf-8")
+
+
+def to_parquet_bytes(frame):
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def agent_asker(send, parse, run_query, router, meter, user, session_id):
+    """``answer`` and ``query`` callables for ``run_bulk``, routed, within the usage budget and metered.
+
+    ``send(question, model)`` returns the agent's events, ``parse(events)``
+    their ``(text, sql)`` and ``run_query(sql)`` the result frame.
+    """
+    def answer(question):
+        route, model = router.route(question)
+        model = meter.agent_model(user, model)
+        if model is None:
+            raise RuntimeError("this hour's usage budget is spent")
+        started = time.perf_counter()
+        answered = False
+        try:
+            events = send(question, model)
+            text, sql = parse(events)
+            meter.record_agent(user, session_id, model, question, events, lambda: text + sql,
+                               (time.perf_counter() - started) * 1000)
+            answered = True
+            return text, sql
+        finally:
+            router.record(route, time.perf_counter() - started, answered)
+
+    def query(sql):
+        df = run_query(sql.replace(';', ''))
+        footprint = df.attrs.get("footprint", {})
+        if footprint.get("source") != "memory":
+            meter.record_query(user, session_id, footprint.get("query_id"))
+        return df
+
+    return answer, query
+
+
+@st.fragment
+def render_bulk_questions(asker):
+    """Bulk question runs from an uploaded file; running and downloading rerun only this view.
+
+    ``asker()`` is called in the script thread when a run starts and returns
+    the ``answer`` and ``query`` callables, for example from ``agent_asker``.
+    """
+    with st.expander("📚 Bulk Questions"):
+        upload = st.file_uploader("Questions: a .txt file with one per line, or a .csv file with a question column",
+                                  type=["txt", "csv"], key="bulk_file")
+        col1, col2 = st.columns(2)
+        concurrency = col1.slider("Concurrent questions", 1, 8, 4, key="bulk_concurrency")
+        per_minute = col2.number_input("Questions per minute", min_value=1, max_value=600, value=60, key="bulk_rate")
+        questions = read_questions(upload.name, upload.getvalue()) if upload is not None else []
+        if upload is not None:
+            st.caption(f"{len(questions):,} questions")
+        if questions and st.button("▶️ Run questions", key="bulk_run"):
+            answer, query = asker()
+            progress, live = st.empty(), st.empty()
+            rows = []
+            started = time.perf_counter()
+            drawn = 0.0
+            for row in run_bulk(questions, answer, query, concurrency, per_minute):
+                rows.append(row)
+                progress.progress(len(rows) / len(questions), text=f"{len(rows)} of {len(questions)} questions done")
+                # Each redraw rebuilds the whole table, so redraw at most every LIVE_REFRESH_S
+                if time.perf_counter() - drawn >= LIVE_REFRESH_S:
+                    live.dataframe(results_frame(rows).drop(columns=["RESULT_JSON"]), hide_index=True, use_container_width=True)
+                    drawn = time.perf_counter()
+            progress.empty()
+            live.empty()
+            st.session_state.bulk_results = (results_frame(rows), time.perf_counter() - started)
+
+        if 'bulk_results' not in st.session_state:
+            return
+        results, elapsed_s = st.session_state.bulk_results
+        summary = summarize(results, elapsed_s)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Answered", f"{summary['answered']:,} / {summary['questions']:,}")
+        col2.metric("Failed", f"{summary['failed']:,}")
+        col3.metric("Throughput", f"{summary['per_minute']:.1f} / min")
+        col4.metric("p50 / p95", f"{summary['p50_s'] or 0:.1f}s / {summary['p95_s'] or 0:.1f}s")
+        st.dataframe(results.drop(columns=["RESULT_JSON"]), hide_index=True, use_container_width=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("⬇️ Parquet", to_parquet_bytes(results), "bulk_questions.parquet",
+                             "application/vnd.apache.parquet", key="bulk_parquet")
+        col2.download_button("⬇️ CSV", to_csv_bytes(results), "bulk_questions.csv", "text/csv", key="bulk_csv")
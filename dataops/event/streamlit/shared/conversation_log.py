@@ -0,0 +1,192 @@
+"""
+Write-behind persistence of chat turns to ``CONVERSATION_HISTORY``.
+
+Without it, a conversation exists only in ``st.session_state``. It is lost on
+reload, and nobody can analyse it afterwards. Inserting each turn while
+answering would add a round trip to every answer. Instead, one
+``ConversationLog`` per app process (via ``st.cache_resource``):
+
+* ``record`` appends the finished turn to a bounded in-memory queue and returns
+  at once. When the queue is full, the oldest turn is dropped and counted.
+* a daemon thread inserts the queue in batches of up to ``batch_size`` rows,
+  every ``flush_s`` seconds or as soon as a batch fills up. Failed batches are
+  retried with exponential backoff.
+* ``restore`` rebuilds a conversation's messages from the table plus any of its
+  turns still queued. The apps call it once per session, when a reloaded page
+  brings its conversation ID back in the URL. Only the user who asked the
+  turns gets them back; a link to someone else's conversation starts a new one.
+"""
+import atexit
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+COLUMNS = ["APP", "CONVERSATION_ID", "TURN", "USER_NAME", "QUESTION", "ANSWER", "SQL_TEXT",
+           "MODEL", "ROUTE", "AGENT_MS", "ANSWER_MS", "ASKED_AT"]
+
+# Another user's turns come back as bare rows, so their text never leaves Snowflake
+RESTORE_SQL = """
+SELECT turn, IFF(mine, question, NULL) AS question, IFF(mine, answer, NULL) AS answer, mine
+FROM (
+    SELECT turn, question, answer, EQUAL_NULL(user_name, ?) AS mine
+    FROM conversation_history
+    WHERE app = ? AND conversation_id = ?
+)
+ORDER BY turn
+"""
+
+
+def insert_sql(rows):
+    """Multi-row INSERT with one bind variable per value"""
+    values = "(" + ", ".join("?" * len(COLUMNS)) + ")"
+    return f"INSERT INTO conversation_history ({', '.join(COLUMNS)}) VALUES " + ", ".join([values] * rows)
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+def to_messages(turns):
+    """Chat messages for (question, answer) pairs"""
+    messages = []
+    for question, answer in turns:
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    return messages
+
+
+class ConversationLog:
+    """Bounded queue of answered turns, inserted in batches by a background thread.
+
+    ``writer(sql, params)`` runs an INSERT and ``loader(user, app, conversation_id)``
+    returns the ``RESTORE_SQL`` result as a DataFrame.
+    """
+
+    def __init__(self, app, writer, loader, max_queue=2000, batch_size=100, flush_s=2.0,
+                 max_attempts=5, backoff_s=1.0, max_conversations=10000):
+        self.app = app
+        self.writer = writer
+        self.loader = loader
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.max_conversations = max_conversations
+        self._queue = deque()
+        self._inflight = []
+        self._turns = OrderedDict()  # conversation_id -> last turn number
+        self.counters = {"queued": 0, "written": 0, "dropped": 0, "retries": 0, "batches": 0}
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def _next_turn(self, conversation_id):
+        turn = self._turns.pop(conversation_id, 0) + 1
+        self._turns[conversation_id] = turn
+        while len(self._turns) > self.max_conversations:
+            self._turns.popitem(last=False)
+        return turn
+
+    def record(self, conversation_id, question, answer, sql=None, model=None, route=None,
+               agent_ms=None, answer_ms=None, user=None):
+        """Queue one answered turn; never waits on Snowflake"""
+        asked_at = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+        with self._cond:
+            row = (self.app, conversation_id, self._next_turn(conversation_id), user, question, answer,
+                   sql or None, model, route, agent_ms, answer_ms, asked_at)
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.counters["dropped"] += 1
+            self._queue.append(row)
+            self.counters["queued"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _take_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._queue) >= self.batch_size, timeout=self.flush_s)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._inflight = batch
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        params = [value for row in batch for value in row]
+        for attempt in range(self.max_attempts):
+            try:
+                self.writer(insert_sql(len(batch)), params)
+            except Exception as e:
+                self.last_error = e
+                with self._cond:
+                    self.counters["retries"] += 1
+                time.sleep(self.backoff_s * 2 ** attempt)
+                continue
+            self.last_error = None
+            with self._cond:
+                self.counters["written"] += len(batch)
+                self.counters["batches"] += 1
+                self._inflight = []
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self.counters["dropped"] += len(batch)
+            self._inflight = []
+            self._cond.notify_all()
+
+    def restore(self, conversation_id, user):
+        """Messages of ``user``'s conversation: its stored turns plus any not yet written.
+
+        Returns None when the conversation has turns by another user.
+        """
+        turns = {}
+        try:
+            frame = self.loader(user, self.app, conversation_id)
+            for turn, question, answer, mine in frame[["TURN", "QUESTION", "ANSWER", "MINE"]].itertuples(index=False):
+                if not mine:
+                    return None
+                turns[int(turn)] = (question, answer)
+        except Exception as e:
+            # An unreadable history starts the conversation afresh rather than failing the page
+            self.last_error = e
+        with self._cond:
+            for row in list(self._inflight) + list(self._queue):
+                if row[1] == conversation_id:
+                    if row[3] != user:
+                        return None
+                    turns[row[2]] = (row[4], row[5])
+            if turns:
+                self._turns[conversation_id] = max(self._turns.get(conversation_id, 0), max(turns))
+        return to_messages(turns[t] for t in sorted(turns))
+
+    def flush(self, timeout_s=10.0):
+        """Wait until every queued turn is written or dropped, for at most ``timeout_s``"""
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            if self._thread is None:
+                return not self._queue
+            self._cond.notify_all()
+            while self._queue or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, self.flush_s))
+                self._cond.notify_all()
+        return True
+
+    def stats(self):
+        with self._cond:
+            counters = dict(self.counters, pending=len(self._queue) + len(self._inflight))
+        counters["last_error"] = str(self.last_error) if self.last_error else None
+        return counters
@@ -0,0 +1,148 @@
+"""
+Time-series downsampling for charts over large results.
+
+A per-tower ``MEASUREMENT_TIMESTAMP`` series over a few weeks is hundreds of
+thousands of points, far more than a chart a few hundred pixels wide can
+show. ``downsample_frame`` cuts a frame to a point budget while keeping its
+visual shape:
+
+* ``minmax_indices`` keeps the min and max of equal-count buckets, so no peak
+  or dip is lost (fully vectorized)
+* ``lttb_indices`` (Largest-Triangle-Three-Buckets) picks the point per
+  bucket that best preserves the line's shape
+
+Large inputs go through min/max first and LTTB over the survivors, which
+keeps LTTB's per-bucket loop short.
+"""
+
+import streamlit as st
+
+MAX_CHART_POINTS = 2000
+# Min/max preselection keeps this many candidates per output point
+PRESELECT_RATIO = 4
+
+
+def _as_float(values):
+    import numpy as np
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64) or np.issubdtype(values.dtype, np.timedelta64):
+        return values.astype("int64").astype(np.float64)
+    return values.astype(np.float64)
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max of each of ``n_buckets`` equal-count buckets"""
+    import numpy as np
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the Largest-Triangle-Three-Buckets selection of ``n_out`` points"""
+    import numpy as np
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Interior points 1..n-2 split into n_out-2 buckets; the end points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.r_[mean_x[1:], x[-1]]
+    next_y = np.r_[mean_y[1:], y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample_indices(x, y, n_out):
+    """Shape-preserving selection of at most ``n_out`` points of one series"""
+    import numpy as np
+    x, y = _as_float(x), _as_float(y)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= n_out:
+        return valid
+    x, y = x[valid], y[valid]
+    if len(x) > 2 * PRESELECT_RATIO * n_out:
+        keep = np.union1d(minmax_indices(y, PRESELECT_RATIO * n_out // 2), [0, len(x) - 1])
+        return valid[keep[lttb_indices(x[keep], y[keep], n_out)]]
+    return valid[lttb_indices(x, y, n_out)]
+
+
+def is_time_series(df):
+    """Whether a frame is indexed by time (or another ordered number) and has values to plot"""
+    import pandas as pd
+    index = df.index
+    ordered = pd.api.types.is_datetime64_any_dtype(index) or (
+        pd.api.types.is_numeric_dtype(index) and not isinstance(index, pd.RangeIndex))
+    return ordered and len(df.select_dtypes(include="number").columns) > 0
+
+
+def downsample_frame(df, max_points=MAX_CHART_POINTS):
+    """Rows of a time-indexed frame needed to draw every numeric column within ``max_points``.
+
+    Text or categorical columns are treated as series keys (one line per
+    tower, region, ...) and each series gets its share of the budget. When
+    there are too many series for 3 points each, only the largest are kept.
+    """
+    import numpy as np
+    if len(df) <= max_points or not is_time_series(df):
+        return df
+    df = df.sort_index(kind="stable")
+    values = df.select_dtypes(include="number").columns
+    keys = [c for c in df.columns if c not in values]
+    x = df.index.values
+    groups = [np.arange(len(df))] if not keys else list(df.groupby(keys, observed=True, sort=False).indices.values())
+    # Drop the smallest series rather than overrun the budget with 3-point floors
+    room = max(1, max_points // (3 * len(values)))
+    if len(groups) > room:
+        groups = sorted(groups, key=len, reverse=True)[:room]
+    budget = max(3, max_points // (len(values) * len(groups)))
+    selected = [rows[downsample_indices(x[rows], df[col].values[rows], budget)]
+                for rows in groups for col in values]
+    return df.iloc[np.unique(np.concatenate(selected))]
+
+
+def zoom_bounds(df, steps=500):
+    """(start, end, step) for a range slider over a time-indexed frame"""
+    import pandas as pd
+    start, end = df.index.min(), df.index.max()
+    if isinstance(start, pd.Timestamp):
+        start, end = start.to_pydatetime(), end.to_pydatetime()
+    else:
+        start, end = float(start), float(end)
+    return start, end, (end - start) / steps
+
+
+@st.fragment
+def render_chart(analysis_results, chart_code, key, fallback_code=None):
+    """Run chart code over at most MAX_CHART_POINTS points; zooming reruns only this chart.
+
+    ``chart_code`` and ``fallback_code`` are single ``st.*_chart`` calls over
+    ``analysis_results``.
+    """
+    if len(analysis_results) > MAX_CHART_POINTS and is_time_series(analysis_results):
+        start, end, step = zoom_bounds(analysis_results)
+        if start < end:
+            low, high = st.slider("Zoom", min_value=start, max_value=end, value=(start, end), step=step, key=key)
+            visible = analysis_results.sort_index().loc[low:high]
+            analysis_results = downsample_frame(visible)
+            st.caption(f"Showing {len(analysis_results):,} of {len(visible):,} points")
+    try:
+        exec(chart_code, {"st": st, "analysis_results": analysis_results})
+    except Exception:
+        if fallback_code:
+            exec(fallback_code, {"st": st, "analysis_results": analysis_results})
@@ -0,0 +1,85 @@
+"""
+Plotly figures cached as JSON, keyed by a fingerprint of their data.
+
+Building a figure with ``plotly.express`` and validating it takes tens of
+milliseconds, and the dashboards did it for every chart on every rerun. Most
+reruns redraw charts over the same data. One ``FigureCache`` per app process
+(via ``st.cache_resource``) maps (chart kind, ``frame_fingerprint`` of the
+input, chart parameters) to the figure's JSON:
+
+* on a miss, ``build(frame, **params)`` makes the figure once and its
+  validated JSON is stored.
+* on a hit, the JSON becomes a figure again without validation, which
+  ``st.plotly_chart`` serializes as is.
+
+Entries are evicted least recently used first, beyond ``max_entries`` figures
+or ``max_bytes`` of JSON.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def frame_fingerprint(frame):
+    """Hash of a DataFrame's columns, dtypes and values"""
+    import pandas as pd
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in frame.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def figure_from_json(spec):
+    """Figure of JSON made by ``pio.to_json``, which was validated when it was built"""
+    import plotly.graph_objects as go
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+class FigureCache:
+    """LRU cache of figure JSON by chart kind, data fingerprint and parameters"""
+
+    def __init__(self, max_entries=64, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def _store(self, key, spec):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = spec
+            self._bytes += len(spec)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def figure(self, kind, frame, build, **params):
+        """Figure of ``build(frame, **params)``, built only when this data and these parameters are new"""
+        import plotly.io as pio
+        if frame is None or frame.empty:
+            return build(frame, **params)
+        key = (kind, frame_fingerprint(frame), json.dumps(params, sort_keys=True, default=str))
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+            else:
+                self.counters["misses"] += 1
+        if spec is not None:
+            return figure_from_json(spec)
+        fig = build(frame, **params)
+        if fig is not None:
+            self._store(key, pio.to_json(fig, validate=False))
+        return fig
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self._entries), kb=round(self._bytes / 1024, 1),
+                        hit_rate=self.counters["hits"] / lookups if lookups else None)
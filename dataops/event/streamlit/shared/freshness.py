@@ -0,0 +1,161 @@
+"""
+Table-freshness watermarks for exact cache invalidation.
+
+``Watermarks`` polls cheap change markers for the telco tables:
+``SYSTEM$LAST_CHANGE_COMMIT_TIME`` for each table, which is metadata only,
+plus the version that the active-alerts task writes each time it consumes the
+``NETWORK_INCIDENTS`` stream. Each table gets a version number that goes up
+whenever its marker changes. The commit time moves only when DML changes a
+table's data. ``LAST_ALTERED`` in ``INFORMATION_SCHEMA.TABLES`` also moves on
+background maintenance such as automatic clustering, which would drop valid
+cache entries. Dynamic tables (the rollup pyramid and ``INCIDENT_KPI_IMPACT``)
+and ``CUSTOMER_CHURN_SCORES`` are tracked by their own commit time, which moves
+when a refresh or scoring run writes them, not by their sources.
+
+A daemon thread polls the markers every ``poll_s`` seconds, so reading the
+versions never waits on Snowflake or on the scheduler's background slots. It
+stops after ``idle_s`` seconds without a read, so an unused app lets its
+warehouse suspend, and the next read starts it again.
+
+A cached query or answer is tagged with the versions of the tables it read
+(``tag``, ``tag_sql``, or ``answer_tables`` for agent responses) and stays
+valid exactly while ``is_current(tag)`` holds. For ``st.cache_data``
+functions, passing the tag as an argument has the same effect: a new version
+makes a new cache key.
+"""
+import re
+import threading
+import time
+
+from time_pyramid import LEVELS, SOURCES as ROLLUP_SOURCES
+
+# Dynamic tables refresh some time after their sources change. Tracking them by their
+# sources would invalidate a cached read before the refresh and keep the re-read stale
+# result current, so each has its own marker, which moves when a refresh commits.
+DYNAMIC_TABLES = [f"{source}_ROLLUP_{suffix}" for source in ROLLUP_SOURCES for suffix, _ in LEVELS] + [
+    "INCIDENT_KPI_IMPACT"]
+
+# CUSTOMER_CHURN_SCORES is rewritten by its own tasks, after its sources change and
+# once a day without any source change, so it has its own marker too
+TABLES = ["NETWORK_PERFORMANCE", "CUSTOMER_USAGE", "SERVICE_QUALITY_METRICS",
+          "NETWORK_INCIDENTS", "NETWORK_DOCUMENTATION", "ACTIVE_ALERTS", "CUSTOMER_CHURN_SCORES"] + DYNAMIC_TABLES
+
+# Views over the tracked tables; reading them depends on their sources
+DERIVED = {
+    "CUSTOMER_CHURN_FEATURES": ["CUSTOMER_USAGE", "SERVICE_QUALITY_METRICS", "NETWORK_INCIDENTS"],
+}
+
+MARKERS_SQL = """
+{tables}
+UNION ALL
+SELECT 'ACTIVE_ALERTS_STREAM', TO_VARCHAR(version)
+FROM alert_feed_state
+"""
+
+TABLE_MARKER_SQL = "SELECT '{table}' AS table_name, TO_VARCHAR(SYSTEM$LAST_CHANGE_COMMIT_TIME('{table}')) AS marker"
+
+_TABLE_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(TABLES + list(DERIVED), key=len, reverse=True)) + r")(?:_\w+)?\b", re.IGNORECASE)
+
+_SEARCH_RESULTS = re.compile(r'"searchResults"\s*:\s*\[\s*\{')
+
+
+def markers_sql():
+    return MARKERS_SQL.format(tables="\nUNION ALL\n".join(TABLE_MARKER_SQL.format(table=t) for t in TABLES))
+
+
+def tables_in(sql):
+    """Tracked tables an SQL statement (or any text holding one) reads, including through derived tables"""
+    found = set()
+    for match in _TABLE_PATTERN.finditer(sql or ""):
+        name = match.group(1).upper()
+        found.update(DERIVED.get(name, [name]))
+    return found
+
+
+def answer_tables(content):
+    """Tracked tables behind an agent response: those its SQL reads, plus the documents it cited"""
+    found = tables_in(content)
+    if _SEARCH_RESULTS.search(content or ""):
+        found.add("NETWORK_DOCUMENTATION")
+    return found
+
+
+class Watermarks:
+    """Per-table version numbers, bumped when a table's change marker moves.
+
+    The first call to ``versions`` starts the polling thread. Until its first
+    poll lands every table is at version 0, the same as right after it.
+    """
+
+    def __init__(self, loader, poll_s=10, idle_s=600):
+        self.loader = loader
+        self.poll_s = poll_s
+        self.idle_s = idle_s
+        self.read_at = 0.0
+        self.markers = {}
+        self.table_versions = {t: 0 for t in TABLES}
+        self.polled_at = 0.0
+        self.polls = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._poll()
+            time.sleep(self.poll_s)
+            with self._lock:
+                if time.time() - self.read_at >= self.idle_s:
+                    self._thread = None
+                    return
+
+    def _poll(self):
+        self.polled_at = time.time()
+        self.polls += 1
+        try:
+            frame = self.loader()
+        except Exception as e:
+            # Keep the current versions; caches stay valid until the markers can be read again
+            self.last_error = e
+            return
+        self.last_error = None
+        markers = {}
+        for name, marker in frame[["TABLE_NAME", "MARKER"]].itertuples(index=False):
+            # The task's version is the stream offset for NETWORK_INCIDENTS as seen by ACTIVE_ALERTS
+            table = "ACTIVE_ALERTS" if name == "ACTIVE_ALERTS_STREAM" else str(name).upper()
+            markers[table] = tuple(sorted(markers.get(table, ()) + (str(marker),)))
+        with self._lock:
+            for table, marker in markers.items():
+                if table in self.markers and self.markers[table] != marker:
+                    self.table_versions[table] = self.table_versions.get(table, 0) + 1
+            self.markers.update(markers)
+
+    def versions(self):
+        """Last polled version of every tracked table; never waits for a poll"""
+        with self._lock:
+            self.read_at = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="freshness-poll", daemon=True)
+                self._thread.start()
+            return dict(self.table_versions)
+
+    def tag(self, tables):
+        """Hashable (table, version) pairs for the given tables"""
+        versions = self.versions()
+        return tuple(sorted((t, versions.get(t, 0)) for t in tables))
+
+    def tag_sql(self, sql):
+        return self.tag(tables_in(sql))
+
+    def is_current(self, tag):
+        versions = self.versions()
+        return all(versions.get(t, 0) == v for t, v in tag or ())
+
+    def stats(self):
+        return {
+            "versions": dict(self.table_versions),
+            "polls": self.polls,
+            "age_s": time.time() - self.polled_at if self.polled_at else None,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
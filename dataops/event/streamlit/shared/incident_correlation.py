@@ -0,0 +1,213 @@
+"""
+Correlation of network incidents with KPI degradation.
+
+``IncidentIndex`` holds ``NETWORK_INCIDENTS`` as ``[start, end)`` intervals
+per region in sorted endpoint arrays. Still-open incidents
+(``INCIDENT_END_TIME IS NULL``) run until now. ``overlapping`` answers a whole
+batch of (region, window) lookups at once. A candidate incident has to start
+before the window ends and no earlier than the window start minus the
+region's longest incident; the candidates are then filtered on their end time.
+
+``degraded_windows`` finds runs of 15-minute buckets in which a region's KPIs
+are well off their usual level. ``attach_incidents`` labels each window with
+the incidents that overlap it. ``kpi_deltas`` compares each incident's KPIs
+before and during the incident using prefix sums over the same series.
+
+``INCIDENT_KPI_IMPACT`` in ``configure_attendee_account.sql`` holds the same
+before/during deltas for the semantic model.
+"""
+from datetime import timedelta
+
+# Metric and the sign of a bad deviation
+METRICS = {"LATENCY_MS": 1, "PACKET_LOSS_PERCENT": 1, "THROUGHPUT_MBPS": -1, "UPTIME_PERCENT": -1}
+
+INCIDENTS_SQL = """
+SELECT incident_id, incident_type, severity_level, affected_region,
+       incident_start_time, incident_end_time, customers_affected
+FROM network_incidents
+WHERE COALESCE(incident_end_time, CURRENT_TIMESTAMP()) >= DATEADD(hour, -{hours}, CURRENT_TIMESTAMP())
+"""
+SERIES_SQL = """
+SELECT BUCKET_START, REGION,
+    {measures}
+FROM network_performance_rollup_15m
+WHERE bucket_start >= DATEADD(hour, -{hours}, CURRENT_TIMESTAMP())
+GROUP BY ALL
+"""
+
+# Region codes are spaced this many seconds apart in the combined search keys
+_REGION_STRIDE = 10 ** 11
+
+
+def incidents_sql(hours=168):
+    return INCIDENTS_SQL.format(hours=int(hours))
+
+
+def series_sql(hours=168):
+    """Per-region 15-minute KPI counts and sums from the rollup pyramid"""
+    measures = ",\n    ".join(f"SUM({m}_N) AS {m}_N, SUM({m}_SUM) AS {m}_SUM" for m in METRICS)
+    return SERIES_SQL.format(measures=measures, hours=int(hours))
+
+
+def _seconds(values):
+    import numpy as np
+    import pandas as pd
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+class IncidentIndex:
+    """Incidents as intervals per region, sorted by (region, start)"""
+
+    def __init__(self, incidents, now=None):
+        import numpy as np
+        import pandas as pd
+        frame = incidents.reset_index(drop=True)
+        now = int(pd.Timestamp(now or pd.Timestamp.now()).timestamp())
+        start = _seconds(frame["INCIDENT_START_TIME"])
+        end_times = pd.to_datetime(frame["INCIDENT_END_TIME"])
+        self.is_open = end_times.isna().to_numpy()
+        end = np.where(self.is_open, now, _seconds(end_times.fillna(pd.Timestamp(0))))
+        end = np.maximum(end, start)
+
+        codes, self.regions = pd.factorize(frame["AFFECTED_REGION"].astype(object).fillna("UNKNOWN"), sort=True)
+        self.order = np.lexsort((start, codes))
+        self.frame = frame
+        self.starts, self.ends = start[self.order], end[self.order]
+        self.keys = codes[self.order] * _REGION_STRIDE + self.starts
+        durations = end - start
+        self.max_duration = np.zeros(len(self.regions), dtype=np.int64)
+        np.maximum.at(self.max_duration, codes, durations)
+
+    def __len__(self):
+        return len(self.order)
+
+    def overlapping(self, regions, starts, ends):
+        """(window, incident) row pairs for every incident overlapping a window in its region"""
+        import numpy as np
+        import pandas as pd
+        codes = self.regions.get_indexer(pd.Index(regions).astype(object))
+        a, b = _seconds(starts), _seconds(ends)
+        known = np.flatnonzero(codes >= 0)
+        codes, a, b = codes[known], a[known], b[known]
+        base = codes * _REGION_STRIDE
+        lo = np.searchsorted(self.keys, base + a - self.max_duration[codes], side="left")
+        hi = np.searchsorted(self.keys, base + b, side="left")
+        counts = np.maximum(hi - lo, 0)
+        window = np.repeat(np.arange(len(codes)), counts)
+        candidate = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        keep = self.ends[candidate] > a[window]
+        return known[window[keep]], self.order[candidate[keep]]
+
+
+def _region_prefix_sums(series):
+    """Series sorted by (region, bucket) with prefix sums of the metric counts and sums"""
+    import numpy as np
+    import pandas as pd
+    series = series.sort_values(["REGION", "BUCKET_START"], kind="stable").reset_index(drop=True)
+    codes, regions = pd.factorize(series["REGION"], sort=True)
+    keys = codes * _REGION_STRIDE + _seconds(series["BUCKET_START"])
+    counts = series[[f"{m}_N" for m in METRICS]].to_numpy(dtype=np.float64, na_value=0)
+    sums = series[[f"{m}_SUM" for m in METRICS]].to_numpy(dtype=np.float64, na_value=0)
+    zero = np.zeros((1, len(METRICS)))
+    return regions, keys, np.vstack([zero, np.cumsum(counts, axis=0)]), np.vstack([zero, np.cumsum(sums, axis=0)])
+
+
+def _window_means(prefix, regions, starts, ends):
+    """Metric means over [start, end) per region from prefix sums; NaN without samples"""
+    import numpy as np
+    import pandas as pd
+    labels, keys, count_sums, value_sums = prefix
+    codes = labels.get_indexer(pd.Index(regions).astype(object))
+    base = np.where(codes >= 0, codes, 0) * _REGION_STRIDE
+    lo = np.searchsorted(keys, base + _seconds(starts), side="left")
+    hi = np.searchsorted(keys, base + _seconds(ends), side="left")
+    n = count_sums[hi] - count_sums[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (value_sums[hi] - value_sums[lo]) / n
+    return np.where((n > 0) & (codes >= 0)[:, None], means, np.nan)
+
+
+def kpi_deltas(index, series, baseline_hours=24, now=None):
+    """KPI means in the ``baseline_hours`` before each incident and while it lasted"""
+    import numpy as np
+    import pandas as pd
+    frame = index.frame
+    if frame.empty or series.empty:
+        return pd.DataFrame()
+    now = pd.Timestamp(now or pd.Timestamp.now())
+    start = pd.to_datetime(frame["INCIDENT_START_TIME"])
+    end = pd.to_datetime(frame["INCIDENT_END_TIME"]).fillna(now)
+    prefix = _region_prefix_sums(series)
+    before = _window_means(prefix, frame["AFFECTED_REGION"], start - pd.Timedelta(hours=baseline_hours), start)
+    during = _window_means(prefix, frame["AFFECTED_REGION"], start, np.maximum(end, start))
+
+    result = frame[["INCIDENT_ID", "INCIDENT_TYPE", "SEVERITY_LEVEL", "AFFECTED_REGION",
+                    "INCIDENT_START_TIME", "INCIDENT_END_TIME"]].copy()
+    result["IS_OPEN"] = index.is_open
+    for m, metric in enumerate(METRICS):
+        result[f"{metric}_BEFORE"] = before[:, m]
+        result[f"{metric}_DURING"] = during[:, m]
+        result[f"{metric}_DELTA"] = during[:, m] - before[:, m]
+    return result
+
+
+def degraded_windows(series, threshold=4.0, bucket="15min"):
+    """Runs of consecutive buckets in which a region's KPI is ``threshold`` deviations off its mean.
+
+    Deviations are measured per region and metric against the mean and
+    standard deviation over the whole series, in the bad direction only.
+    Returns one row per window with ``REGION``, ``WINDOW_START``, ``WINDOW_END``,
+    the worst ``METRIC`` and its ``SCORE``.
+    """
+    import numpy as np
+    import pandas as pd
+    if series.empty:
+        return pd.DataFrame(columns=["REGION", "WINDOW_START", "WINDOW_END", "METRIC", "SCORE"])
+    series = series.sort_values(["REGION", "BUCKET_START"], kind="stable").reset_index(drop=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = pd.DataFrame({m: series[f"{m}_SUM"] / series[f"{m}_N"] for m in METRICS})
+    grouped = means.groupby(series["REGION"], sort=False, observed=True)
+    scores = (means - grouped.transform("mean")) / grouped.transform("std") * pd.Series(METRICS)
+    scores = scores.to_numpy(dtype=np.float64, na_value=np.nan)
+    worst = np.nanmax(np.where(np.isnan(scores), -np.inf, scores), axis=1)
+    flagged = np.flatnonzero(worst > threshold)
+    if not len(flagged):
+        return pd.DataFrame(columns=["REGION", "WINDOW_START", "WINDOW_END", "METRIC", "SCORE"])
+
+    step = pd.Timedelta(bucket)
+    region = series["REGION"].to_numpy()[flagged]
+    start = pd.to_datetime(series["BUCKET_START"]).to_numpy()[flagged]
+    # A window continues while the next flagged bucket is the next bucket of the same region
+    new_window = np.r_[True, (region[1:] != region[:-1]) | (start[1:] - start[:-1] != step.to_timedelta64())]
+    window_id = np.cumsum(new_window) - 1
+    best = pd.Series(worst[flagged]).groupby(window_id).idxmax().to_numpy()
+    metrics = np.array(list(METRICS))[np.argmax(np.where(np.isnan(scores[flagged]), -np.inf, scores[flagged]), axis=1)]
+    firsts = np.flatnonzero(new_window)
+    lasts = np.r_[firsts[1:], len(flagged)] - 1
+    return pd.DataFrame({
+        "REGION": region[firsts],
+        "WINDOW_START": start[firsts],
+        "WINDOW_END": start[lasts] + step.to_timedelta64(),
+        "METRIC": metrics[best],
+        "SCORE": worst[flagged][best],
+    })
+
+
+def attach_incidents(windows, index, lead=timedelta(0)):
+    """Degraded windows with the overlapping incidents of their region.
+
+    ``lead`` widens each window backwards, so incidents that began shortly
+    before the KPIs moved are attached as well. Windows no incident explains
+    keep an empty ``INCIDENTS`` list.
+    """
+    import pandas as pd
+    windows = windows.reset_index(drop=True)
+    if windows.empty or not len(index):
+        return windows.assign(INCIDENTS=[[] for _ in range(len(windows))])
+    rows, incidents = index.overlapping(windows["REGION"], pd.to_datetime(windows["WINDOW_START"]) - lead,
+                                        windows["WINDOW_END"])
+    ids = index.frame["INCIDENT_ID"].to_numpy()
+    attached = [[] for _ in range(len(windows))]
+    for row, incident in zip(rows, incidents):
+        attached[row].append(ids[incident])
+    return windows.assign(INCIDENTS=attached)
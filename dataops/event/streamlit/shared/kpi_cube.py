@@ -0,0 +1,227 @@
+"""
+In-process OLAP cube of hourly network KPIs.
+
+One aggregate query over ``NETWORK_PERFORMANCE`` (``CUBE_SQL``) fills NumPy
+arrays indexed by (tower, hour bucket, metric) that hold mergeable measures:
+count, sum, sum of squares, min and max. Each tower maps to a region and
+network type code. A slice such as 5G vs 4G_LTE in the Northeast, by hour,
+for the last 24 hours, is then answered from memory with boolean masks and
+sorted ``reduceat`` reductions instead of a new warehouse query.
+
+``CubeCache`` holds the current cube for all sessions of an app. Once the
+cube is older than ``refresh_s`` it is rebuilt on a background thread while
+readers keep using the previous snapshot. Hours are dropped, oldest first,
+until the arrays fit ``max_bytes``.
+"""
+import threading
+import time
+
+METRICS = ["LATENCY_MS", "THROUGHPUT_MBPS", "PACKET_LOSS_PERCENT", "UPTIME_PERCENT"]
+TOWER_DIMENSIONS = ["region", "network_type", "tower"]
+COLUMN_NAMES = {"region": "REGION", "network_type": "NETWORK_TYPE", "tower": "CELL_TOWER_ID"}
+
+CUBE_SQL = """
+SELECT
+    REGION,
+    NETWORK_TYPE,
+    CELL_TOWER_ID,
+    TIME_SLICE(MEASUREMENT_TIMESTAMP, 1, 'HOUR') AS HOUR_BUCKET,
+    {measures}
+FROM network_performance
+WHERE measurement_timestamp >= DATEADD(hour, -{hours}, CURRENT_TIMESTAMP())
+GROUP BY ALL
+"""
+
+# Bytes per (tower, hour, metric) cell: int32 count, float64 sum and sum of squares, float32 min and max
+CELL_BYTES = 4 + 8 + 8 + 4 + 4
+
+
+def cube_sql(hours=168):
+    measures = ",\n    ".join(
+        f"COUNT({m}) AS {m}_N, SUM({m}) AS {m}_SUM, SUM(SQUARE({m})) AS {m}_SUMSQ, "
+        f"MIN({m}) AS {m}_MIN, MAX({m}) AS {m}_MAX"
+        for m in METRICS
+    )
+    return CUBE_SQL.format(measures=measures, hours=int(hours))
+
+
+class KpiCube:
+    """Immutable snapshot of the hourly KPI measures per tower"""
+
+    def __init__(self, frame, max_bytes=None):
+        import numpy as np
+        import pandas as pd
+        self.built_at = time.time()
+        hours = np.sort(pd.to_datetime(frame["HOUR_BUCKET"]).unique())
+        per_hour = max(1, len(frame["CELL_TOWER_ID"].unique())) * len(METRICS) * CELL_BYTES
+        self.truncated = bool(max_bytes) and len(hours) * per_hour > max_bytes
+        if self.truncated:
+            hours = hours[len(hours) - max(1, max_bytes // per_hour):]
+            frame = frame[pd.to_datetime(frame["HOUR_BUCKET"]).isin(hours)]
+        self.hours = hours
+
+        tower_idx, self.towers = pd.factorize(frame["CELL_TOWER_ID"], sort=True)
+        hour_idx = np.searchsorted(hours, pd.to_datetime(frame["HOUR_BUCKET"]).values)
+        first = frame[["REGION", "NETWORK_TYPE"]].astype(object).fillna("UNKNOWN").groupby(tower_idx, sort=True).first()
+        self.tower_region, self.regions = pd.factorize(first["REGION"], sort=True)
+        self.tower_type, self.network_types = pd.factorize(first["NETWORK_TYPE"], sort=True)
+
+        shape = (len(self.towers), len(hours), len(METRICS))
+        self.count = np.zeros(shape, dtype=np.int32)
+        self.total = np.zeros(shape, dtype=np.float64)
+        self.sumsq = np.zeros(shape, dtype=np.float64)
+        self.minimum = np.full(shape, np.inf, dtype=np.float32)
+        self.maximum = np.full(shape, -np.inf, dtype=np.float32)
+        for m, metric in enumerate(METRICS):
+            cells = (tower_idx, hour_idx, m)
+            self.count[cells] = frame[f"{metric}_N"].to_numpy(dtype=np.int32)
+            has_values = self.count[cells] > 0
+            self.total[cells] = np.where(has_values, frame[f"{metric}_SUM"].to_numpy(dtype=np.float64, na_value=0), 0)
+            self.sumsq[cells] = np.where(has_values, frame[f"{metric}_SUMSQ"].to_numpy(dtype=np.float64, na_value=0), 0)
+            self.minimum[cells] = np.where(has_values, frame[f"{metric}_MIN"].to_numpy(dtype=np.float32, na_value=np.inf), np.inf)
+            self.maximum[cells] = np.where(has_values, frame[f"{metric}_MAX"].to_numpy(dtype=np.float32, na_value=-np.inf), -np.inf)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.count, self.total, self.sumsq, self.minimum, self.maximum))
+
+    def _tower_mask(self, regions, network_types, towers):
+        import numpy as np
+        mask = np.ones(len(self.towers), dtype=bool)
+        if regions:
+            mask &= np.isin(self.tower_region, self.regions.get_indexer(list(regions)))
+        if network_types:
+            mask &= np.isin(self.tower_type, self.network_types.get_indexer(list(network_types)))
+        if towers:
+            mask &= np.isin(np.arange(len(self.towers)), self.towers.get_indexer(list(towers)))
+        return mask
+
+    def query(self, metric, group_by=("region",), regions=None, network_types=None, towers=None,
+              start=None, end=None):
+        """Aggregate one metric over a slice of the cube.
+
+        ``group_by`` takes any of ``region``, ``network_type``, ``tower`` and
+        ``hour``. The result has one row per group with ``SAMPLES``,
+        ``AVG_VALUE``, ``MIN_VALUE``, ``MAX_VALUE`` and ``STDDEV_VALUE``.
+        """
+        import numpy as np
+        import pandas as pd
+        group_by = list(group_by or [])
+        unknown = set(group_by) - set(TOWER_DIMENSIONS) - {"hour"}
+        if unknown or metric not in METRICS:
+            raise ValueError(f"cannot slice {metric!r} by {sorted(unknown) or group_by}")
+        m = METRICS.index(metric)
+        tower_sel = np.flatnonzero(self._tower_mask(regions, network_types, towers))
+        hour_mask = np.ones(len(self.hours), dtype=bool)
+        if start is not None:
+            hour_mask &= self.hours >= np.datetime64(start)
+        if end is not None:
+            hour_mask &= self.hours < np.datetime64(end)
+        hour_sel = np.flatnonzero(hour_mask)
+
+        cells = np.ix_(tower_sel, hour_sel)
+        measures = [self.count[..., m][cells], self.total[..., m][cells], self.sumsq[..., m][cells],
+                    self.minimum[..., m][cells], self.maximum[..., m][cells]]
+        if "hour" not in group_by:
+            measures = [a.sum(axis=1, keepdims=True) for a in measures[:3]] + [
+                measures[3].min(axis=1, initial=np.inf, keepdims=True),
+                measures[4].max(axis=1, initial=-np.inf, keepdims=True)]
+
+        # Collapse the tower axis to one row per combination of the tower-level group keys
+        code_columns = {
+            "region": self.tower_region[tower_sel],
+            "network_type": self.tower_type[tower_sel],
+            "tower": tower_sel,
+        }
+        keys = [k for k in TOWER_DIMENSIONS if k in group_by]
+        codes = np.zeros(len(tower_sel), dtype=np.int64)
+        for k in keys:
+            codes = codes * (code_columns[k].max(initial=0) + 1) + code_columns[k]
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0]) if len(order) else np.array([], dtype=np.int64)
+        if len(starts):
+            ufuncs = [np.add, np.add, np.add, np.minimum, np.maximum]
+            count, total, sumsq, low, high = [u.reduceat(a[order], starts, axis=0) for u, a in zip(ufuncs, measures)]
+        else:
+            count = total = sumsq = low = high = np.zeros((0, measures[0].shape[1]))
+        group_rows = order[starts] if len(starts) else np.array([], dtype=np.int64)
+
+        labels = {
+            "region": self.regions[self.tower_region[tower_sel[group_rows]]],
+            "network_type": self.network_types[self.tower_type[tower_sel[group_rows]]],
+            "tower": self.towers[tower_sel[group_rows]],
+        }
+        n_hours = count.shape[1]
+        result = {COLUMN_NAMES[k]: np.repeat(np.asarray(labels[k]), n_hours) for k in keys}
+        if "hour" in group_by:
+            result["HOUR_BUCKET"] = np.tile(self.hours[hour_sel], len(group_rows))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            variance = np.maximum(sumsq / count - mean ** 2, 0)
+        result.update({
+            "SAMPLES": count.ravel(),
+            "AVG_VALUE": mean.ravel(),
+            "MIN_VALUE": np.where(count > 0, low, np.nan).ravel(),
+            "MAX_VALUE": np.where(count > 0, high, np.nan).ravel(),
+            "STDDEV_VALUE": np.sqrt(variance).ravel(),
+        })
+        df = pd.DataFrame(result)
+        return df[df["SAMPLES"] > 0].reset_index(drop=True)
+
+
+class CubeCache:
+    """Current ``KpiCube`` for all sessions, rebuilt in the background when stale"""
+
+    def __init__(self, loader, refresh_s=300, max_bytes=256 * 2 ** 20):
+        self.loader = loader
+        self.refresh_s = refresh_s
+        self.max_bytes = max_bytes
+        self.cube = None
+        self.last_error = None
+        self.builds = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._first_build = threading.Lock()
+
+    def _build(self):
+        try:
+            cube = KpiCube(self.loader(), self.max_bytes)
+            with self._lock:
+                self.cube, self.last_error = cube, None
+                self.builds += 1
+        except Exception as e:
+            with self._lock:
+                self.last_error = e
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """The current cube; the first call builds it, later stale calls refresh in the background"""
+        with self._lock:
+            cube = self.cube
+            refresh = cube is not None and not self._refreshing and time.time() - cube.built_at >= self.refresh_s
+            if refresh:
+                self._refreshing = True
+        if refresh:
+            threading.Thread(target=self._build, name="kpi-cube-refresh", daemon=True).start()
+        elif cube is None:
+            with self._first_build:
+                if self.cube is None:
+                    self._build()
+            if self.cube is None:
+                raise self.last_error
+        return self.cube or cube
+
+    def stats(self):
+        with self._lock:
+            cube = self.cube
+            return {
+                "builds": self.builds,
+                "towers": len(cube.towers) if cube else 0,
+                "hours": len(cube.hours) if cube else 0,
+                "mb": cube.nbytes / 2 ** 20 if cube else 0.0,
+                "age_s": time.time() - cube.built_at if cube else None,
+                "truncated": cube.truncated if cube else False,
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
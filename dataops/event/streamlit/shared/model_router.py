@@ -0,0 +1,140 @@
+"""
+Latency-aware model routing for the agent and Cortex Complete calls.
+
+Each request is classified into a route and sent to the model configured for
+that route in ``model_routes.yaml``:
+
+* ``chart``   - chart-suggestion prompts for Cortex Complete
+* ``simple``  - short questions that touch a single semantic-model table
+* ``complex`` - long questions, comparisons, or questions spanning tables
+
+Tables are detected from the semantic model: every table gets the vocabulary
+of its column names and synonyms that no other table shares, and a question
+touches a table when it uses one of those words. Per-route latency and
+quality (did the call produce usable SQL or chart code) are tracked so the
+routing table can be tuned from real traffic.
+"""
+import re
+import threading
+from collections import deque
+
+import yaml
+
+DEFAULT_ROUTES = {"simple": "llama3.1-8b", "complex": "llama3.3-70b", "chart": "llama3.1-8b"}
+DEFAULT_COMPARISON_TERMS = [
+    "compare", "compared", "comparison", "versus", "vs", "correlate", "correlation",
+    "relationship", "impact", "between", "against", "difference", "why",
+]
+# Words too generic to tie a question to a table
+STOPWORDS = {"id", "ms", "gb", "mbps", "percent", "type", "time", "date", "level", "amount",
+             "count", "rate", "score", "total", "average", "number", "the", "of", "by"}
+
+
+def tokenize(text):
+    """Lower-case word tokens with a naive plural strip"""
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+
+
+def table_vocabulary(semantic_model):
+    """Distinctive words per semantic-model table"""
+    vocab = {}
+    for table in (semantic_model or {}).get("tables", []):
+        words = set(tokenize(table["name"]))
+        for kind in ("dimensions", "time_dimensions", "facts", "measures"):
+            for column in table.get(kind, []):
+                words.update(tokenize(column["name"]))
+                for synonym in column.get("synonyms", []):
+                    words.update(tokenize(synonym))
+        vocab[table["name"]] = words - STOPWORDS
+    shared = set()
+    names = list(vocab)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            shared |= vocab[a] & vocab[b]
+    return {name: words - shared for name, words in vocab.items()}
+
+
+class RouteStats:
+    """Rolling latency and quality stats for one route"""
+
+    def __init__(self, window=200):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.good = 0
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] if ordered else None
+
+        return {"calls": self.calls, "quality": self.good / self.calls if self.calls else None,
+                "p50_s": pct(50), "p95_s": pct(95)}
+
+
+class ModelRouter:
+    """Classifies requests by complexity and picks the model for each route"""
+
+    def __init__(self, routes=None, semantic_model=None, max_simple_words=14, max_simple_tables=1,
+                 comparison_terms=None):
+        self.routes = dict(DEFAULT_ROUTES, **(routes or {}))
+        self.max_simple_words = max_simple_words
+        self.max_simple_tables = max_simple_tables
+        self.comparison_terms = set(comparison_terms or DEFAULT_COMPARISON_TERMS)
+        self.vocabulary = table_vocabulary(semantic_model)
+        self._stats = {route: RouteStats() for route in self.routes}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path, semantic_model=None):
+        """Build a router from model_routes.yaml; a missing file keeps the defaults"""
+        try:
+            with open(path) as f:
+                config = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            config = {}
+        thresholds = config.get("thresholds", {})
+        return cls(
+            routes=config.get("routes"),
+            semantic_model=semantic_model,
+            max_simple_words=thresholds.get("max_simple_words", 14),
+            max_simple_tables=thresholds.get("max_simple_tables", 1),
+            comparison_terms=config.get("comparison_terms"),
+        )
+
+    def set_semantic_model(self, semantic_model):
+        """Replace the table vocabulary, keeping the route stats"""
+        self.vocabulary = table_vocabulary(semantic_model)
+
+    def tables_touched(self, question):
+        words = set(tokenize(question))
+        return sorted(name for name, vocab in self.vocabulary.items() if words & vocab)
+
+    def classify(self, question, chart=False):
+        if chart:
+            return "chart"
+        words = re.findall(r"[a-z0-9]+", question.lower())
+        if len(words) > self.max_simple_words:
+            return "complex"
+        if self.comparison_terms & set(words):
+            return "complex"
+        if len(self.tables_touched(question)) > self.max_simple_tables:
+            return "complex"
+        return "simple"
+
+    def route(self, question, chart=False):
+        """Returns (route, model) for a request"""
+        route = self.classify(question, chart)
+        return route, self.routes[route]
+
+    def record(self, route, latency_s, ok):
+        with self._lock:
+            stats = self._stats.setdefault(route, RouteStats())
+            stats.calls += 1
+            stats.good += bool(ok)
+            stats.latencies.append(latency_s)
+
+    def stats(self):
+        with self._lock:
+            return {route: dict(model=self.routes.get(route), **s.summary()) for route, s in self._stats.items()}
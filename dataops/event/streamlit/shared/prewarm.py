@@ -0,0 +1,67 @@
+"""
+Background pre-warming of the semantic model and the warehouse on app start.
+
+After the app container restarts or the warehouse auto-suspends, the first
+page load paid for the semantic model read from its stage, and the first
+query paid for the warehouse resume. One ``Prewarm`` per app process (via
+``st.cache_resource``) runs named steps in order on a daemon thread, so they
+overlap with the first page render instead of blocking it:
+
+* the semantic model is read into the app's cache, where the model router and
+  the agent fallback find it.
+* ``prewarm_sql`` reads at most one row of each table of the semantic model.
+  The query costs next to nothing, but it resumes the warehouse and loads
+  the tables' metadata before the first dashboard query or question.
+
+A failed step is recorded and the next one still runs.
+"""
+import re
+import threading
+import time
+
+PREWARM_FALLBACK_SQL = "SELECT COUNT(*) AS ROWS_READ FROM TABLE(GENERATOR(ROWCOUNT => 1))"
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+
+def prewarm_sql(semantic_model):
+    """One-row read of each semantic model table, by name as the apps query them"""
+    tables = []
+    for table in (semantic_model or {}).get("tables", []):
+        name = str((table.get("base_table") or {}).get("table") or "")
+        if _IDENTIFIER.fullmatch(name) and name not in tables:
+            tables.append(name)
+    if not tables:
+        return PREWARM_FALLBACK_SQL
+    reads = " UNION ALL ".join(f"(SELECT 1 AS ONE FROM {name} LIMIT 1)" for name in tables)
+    return f"SELECT COUNT(*) AS ROWS_READ FROM ({reads})"
+
+
+class Prewarm:
+    """Named steps run once, in order, on a daemon thread started by ``start``"""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.results = {}
+        self.thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        for name, step in self.steps:
+            started = time.perf_counter()
+            error = None
+            try:
+                step()
+            except Exception as e:
+                error = str(e)
+            self.results[name] = {"ms": (time.perf_counter() - started) * 1000, "error": error}
+
+    def done(self, name):
+        return name in self.results
+
+    def stats(self):
+        """One row per step; ``ms`` is None until the step has finished"""
+        return [dict(step=name, **self.results.get(name, {"ms": None, "error": None})) for name, _ in self.steps]
@@ -0,0 +1,270 @@
+"""
+Reuse of agent SQL results across sessions, keyed by normalized SQL.
+
+The agent often writes the same query for similar questions. The copies differ
+only in whitespace, comments, keyword case, table alias names or the order of
+an ``IN`` list. ``normalize_sql`` reduces a statement to canonical tokens:
+
+* comments are dropped and whitespace is collapsed
+* unquoted identifiers and keywords are uppercased, and ``AS`` is dropped
+* table aliases are renamed ``T1``, ``T2``, ... in order of appearance
+* literal ``IN`` lists are sorted
+
+With ``literals=False`` every literal also becomes ``?``. That gives the shape
+of a query rather than its identity. ``fingerprint`` hashes the canonical
+form.
+
+``QueryReuse`` caches results as compact Arrow tables (see
+``arrow_results.compact_table``). A result is keyed by its fingerprint plus the
+table-version tag from ``freshness.Watermarks``, so a result is reused only
+while the tables it read are unchanged. Results are evicted under a memory cap.
+The query ID of each fingerprint's last run is kept longer. After an eviction,
+the result is read back with ``RESULT_SCAN`` instead of running the query
+again. Results of statements that read the clock or random functions, or a
+view that does (``CUSTOMER_CHURN_FEATURES``), expire after ``volatile_ttl_s``.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from arrow_results import compact_table, footprint, job_arrow
+
+_TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<space>\s+)
+  | (?P<op><>|!=|<=|>=|\|\||::|=>|.)
+""", re.VERBOSE | re.DOTALL)
+
+# Words that can follow a table reference and are therefore never its alias
+_NOT_ALIAS = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER", "ON", "USING",
+    "GROUP", "ORDER", "HAVING", "QUALIFY", "LIMIT", "OFFSET", "FETCH", "UNION", "EXCEPT", "MINUS",
+    "INTERSECT", "WINDOW", "SAMPLE", "TABLESAMPLE", "AT", "BEFORE", "CHANGES", "PIVOT", "UNPIVOT",
+    "MATCH_RECOGNIZE", "LATERAL", "ASOF", "MATCH_CONDITION",
+}
+
+VOLATILE = re.compile(
+    r"\b(CURRENT_(TIMESTAMP|DATE|TIME)|SYSDATE|GETDATE|SYSTIMESTAMP|LOCALTIMESTAMP|NOW|RANDOM|UNIFORM|UUID_STRING|SEQ[1248]"
+    r"|CUSTOMER_CHURN_FEATURES)\b",
+    re.IGNORECASE)
+
+_QUERY_ID = re.compile(r"[0-9a-fA-F-]{36}")
+
+
+def tokenize(sql):
+    """(kind, text) tokens of a statement, without comments and whitespace"""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            continue
+        text = match.group()
+        tokens.append((kind, text.upper() if kind == "word" else text))
+    while tokens and tokens[-1] == ("op", ";"):
+        tokens.pop()
+    return tokens
+
+
+def _rename_aliases(tokens):
+    """Rename table aliases in FROM and JOIN clauses to T1, T2, ..."""
+    aliases = {}
+    defined = set()
+    for i, token in enumerate(tokens):
+        if token not in (("word", "FROM"), ("word", "JOIN")):
+            continue
+        j = i + 1
+        # Qualified name: part (. part)*, then an optional AS and the alias
+        if j >= len(tokens) or tokens[j][0] not in ("word", "quoted"):
+            continue
+        j += 1
+        while j + 1 < len(tokens) and tokens[j] == ("op", ".") and tokens[j + 1][0] in ("word", "quoted"):
+            j += 2
+        if j < len(tokens) and tokens[j] == ("word", "AS"):
+            j += 1
+        if j < len(tokens) and tokens[j][0] == "word" and tokens[j][1] not in _NOT_ALIAS:
+            aliases.setdefault(tokens[j][1], f"T{len(aliases) + 1}")
+            defined.add(j)
+    if not aliases:
+        return tokens
+    renamed = list(tokens)
+    for k, (kind, text) in enumerate(tokens):
+        if kind == "word" and text in aliases:
+            # The alias itself, or a qualifier in front of a column
+            if k in defined or (k + 1 < len(tokens) and tokens[k + 1] == ("op", ".")):
+                renamed[k] = ("word", aliases[text])
+    return renamed
+
+
+def _sort_in_lists(tokens):
+    """Sort the items of IN lists made only of literals"""
+    literal = ("string", "number")
+    out = list(tokens)
+    i = 0
+    while i < len(out) - 1:
+        if out[i] == ("word", "IN") and out[i + 1] == ("op", "("):
+            j = i + 2
+            items = []
+            while j < len(out) and out[j][0] in literal:
+                items.append(out[j])
+                j += 1
+                if j < len(out) and out[j] == ("op", ","):
+                    j += 1
+                    continue
+                break
+            if items and j < len(out) and out[j] == ("op", ")") and out[j - 1][0] in literal:
+                body = []
+                for item in sorted(set(items)):
+                    body += [("op", ","), item] if body else [item]
+                out[i + 2:j] = body
+                i += 2 + len(body)
+                continue
+        i += 1
+    return out
+
+
+def normalize_sql(sql, literals=True):
+    """Canonical text of a statement; ``literals=False`` replaces every literal with ``?``"""
+    tokens = _sort_in_lists([t for t in _rename_aliases(tokenize(sql)) if t != ("word", "AS")])
+    if not literals:
+        tokens = [("param", "?") if kind in ("string", "number") else (kind, text) for kind, text in tokens]
+    return " ".join(text for _, text in tokens)
+
+
+def fingerprint(sql, literals=True):
+    return hashlib.sha1(normalize_sql(sql, literals).encode()).hexdigest()[:16]
+
+
+def result_scan_sql(query_id):
+    if not _QUERY_ID.fullmatch(query_id or ""):
+        raise ValueError(f"not a query ID: {query_id!r}")
+    return f"SELECT * FROM TABLE(RESULT_SCAN('{query_id}'))"
+
+
+def async_result(job, session):
+    """Arrow table and query ID of a Snowpark ``AsyncJob`` of ``session``, read without a pandas round trip"""
+    return job_arrow(job, session), job.query_id
+
+
+class QueryReuse:
+    """Compact results of agent SQL shared by all sessions, keyed by fingerprint and table versions.
+
+    ``execute`` takes an SQL string and returns ``(arrow_table, query_id)``,
+    for example ``lambda sql: async_result(session.sql(sql).collect_nowait(), session)``.
+    """
+
+    def __init__(self, execute, max_mb=64, max_history=4096, result_scan_s=20 * 3600, volatile_ttl_s=300):
+        self.execute = execute
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_history = max_history
+        self.result_scan_s = result_scan_s
+        self.volatile_ttl_s = volatile_ttl_s
+        self._results = OrderedDict()  # fingerprint -> (tag, ran_at, table)
+        self._history = OrderedDict()  # fingerprint -> (tag, ran_at, query_id)
+        self._bytes = 0
+        self.counters = {"hits": 0, "result_scans": 0, "runs": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _max_age(self, sql):
+        return self.volatile_ttl_s if VOLATILE.search(sql) else None
+
+    def _lookup(self, key, tag, max_age):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            if entry[0] != tag or (max_age is not None and time.time() - entry[1] > max_age):
+                self._drop(key)
+                return None
+            self._results.move_to_end(key)
+            return entry[2]
+
+    def _drop(self, key):
+        _, _, table = self._results.pop(key)
+        self._bytes -= table.nbytes
+
+    def _store(self, key, tag, table, query_id, ran_at):
+        with self._lock:
+            if query_id:
+                self._history[key] = (tag, ran_at, query_id)
+                self._history.move_to_end(key)
+                while len(self._history) > self.max_history:
+                    self._history.popitem(last=False)
+            if key in self._results:
+                self._drop(key)
+            if table.nbytes > self.max_bytes:
+                return
+            self._results[key] = (tag, ran_at, table)
+            self._bytes += table.nbytes
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._results)))
+
+    def _recent_query_id(self, key, tag, max_age):
+        with self._lock:
+            entry = self._history.get(key)
+        if entry is None or entry[0] != tag:
+            return None, None
+        age_limit = self.result_scan_s if max_age is None else min(self.result_scan_s, max_age)
+        return (entry[2], entry[1]) if time.time() - entry[1] <= age_limit else (None, None)
+
+    def run(self, sql, tag=()):
+        """Result frame of ``sql``, from memory, from ``RESULT_SCAN`` or from a fresh run"""
+        key = fingerprint(sql)
+        max_age = self._max_age(sql)
+        table = self._lookup(key, tag, max_age)
+        if table is not None:
+            self._count("hits")
+            with self._lock:
+                entry = self._history.get(key)
+            return self._frame(table, "memory", 0, entry[2] if entry and entry[0] == tag else None)
+
+        query_id, ran_at = self._recent_query_id(key, tag, max_age)
+        source = "result_scan"
+        table = None
+        if query_id:
+            try:
+                # The scan's result is as old as the run it reads, so ran_at is kept
+                table, query_id = self.execute(result_scan_sql(query_id))
+                self._count("result_scans")
+            except Exception:
+                # The result may have expired or belong to another user; run the query instead
+                table = None
+        if table is None:
+            ran_at = time.time()
+            table, query_id = self.execute(sql)
+            source = "snowflake"
+            self._count("runs")
+        fetched_bytes = table.nbytes
+        table = compact_table(table)
+        self._store(key, tag, table, query_id, ran_at)
+        return self._frame(table, source, fetched_bytes, query_id)
+
+    @staticmethod
+    def _frame(table, source, fetched_bytes, query_id):
+        # The stored table is shared, so its buffers must survive the conversion
+        df = table.to_pandas(split_blocks=True, date_as_object=False)
+        df.attrs["footprint"] = {
+            "rows": len(df),
+            "fetched_bytes": fetched_bytes,
+            "arrow_bytes": table.nbytes,
+            "pandas_bytes": footprint(df),
+            "source": source,
+            "query_id": query_id,
+        }
+        return df
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters.update({"entries": len(self._results), "mb": self._bytes / 1024 / 1024,
+                             "history": len(self._history)})
+        return counters
@@ -0,0 +1,128 @@
+"""
+Priority scheduling of warehouse queries and agent calls across sessions.
+
+All sessions of an app share the warehouse. Sidebar polls, dashboard loads and
+background refreshes would otherwise queue next to an operator's question.
+One ``QueryScheduler`` per app process (via ``st.cache_resource``) admits each
+call in one of four classes, highest first:
+
+* ``interactive``: chat questions, the agent call and its SQL
+* ``sidebar``: sidebar status and dashboard panels
+* ``bulk``: questions of a bulk run
+* ``background``: cache refreshes, change-marker polls and pre-warming
+
+A free slot goes to the highest class with waiting work, in FIFO order within
+the class. Each class is capped at its own concurrency limit. The limits of
+the lower three classes add up to less than ``max_concurrent``, which leaves
+slots that only interactive work can use. A call whose class has a deadline is
+dropped with ``DeadlineExceeded`` if it is still queued when the deadline
+passes. By then the rerun or refresh that wanted it has usually moved on.
+"""
+import threading
+import time
+from collections import deque
+
+from resilient_agent import LatencyTracker
+
+PRIORITIES = ("interactive", "sidebar", "bulk", "background")
+
+DEFAULT_LIMITS = {"interactive": 12, "sidebar": 3, "bulk": 4, "background": 2}
+
+# Seconds a call may wait in the queue before it is dropped; None waits indefinitely
+DEFAULT_DEADLINES_S = {"interactive": None, "sidebar": 20.0, "bulk": None, "background": 10.0}
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of running a call that waited in the queue past its deadline"""
+
+
+class QueryScheduler:
+    """Process-wide admission of calls by priority class, with per-class concurrency limits"""
+
+    def __init__(self, max_concurrent=12, limits=None, deadlines=None):
+        self.max_concurrent = max_concurrent
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.deadlines = dict(DEFAULT_DEADLINES_S, **(deadlines or {}))
+        self._queues = {p: deque() for p in PRIORITIES}
+        self._running = {p: 0 for p in PRIORITIES}
+        self._waits = {p: LatencyTracker() for p in PRIORITIES}
+        self.counters = {p: {"completed": 0, "failed": 0, "dropped": 0, "max_depth": 0} for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self._held = threading.local()
+
+    def _can_start(self, priority, ticket):
+        if self._queues[priority][0] is not ticket:
+            return False
+        if self._running[priority] >= self.limits[priority]:
+            return False
+        if sum(self._running.values()) >= self.max_concurrent:
+            return False
+        # A higher class that is waiting and has room goes first
+        for higher in PRIORITIES[:PRIORITIES.index(priority)]:
+            if self._queues[higher] and self._running[higher] < self.limits[higher]:
+                return False
+        return True
+
+    def _acquire(self, priority, deadline_s):
+        ticket = object()
+        queued_at = time.monotonic()
+        deadline = None if deadline_s is None else queued_at + deadline_s
+        with self._cond:
+            queue = self._queues[priority]
+            queue.append(ticket)
+            counters = self.counters[priority]
+            counters["max_depth"] = max(counters["max_depth"], len(queue))
+            while not self._can_start(priority, ticket):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    queue.remove(ticket)
+                    counters["dropped"] += 1
+                    self._cond.notify_all()
+                    raise DeadlineExceeded(f"{priority} call dropped after waiting {deadline_s:.0f}s")
+                self._cond.wait(remaining)
+            queue.popleft()
+            self._running[priority] += 1
+            # The next caller in this queue may be able to start as well
+            self._cond.notify_all()
+        self._waits[priority].record((time.monotonic() - queued_at) * 1000)
+
+    def _release(self, priority, success):
+        with self._cond:
+            self._running[priority] -= 1
+            self.counters[priority]["completed" if success else "failed"] += 1
+            self._cond.notify_all()
+
+    def run(self, fn, priority="interactive", deadline_s=None):
+        """Result of ``fn()`` once a slot of ``priority`` is free.
+
+        ``deadline_s``, when given, replaces the class deadline. A call made while the
+        thread already holds a slot runs in that slot, so nested calls cannot
+        deadlock.
+        """
+        if priority not in self._queues:
+            raise ValueError(f"unknown priority class: {priority!r}")
+        if getattr(self._held, "priority", None):
+            return fn()
+        self._acquire(priority, self.deadlines[priority] if deadline_s is None else deadline_s)
+        self._held.priority = priority
+        success = False
+        try:
+            result = fn()
+            success = True
+            return result
+        finally:
+            self._held.priority = None
+            self._release(priority, success)
+
+    def wrap(self, fn, priority, deadline_s=None):
+        """``fn`` with every call scheduled in ``priority``, for loaders handed to shared caches"""
+        return lambda *args, **kwargs: self.run(lambda: fn(*args, **kwargs), priority, deadline_s)
+
+    def stats(self):
+        with self._cond:
+            snapshot = {p: dict(self.counters[p], queued=len(self._queues[p]), running=self._running[p])
+                        for p in PRIORITIES}
+        for p in PRIORITIES:
+            snapshot[p]["wait_p50_ms"] = self._waits[p].percentile(50)
+            snapshot[p]["wait_p95_ms"] = self._waits[p].percentile(95)
+        return snapshot
@@ -0,0 +1,176 @@
+"""
+Opt-in sampling profiler for one script rerun.
+
+A slow rerun can spend its time in Python, in pandas or Plotly, or waiting
+on Snowflake, and a wall-clock timer cannot tell these apart. While a
+``RerunProfiler`` is entered, a daemon thread samples the stack of the
+thread that entered it every ``interval_s`` seconds. At each sample it also
+reads that thread's CPU clock. The time since the previous sample is split
+into CPU time and wait time (the thread was blocked on I/O, a lock or a
+future) and credited to the sampled stack.
+
+The apps run each rerun through ``run_profiled``, which enters it only when
+the page URL has ``?profile=1`` and then shows the profile in the sidebar.
+With the profiler off, no thread is started and no hook is installed.
+
+``speedscope`` gives a file for https://www.speedscope.app with wall, CPU and
+wait profiles. ``folded`` gives collapsed stacks for ``flamegraph.pl``.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import streamlit as st
+
+
+def _thread_cpu_clock(ident):
+    """CPU clock of another thread, or None where the platform has none"""
+    try:
+        clock = time.pthread_getcpuclockid(ident)
+        time.clock_gettime(clock)
+        return clock
+    except (AttributeError, OSError):
+        return None
+
+
+def _frame_key(code):
+    return (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class RerunProfiler:
+    """Stack samples of the entering thread, each weighted by CPU and wait milliseconds"""
+
+    def __init__(self, interval_s=0.005, max_depth=128):
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.stacks = defaultdict(lambda: [0.0, 0.0, 0])  # stack -> [cpu ms, wait ms, samples]
+        self.wall_ms = 0.0
+        self.sampler_cpu_ms = 0.0
+        self.has_cpu_clock = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        # Frames at and above the caller belong to Streamlit's script runner, not the rerun
+        self._root = sys._getframe(1)
+        self._clock = _thread_cpu_clock(self._target)
+        self.has_cpu_clock = self._clock is not None
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="rerun-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.wall_ms = (time.perf_counter() - self._started) * 1000
+        self._root = None
+        return False
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and frame is not self._root and len(stack) < self.max_depth:
+            stack.append(_frame_key(frame.f_code))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _sample(self):
+        last_wall = time.perf_counter()
+        last_cpu = time.clock_gettime(self._clock) if self._clock is not None else None
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self._target)
+            now = time.perf_counter()
+            wall = (now - last_wall) * 1000
+            cpu = wall
+            if self._clock is not None:
+                try:
+                    cpu_now = time.clock_gettime(self._clock)
+                except OSError:
+                    break
+                cpu = min(wall, max(0.0, (cpu_now - last_cpu) * 1000))
+                last_cpu = cpu_now
+            last_wall = now
+            if frame is None:
+                continue
+            totals = self.stacks[self._stack(frame)]
+            totals[0] += cpu
+            totals[1] += wall - cpu
+            totals[2] += 1
+        self.sampler_cpu_ms = time.thread_time() * 1000
+
+    def summary(self):
+        """Totals of the rerun; ``cpu_ms`` and ``wait_ms`` cover the sampled time"""
+        cpu = sum(t[0] for t in self.stacks.values())
+        wait = sum(t[1] for t in self.stacks.values())
+        return {"wall_ms": self.wall_ms, "cpu_ms": cpu, "wait_ms": wait,
+                "samples": sum(t[2] for t in self.stacks.values()),
+                "sampler_cpu_ms": self.sampler_cpu_ms, "cpu_split": self.has_cpu_clock}
+
+    def top_functions(self, limit=15):
+        """Functions by total (inclusive) time, with their self CPU and self wait"""
+        rows = {}
+        for stack, (cpu, wait, _) in self.stacks.items():
+            for frame in set(stack):
+                row = rows.setdefault(frame, {"function": frame[0], "file": f"{frame[1]}:{frame[2]}",
+                                              "total_ms": 0.0, "self_cpu_ms": 0.0, "self_wait_ms": 0.0})
+                row["total_ms"] += cpu + wait
+            if stack:
+                rows[stack[-1]]["self_cpu_ms"] += cpu
+                rows[stack[-1]]["self_wait_ms"] += wait
+        return sorted(rows.values(), key=lambda r: -r["total_ms"])[:limit]
+
+    def speedscope(self, name="rerun"):
+        """speedscope JSON with wall, CPU and wait profiles of the rerun"""
+        frames, index = [], {}
+        samples, weights = [], {"wall": [], "cpu": [], "wait": []}
+        for stack, (cpu, wait, _) in self.stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights["wall"].append(cpu + wait)
+            weights["cpu"].append(cpu)
+            weights["wait"].append(wait)
+        profiles = [{"type": "sampled", "name": f"{name} {kind}", "unit": "milliseconds", "startValue": 0,
+                     "endValue": sum(w), "samples": samples, "weights": w}
+                    for kind, w in weights.items()]
+        return json.dumps({"$schema": "https://www.speedscope.app/file-format-schema.json",
+                           "shared": {"frames": frames}, "profiles": profiles,
+                           "name": name, "exporter": "rerun_profiler"})
+
+    def folded(self, kind="wall"):
+        """Collapsed stacks in microseconds of ``wall``, ``cpu`` or ``wait`` time"""
+        lines = []
+        for stack, (cpu, wait, _) in self.stacks.items():
+            weight = {"wall": cpu + wait, "cpu": cpu, "wait": wait}[kind]
+            if stack and weight > 0:
+                lines.append(";".join(f"{f[0]} ({f[1]}:{f[2]})" for f in stack) + f" {round(weight * 1000)}")
+        return "\n".join(lines) + "\n"
+
+
+def run_profiled(fn, name="rerun"):
+    """Runs ``fn``, under the sampling profiler when the page URL has ?profile=1"""
+    if st.query_params.get("profile") != "1":
+        return fn()
+    with RerunProfiler() as profiler:
+        fn()
+    summary = profiler.summary()
+    with st.sidebar.expander("🔬 Rerun profile", expanded=True):
+        if summary["cpu_split"]:
+            st.caption(f"{summary['wall_ms']:,.0f} ms: {summary['cpu_ms']:,.0f} ms CPU, "
+                       f"{summary['wait_ms']:,.0f} ms waiting ({summary['samples']:,} samples)")
+        else:
+            st.caption(f"{summary['wall_ms']:,.0f} ms ({summary['samples']:,} samples, no CPU clock to split off waits)")
+        st.dataframe(profiler.top_functions(), hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("⬇️ speedscope", profiler.speedscope(name), "rerun.speedscope.json",
+                             "application/json", key="profile_speedscope")
+        col2.download_button("⬇️ Flame graph", profiler.folded(), "rerun.folded.txt", "text/plain",
+                             key="profile_folded")
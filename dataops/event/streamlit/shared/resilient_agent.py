@@ -0,0 +1,302 @@
+"""
+Resilient call layer for the Cortex Agent endpoint.
+
+Deployed next to each app's app.py. One ``ResilientCaller`` is shared by all
+sessions of an app (via ``st.cache_resource``) and wraps every
+``_snowflake.send_snow_api_request`` call with:
+
+* adaptive timeouts derived from the observed latency percentiles
+* a hedged duplicate request when the first one runs past p95
+* retries of transient 429/5xx responses with jittered exponential backoff
+* a circuit breaker that fails fast while the error rate is high
+
+When a call cannot be made, the apps answer from ``AnswerCache`` or from the
+semantic model's verified queries (``fallback_events``) instead.
+"""
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the endpoint while the circuit is open"""
+
+
+class AgentCallError(Exception):
+    """Raised when every attempt failed with a timeout or a transient error"""
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, in milliseconds"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of outcomes"""
+
+    def __init__(self, window=20, min_calls=8, failure_rate=0.5, cooldown_s=30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown_s = cooldown_s
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_s:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go out now; half-open lets a single trial through"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success):
+        with self._lock:
+            if self._trial_in_flight:
+                self._trial_in_flight = False
+                if success:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Adaptive-timeout, hedged, retrying caller guarded by a circuit breaker.
+
+    ``send`` is a function taking a timeout in milliseconds and returning the
+    ``_snowflake.send_snow_api_request`` response dict.
+    """
+
+    def __init__(self, min_timeout_ms=5000, max_timeout_ms=50000, timeout_multiplier=2.0,
+                 max_retries=2, backoff_base_s=0.5, backoff_cap_s=8.0,
+                 hedge_percentile=95, hedge_min_samples=20, hedge_budget=0.1,
+                 breaker=None, max_workers=8):
+        self.min_timeout_ms = min_timeout_ms
+        self.max_timeout_ms = max_timeout_ms
+        self.timeout_multiplier = timeout_multiplier
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                         "timeouts": 0, "failures": 0, "rejected": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-call")
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def timeout_ms(self):
+        """Per-attempt timeout: a multiple of p99, clamped, or the max until warmed up"""
+        p99 = self.latency.percentile(99)
+        if p99 is None or len(self.latency) < self.hedge_min_samples:
+            return self.max_timeout_ms
+        return int(min(self.max_timeout_ms, max(self.min_timeout_ms, p99 * self.timeout_multiplier)))
+
+    def _hedge_after_s(self):
+        if len(self.latency) < self.hedge_min_samples:
+            return None
+        with self._lock:
+            if self.counters["hedges"] >= self.hedge_budget * max(1, self.counters["calls"]):
+                return None
+        return self.latency.percentile(self.hedge_percentile) / 1000.0
+
+    def _attempt(self, send, timeout_ms):
+        """One attempt, with a hedged duplicate if the first runs past p95"""
+        started = time.monotonic()
+        deadline = started + timeout_ms / 1000.0
+        futures = [self._pool.submit(send, timeout_ms)]
+        hedge_after = self._hedge_after_s()
+        if hedge_after is not None and hedge_after < timeout_ms / 1000.0:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                self._count("hedges")
+                futures.append(self._pool.submit(send, timeout_ms))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    resp = future.result()
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    if resp.get("status") == 200:
+                        self.latency.record((time.monotonic() - started) * 1000.0)
+                    return resp
+        # The losing or hung request cannot be cancelled; it finishes in the pool
+        errors = [f.exception() for f in futures if f.done() and f.exception() is not None]
+        if errors:
+            raise errors[0]
+        self._count("timeouts")
+        raise TimeoutError(f"agent call exceeded {timeout_ms} ms")
+
+    def _backoff(self, attempt):
+        time.sleep(random.uniform(0, min(self.backoff_cap_s, self.backoff_base_s * 2 ** attempt)))
+
+    def call(self, send):
+        """Call the endpoint; returns the response dict or raises.
+
+        Non-transient HTTP errors are returned as-is for the caller to report.
+        Raises ``CircuitOpenError`` when failing fast and ``AgentCallError``
+        once retries of timeouts or transient errors are exhausted.
+        """
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("agent endpoint circuit is open")
+        self._count("calls")
+        overall_deadline = time.monotonic() + self.max_timeout_ms / 1000.0
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+                self._backoff(attempt - 1)
+            remaining_ms = (overall_deadline - time.monotonic()) * 1000.0
+            if remaining_ms <= 0:
+                break
+            try:
+                resp = self._attempt(send, int(min(self.timeout_ms(), remaining_ms)))
+            except Exception as e:
+                last_error = e
+                continue
+            if resp.get("status") in TRANSIENT_STATUSES:
+                last_error = AgentCallError(f"HTTP {resp.get('status')} - {resp.get('reason', 'Unknown reason')}")
+                continue
+            # Any non-transient answer, even a 4xx, means the endpoint is up
+            self.breaker.record(True)
+            return resp
+        self._count("failures")
+        self.breaker.record(False)
+        raise AgentCallError(str(last_error) if last_error else "agent call deadline exceeded")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters.update({
+            "state": self.breaker.state,
+            "samples": len(self.latency),
+            "p50_ms": self.latency.percentile(50),
+            "p95_ms": self.latency.percentile(95),
+            "p99_ms": self.latency.percentile(99),
+            "timeout_ms": self.timeout_ms(),
+        })
+        return counters
+
+
+def normalize_question(question):
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+class AnswerCache:
+    """Thread-safe LRU of the last good agent response per normalized question.
+
+    A response can carry a ``tag`` of the table versions it read (see
+    ``freshness.Watermarks``); ``get`` drops it once ``is_current(tag)`` fails.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, question, is_current=None):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        response, tag = entry
+        # Checked outside the lock: is_current may poll the watermarks
+        if is_current is not None and not is_current(tag):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        return response
+
+    def put(self, question, response, tag=None):
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = (response, tag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def match_verified_query(question, verified_queries, threshold=0.5):
+    """Best verified query by word overlap with the question, or None"""
+    words = set(normalize_question(question).split())
+    best, best_score = None, threshold
+    for vq in verified_queries:
+        candidate = set(normalize_question(vq.get("question", "")).split())
+        if not words or not candidate:
+            continue
+        score = len(words & candidate) / len(words | candidate)
+        if score >= best_score:
+            best, best_score = vq, score
+    return best
+
+
+def fallback_events(text, sql=""):
+    """Agent-shaped event list so fallback answers go through process_sse_response"""
+    return [{
+        "event": "message.delta",
+        "data": {"delta": {"content": [
+            {"type": "text", "text": text},
+            {"type": "tool_results", "tool_results": {"content": [
+                {"type": "json", "json": {"text": "", "sql": sql, "searchResults": []}},
+            ]}},
+        ]}},
+    }]
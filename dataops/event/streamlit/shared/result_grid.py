@@ -0,0 +1,305 @@
+"""
+Server-side paging, sorting and filtering of query results, with chunked export.
+
+``st.dataframe`` on a whole result sends every row to the browser. A
+``ResultGrid`` keeps the result on the server as an Arrow table and returns
+one page at a time, so the browser payload depends on the page size, not on
+the result size. The row order for each sort and filter combination is
+computed once with ``pyarrow.compute`` and reused for every page.
+
+There are two ways to export the current view:
+
+* ``export_sql``: ``COPY INTO`` the export stage straight from
+  ``RESULT_SCAN`` of the query, with the same filters and sort. The rows never
+  pass through the app. ``PRESIGNED_URL_SQL`` then gives a download link.
+* ``upload_export``: when there is no query ID or the result has expired,
+  write the view to a local file in record batches of ``chunk_rows``, as CSV
+  or Parquet row groups, and ``PUT`` it on the export stage for the same kind
+  of download link.
+
+Only when the stage cannot be written does the grid offer the file as a
+direct download, which holds it in memory, and only up to
+``INLINE_EXPORT_MAX_BYTES``.
+
+``render_result_grid`` is the grid view the apps share; it runs the export
+statements through the app's ``run_sql``.
+"""
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+
+import streamlit as st
+
+PAGE_SIZES = [25, 100, 500]
+
+EXPORT_STAGE = "result_exports"
+
+PRESIGNED_URL_SQL = f"SELECT GET_PRESIGNED_URL(@{EXPORT_STAGE}, ?, 3600) AS URL"
+
+# Largest view, by its in-memory size, offered as a direct download when staging fails
+INLINE_EXPORT_MAX_BYTES = 32 * 2 ** 20
+
+FORMATS = {
+    "parquet": ("parquet", "TYPE = PARQUET"),
+    "csv": ("csv.gz", "TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = '\"' EMPTY_FIELD_AS_NULL = FALSE"),
+}
+
+_QUERY_ID = re.compile(r"[0-9a-fA-F-]{36}")
+_EXPORT_PATH = re.compile(r"[0-9a-f]{32}/result\.(parquet|csv\.gz)")
+
+
+def _is_text(data_type):
+    import pyarrow as pa
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type) or (
+        pa.types.is_dictionary(data_type) and pa.types.is_string(data_type.value_type))
+
+
+def _plain(column):
+    """Column with dictionaries decoded, for sorting and matching"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if pa.types.is_dictionary(column.type):
+        return pc.cast(column, column.type.value_type)
+    return column
+
+
+class ResultGrid:
+    """Pages of one result, with the row order of recent sort/filter views cached"""
+
+    def __init__(self, frame, max_views=8):
+        import pyarrow as pa
+        self.source = frame
+        self.table = pa.Table.from_pandas(frame, preserve_index=False)
+        self.columns = list(self.table.column_names)
+        self.max_views = max_views
+        self._views = OrderedDict()
+
+    def text_columns(self):
+        return [c for c in self.columns if _is_text(self.table.schema.field(c).type)]
+
+    def numeric_columns(self):
+        import pyarrow as pa
+        return [c for c in self.columns if pa.types.is_integer(self.table.schema.field(c).type)
+                or pa.types.is_floating(self.table.schema.field(c).type)
+                or pa.types.is_decimal(self.table.schema.field(c).type)]
+
+    def bounds(self, column):
+        """Minimum and maximum of a numeric column, as floats"""
+        import pyarrow.compute as pc
+        extremes = pc.min_max(self.table[column])
+        low, high = extremes["min"].as_py(), extremes["max"].as_py()
+        return (float(low), float(high)) if low is not None else (0.0, 0.0)
+
+    def _mask(self, filters):
+        import pyarrow.compute as pc
+        mask = None
+        for column, condition in (filters or {}).items():
+            values = _plain(self.table[column])
+            if condition[0] == "contains":
+                part = pc.match_substring(values, condition[1], ignore_case=True)
+            else:
+                part = pc.and_(pc.greater_equal(values, condition[1]), pc.less_equal(values, condition[2]))
+            part = pc.fill_null(part, False)
+            mask = part if mask is None else pc.and_(mask, part)
+        return mask
+
+    def view(self, sort_by=None, descending=False, filters=None):
+        """Row indices of a sort/filter view, in display order"""
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        key = (sort_by, descending, tuple(sorted((filters or {}).items())))
+        if key in self._views:
+            self._views.move_to_end(key)
+            return self._views[key]
+        mask = self._mask(filters)
+        rows = np.arange(self.table.num_rows) if mask is None else np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+        if sort_by:
+            values = _plain(self.table[sort_by]).take(pa.array(rows)).combine_chunks()
+            order = pc.array_sort_indices(values, order="descending" if descending else "ascending",
+                                          null_placement="at_end").to_numpy()
+            rows = rows[order]
+        self._views[key] = rows
+        while len(self._views) > self.max_views:
+            self._views.popitem(last=False)
+        return rows
+
+    def page(self, number, size, **view):
+        """DataFrame of one page (numbered from 1) and the number of rows in the view"""
+        import pyarrow as pa
+        rows = self.view(**view)
+        start = (number - 1) * size
+        taken = self.table.take(pa.array(rows[start:start + size]))
+        return taken.to_pandas(), len(rows)
+
+    def batches(self, chunk_rows=50000, **view):
+        """The view as record batches of at most ``chunk_rows`` rows"""
+        import pyarrow as pa
+        rows = self.view(**view)
+        for start in range(0, len(rows), chunk_rows):
+            yield from self.table.take(pa.array(rows[start:start + chunk_rows])).to_batches()
+
+    def write_export(self, fmt, chunk_rows=50000, directory=None, **view):
+        """Write the view to a temporary file chunk by chunk and return its path"""
+        import pyarrow as pa
+        # The writers are only needed for exports, so they are not imported with the app
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        suffix = ".parquet" if fmt == "parquet" else ".csv"
+        handle, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+        os.close(handle)
+        # Dictionary columns are decoded so that every chunk has the same schema
+        schema = pa.schema([pa.field(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                            for f in self.table.schema])
+        writer = pq.ParquetWriter(path, schema) if fmt == "parquet" else pa_csv.CSVWriter(path, schema)
+        with writer:
+            for batch in self.batches(chunk_rows, **view):
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        return path
+
+    def view_bytes(self, **view):
+        """Approximate in-memory size of a view"""
+        rows = self.table.num_rows
+        return self.table.nbytes * len(self.view(**view)) // rows if rows else 0
+
+    def export_bytes(self, fmt, chunk_rows=50000, **view):
+        """Contents of a ``write_export`` file; only the finished file is held in memory"""
+        path = self.write_export(fmt, chunk_rows, **view)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+def new_export_id():
+    return uuid.uuid4().hex
+
+
+def _identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    import numpy as np
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return repr(float(value)) if isinstance(value, (float, np.floating)) else str(int(value))
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def view_sql(query_id, sort_by=None, descending=False, filters=None):
+    """SELECT over ``RESULT_SCAN`` of a query with the grid's filters and sort"""
+    if not _QUERY_ID.fullmatch(query_id or ""):
+        raise ValueError(f"not a query ID: {query_id!r}")
+    conditions = []
+    for column, condition in (filters or {}).items():
+        if condition[0] == "contains":
+            conditions.append(f"CONTAINS(LOWER({_identifier(column)}::VARCHAR), LOWER({_literal(condition[1])}))")
+        else:
+            conditions.append(f"{_identifier(column)} BETWEEN {_literal(condition[1])} AND {_literal(condition[2])}")
+    sql = f"SELECT * FROM TABLE(RESULT_SCAN('{query_id}'))"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if sort_by:
+        sql += f" ORDER BY {_identifier(sort_by)} {'DESC' if descending else 'ASC'} NULLS LAST"
+    return sql
+
+
+def export_sql(query_id, export_id, fmt, **view):
+    """COPY of a result view into one file on the export stage; returns (sql, stage path)"""
+    extension, file_format = FORMATS[fmt]
+    path = f"{export_id}/result.{extension}"
+    if not _EXPORT_PATH.fullmatch(path):
+        raise ValueError(f"not an export path: {path!r}")
+    sql = (f"COPY INTO @{EXPORT_STAGE}/{path} FROM ({view_sql(query_id, **view)}) "
+           f"FILE_FORMAT = ({file_format}) HEADER = TRUE SINGLE = TRUE OVERWRITE = TRUE "
+           f"MAX_FILE_SIZE = 5368709120")
+    return sql, path
+
+
+def export_result(run_sql, query_id, fmt, view):
+    """Copy a result view into the export stage and return a download URL; the rows never pass through the app"""
+    sql, path = export_sql(query_id, new_export_id(), fmt, **view)
+    run_sql(sql, None)
+    return run_sql(PRESIGNED_URL_SQL, [path])[0][0]
+
+
+def upload_export(run_sql, grid, fmt, view):
+    """Write a grid view to a local file in chunks, ``PUT`` it on the export stage and return a download URL"""
+    export_id = new_export_id()
+    directory = tempfile.mkdtemp()
+    try:
+        local = os.path.join(directory, "result.parquet" if fmt == "parquet" else "result.csv")
+        os.replace(grid.write_export(fmt, directory=directory, **view), local)
+        # PUT gzips the CSV into result.csv.gz, the name a COPY export has
+        compress = "FALSE" if fmt == "parquet" else "TRUE"
+        run_sql(f"PUT 'file://{local}' @{EXPORT_STAGE}/{export_id} AUTO_COMPRESS = {compress} OVERWRITE = TRUE", None)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return run_sql(PRESIGNED_URL_SQL, [f"{export_id}/result.{FORMATS[fmt][0]}"])[0][0]
+
+
+@st.fragment
+def render_result_grid(analysis_results, run_sql, key="result_grid"):
+    """Server-side pages of a query result; paging, sorting, filtering and export rerun only this grid.
+
+    ``run_sql(sql, params)`` runs the export statements and returns their rows.
+    """
+    grid = st.session_state.get(key)
+    if grid is None or grid.source is not analysis_results:
+        grid = st.session_state[key] = ResultGrid(analysis_results)
+    col1, col2, col3, col4 = st.columns(4)
+    sort_by = col1.selectbox("Sort by", ["None"] + grid.columns, key=f"{key}_sort")
+    order = col2.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order")
+    filter_columns = col3.multiselect("Filter on", grid.text_columns() + grid.numeric_columns(), key=f"{key}_filter")
+    page_size = col4.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    filters = {}
+    for column in filter_columns:
+        if column in grid.text_columns():
+            text = st.text_input(f"{column} contains", key=f"{key}_contains_{column}")
+            if text:
+                filters[column] = ("contains", text)
+        else:
+            low, high = grid.bounds(column)
+            if low < high:
+                filters[column] = ("between",) + st.slider(column, low, high, (low, high), key=f"{key}_range_{column}")
+    view = dict(sort_by=None if sort_by == "None" else sort_by, descending=order == "Descending", filters=filters)
+
+    pages = max(1, -(-len(grid.view(**view)) // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    number = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    page, total = grid.page(number, page_size, **view)
+    st.dataframe(page, hide_index=True, use_container_width=True)
+    first = (number - 1) * page_size
+    shown = f"Rows {first + 1:,}–{first + len(page):,} of {total:,}" if total else "No rows"
+    st.caption(shown + (f" (filtered from {grid.table.num_rows:,})" if filters else "") + f" · page {number} of {pages}")
+
+    col1, col2 = st.columns(2)
+    fmt = col1.selectbox("Export as", list(FORMATS), key=f"{key}_format")
+    if col2.button("📦 Prepare export", key=f"{key}_export"):
+        query_id = analysis_results.attrs.get("footprint", {}).get("query_id")
+        url = None
+        if query_id:
+            try:
+                url = export_result(run_sql, query_id, fmt, view)
+            except Exception:
+                # The result may have expired; export the copy held here instead
+                url = None
+        if not url:
+            try:
+                url = upload_export(run_sql, grid, fmt, view)
+            except Exception:
+                url = None
+        if url:
+            st.link_button("⬇️ Download export", url)
+        elif grid.view_bytes(**view) <= INLINE_EXPORT_MAX_BYTES:
+            st.download_button("⬇️ Download export", grid.export_bytes(fmt, **view),
+                               f"result.{'parquet' if fmt == 'parquet' else 'csv'}", key=f"{key}_download")
+        else:
+            st.error("The export stage is not available and this view is too large to download directly; "
+                     "filter it down and try again.")
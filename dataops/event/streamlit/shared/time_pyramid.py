@@ -0,0 +1,102 @@
+"""
+Query layer over the time rollup pyramid.
+
+``configure_attendee_account.sql`` maintains dynamic tables with mergeable
+aggregates of ``NETWORK_PERFORMANCE`` and ``SERVICE_QUALITY_METRICS`` at four
+levels: ``<SOURCE>_ROLLUP_1M``, ``_15M``, ``_1H`` and ``_1D``. Each row holds, per
+metric, the count, sum, min, max, sum of squares and an
+``APPROX_PERCENTILE_ACCUMULATE`` sketch. Every coarser level is built by
+merging the level below it.
+
+``pyramid_query`` turns a time range and a point budget into SQL. It reads
+the coarsest level whose bucket still fits the requested resolution and
+merges its buckets up to that resolution. The number of rows scanned and
+returned therefore depends on the point budget, not on how long the range is.
+"""
+import math
+from datetime import datetime, timedelta
+
+# (suffix, bucket width in seconds), finest first
+LEVELS = [("1M", 60), ("15M", 900), ("1H", 3600), ("1D", 86400)]
+
+SOURCES = {
+    "NETWORK_PERFORMANCE": {
+        "dimensions": ["REGION", "NETWORK_TYPE"],
+        "metrics": ["LATENCY_MS", "THROUGHPUT_MBPS", "PACKET_LOSS_PERCENT", "UPTIME_PERCENT"],
+    },
+    "SERVICE_QUALITY_METRICS": {
+        "dimensions": ["SERVICE_TYPE", "GEOGRAPHIC_AREA"],
+        "metrics": ["CALL_DROP_RATE", "DATA_SUCCESS_RATE", "CUSTOMER_SATISFACTION_SCORE"],
+    },
+}
+
+DEFAULT_QUANTILES = (0.5, 0.95)
+
+
+def choose_level(start, end, max_points=500, resolution_s=None):
+    """Coarsest pyramid level, and the bucket width to merge it to, for a range.
+
+    The requested resolution is ``resolution_s`` if given, otherwise the range
+    divided into ``max_points`` buckets. Returns ``(suffix, bucket_seconds)``,
+    where ``bucket_seconds`` is a whole multiple of the level's width.
+    """
+    span_s = max(1.0, (end - start).total_seconds())
+    target_s = max(resolution_s or 0, span_s / max_points)
+    suffix, width = LEVELS[0]
+    for candidate, candidate_width in LEVELS:
+        if candidate_width <= target_s:
+            suffix, width = candidate, candidate_width
+    return suffix, width * max(1, math.ceil(target_s / width))
+
+
+def align(ts, seconds):
+    """Floor a naive timestamp to a bucket boundary (buckets start at the Unix epoch)"""
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(seconds=math.floor((ts - epoch).total_seconds() / seconds) * seconds)
+
+
+def _check(source, metric, group_by, filters):
+    if source not in SOURCES:
+        raise ValueError(f"unknown rollup source {source!r}")
+    spec = SOURCES[source]
+    if metric not in spec["metrics"]:
+        raise ValueError(f"{source} has no rolled-up metric {metric!r}")
+    for column in list(group_by or []) + list(filters or {}):
+        if column not in spec["dimensions"]:
+            raise ValueError(f"{source} rollups are not grouped by {column!r}")
+
+
+def pyramid_query(source, metric, start, end, max_points=500, resolution_s=None,
+                  group_by=None, filters=None, quantiles=DEFAULT_QUANTILES):
+    """SQL, bind parameters and level for a metric's series over ``[start, end)``.
+
+    The result has ``BUCKET_START``, the ``group_by`` columns, ``SAMPLES``,
+    ``AVG_VALUE``, ``MIN_VALUE``, ``MAX_VALUE``, ``STDDEV_VALUE`` and one
+    ``P<nn>_VALUE`` column per quantile.
+    """
+    _check(source, metric, group_by, filters)
+    level, bucket_s = choose_level(start, end, max_points, resolution_s)
+    group_by = list(group_by or [])
+    filters = dict(filters or {})
+    n, total, sumsq = f"SUM({metric}_N)", f"SUM({metric}_SUM)", f"SUM({metric}_SUMSQ)"
+    mean = f"{total} / NULLIF({n}, 0)"
+    columns = [f"TIME_SLICE(BUCKET_START, {bucket_s}, 'SECOND') AS BUCKET_START"] + group_by + [
+        f"{n} AS SAMPLES",
+        f"{mean} AS AVG_VALUE",
+        f"MIN({metric}_MIN) AS MIN_VALUE",
+        f"MAX({metric}_MAX) AS MAX_VALUE",
+        f"SQRT(GREATEST({sumsq} / NULLIF({n}, 0) - SQUARE({mean}), 0)) AS STDDEV_VALUE",
+    ] + [
+        f"APPROX_PERCENTILE_ESTIMATE(APPROX_PERCENTILE_COMBINE({metric}_SKETCH), {q}) AS P{round(q * 100):02d}_VALUE"
+        for q in quantiles
+    ]
+    where = ["BUCKET_START >= ?", "BUCKET_START < ?"] + [f"{column} = ?" for column in filters]
+    sql = (
+        f"SELECT {', '.join(columns)}\n"
+        f"FROM {source}_ROLLUP_{level}\n"
+        f"WHERE {' AND '.join(where)}\n"
+        f"GROUP BY ALL\n"
+        f"ORDER BY BUCKET_START"
+    )
+    params = [align(start, bucket_s), end] + list(filters.values())
+    return sql, params, level
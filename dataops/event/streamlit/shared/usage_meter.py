@@ -0,0 +1,360 @@
+"""
+Token, credit and warehouse metering per user, session and app, with budgets.
+
+The apps could not say who spent what: agent and Complete calls consume
+tokens and the dashboards and agent SQL consume warehouse time, but nothing
+tied either to a user. One ``UsageMeter`` per app process (via
+``st.cache_resource``) records every call:
+
+* ``record_tokens`` for agent and Complete calls, with the tokens reported in
+  the response or, when the response has none, an estimate from the text
+  (flagged in ``TOKENS_ESTIMATED``). Tokens become credits at the per-model
+  rates of ``usage_budgets.yaml``.
+* ``record_query`` for warehouse queries, by query ID. A daemon thread reads
+  their bytes scanned, elapsed time and warehouse size from the session's
+  query history a few seconds later, in one statement per batch, and
+  estimates credits from elapsed time and warehouse size. Queries the history
+  never returns are written with the elapsed time measured in the app.
+
+Rows go to ``USAGE_METERING`` in batches, off the answer path, and the
+``USAGE_BY_USER_HOUR`` view aggregates them for the admin panel.
+
+The meter also keeps each user's and the app's spend over the last hour in
+memory. ``level`` compares it with the budgets: past ``economy_at`` of a
+budget the apps answer in ``economy`` mode (smaller model, no chart
+suggestion), and past the budget in ``exhausted`` mode (cached or verified
+answers only). Credits are estimates for budgeting; Snowflake bills the
+warehouse per second it runs, not per query.
+"""
+import atexit
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+import yaml
+
+COLUMNS = ["APP", "USER_NAME", "SESSION_ID", "KIND", "MODEL", "TOKENS_IN", "TOKENS_OUT", "TOKENS_ESTIMATED",
+           "QUERY_ID", "BYTES_SCANNED", "ELAPSED_MS", "CREDITS", "RECORDED_AT"]
+
+QUERY_COST_SQL = """
+SELECT query_id, bytes_scanned, total_elapsed_time, warehouse_size
+FROM TABLE(information_schema.query_history_by_session(result_limit => 10000))
+WHERE query_id IN ({ids})
+"""
+
+REPORT_SQL = """
+SELECT app, user_name, hour, calls, tokens_in, tokens_out, queries, gb_scanned, credits
+FROM usage_by_user_hour
+WHERE hour >= DATEADD(hour, -?, CURRENT_TIMESTAMP())
+ORDER BY hour DESC, credits DESC
+"""
+
+# Same rates as workload_advisor.py, which is not deployed to every app
+CREDITS_PER_HOUR = {"X-Small": 1, "Small": 2, "Medium": 4, "Large": 8, "X-Large": 16,
+                    "2X-Large": 32, "3X-Large": 64, "4X-Large": 128}
+
+# Credits per million tokens for a model missing from the configured rates
+DEFAULT_TOKEN_CREDITS = 1.21
+
+CHARS_PER_TOKEN = 4
+
+_QUERY_ID = re.compile(r"[0-9a-fA-F-]{36}")
+
+# Spend key of the whole app, which no user name can equal
+_APP = ("app",)
+
+
+def insert_sql(rows):
+    """Multi-row INSERT with one bind variable per value"""
+    values = "(" + ", ".join("?" * len(COLUMNS)) + ")"
+    return f"INSERT INTO usage_metering ({', '.join(COLUMNS)}) VALUES " + ", ".join([values] * rows)
+
+
+def cost_sql(query_ids):
+    """Query history rows of the given query IDs"""
+    ids = [q for q in query_ids if _QUERY_ID.fullmatch(q or "")]
+    if not ids:
+        raise ValueError("no query IDs")
+    return QUERY_COST_SQL.format(ids=", ".join(f"'{q}'" for q in ids))
+
+
+def estimate_tokens(text):
+    """Rough token count of a text, about four characters per token"""
+    return -(-len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def agent_usage(events):
+    """Input and output tokens reported in agent events, or None when they report none"""
+    tokens_in = tokens_out = 0
+    found = False
+    for event in events if isinstance(events, list) else []:
+        data = event.get("data") if isinstance(event, dict) else None
+        if not isinstance(data, dict):
+            continue
+        usage = data.get("usage") or (data.get("metadata") or {}).get("usage")
+        if usage:
+            found = True
+            tokens_in += int(usage.get("input_tokens", usage.get("prompt_tokens", 0)) or 0)
+            tokens_out += int(usage.get("output_tokens", usage.get("completion_tokens", 0)) or 0)
+    return (tokens_in, tokens_out) if found else None
+
+
+def complete_response(raw, prompt):
+    """Text, input tokens, output tokens and whether they are estimated, of a Complete response.
+
+    With an options argument Complete returns JSON with the text in
+    ``choices[0].messages`` and the token counts in ``usage``.
+    """
+    try:
+        body = json.loads(raw)
+        text = body["choices"][0]["messages"]
+        usage = body.get("usage") or {}
+        if "prompt_tokens" in usage:
+            return text, int(usage["prompt_tokens"]), int(usage.get("completion_tokens", 0)), False
+    except (TypeError, ValueError, KeyError, IndexError):
+        text = raw
+    return text, estimate_tokens(prompt), estimate_tokens(text), True
+
+
+def describe_usage(usage):
+    """One-line summary of ``UsageMeter.usage``"""
+    def part(credits, budget):
+        return f"{credits:.3f} of {budget:g} credits" if budget else f"{credits:.3f} credits (no budget)"
+    return (f"Last hour: you {part(usage['user_credits'], usage['user_budget'])}, "
+            f"app {part(usage['app_credits'], usage['app_budget'])} · {usage['level']} mode")
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+
+
+class UsageMeter:
+    """Usage rows queued for ``USAGE_METERING`` plus rolling one-hour spend per user and app.
+
+    ``writer(sql, params)`` runs an INSERT and ``cost_loader(sql)`` returns
+    the ``QUERY_COST_SQL`` result as a DataFrame.
+    """
+
+    def __init__(self, app, writer, cost_loader, rates=None, user_hour=None, app_hour=None, economy_at=0.8,
+                 economy_model=None, window_s=3600, max_queue=5000, batch_size=200, flush_s=5.0,
+                 cost_delay_s=3.0, max_cost_attempts=4):
+        self.app = app
+        self.writer = writer
+        self.cost_loader = cost_loader
+        self.rates = dict(rates or {})
+        self.user_hour = user_hour
+        self.app_hour = app_hour
+        self.economy_at = economy_at
+        self.economy_model = economy_model
+        self.window_s = window_s
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.cost_delay_s = cost_delay_s
+        self.max_cost_attempts = max_cost_attempts
+        self._rows = deque()
+        self._pending = {}  # query_id -> [user, session_id, elapsed_ms, recorded_at, queued_at, attempts]
+        self._spend = defaultdict(deque)  # user or _APP -> (monotonic time, credits)
+        self.counters = {"token_calls": 0, "tokens_in": 0, "tokens_out": 0, "estimated_calls": 0,
+                         "queries": 0, "queries_unresolved": 0, "written": 0, "dropped": 0,
+                         "economy": 0, "exhausted": 0}
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_config(cls, path, app, writer, cost_loader):
+        """Build a meter from usage_budgets.yaml; a missing file meters without budgets"""
+        try:
+            with open(path) as f:
+                config = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            config = {}
+        budgets = config.get("budgets") or {}
+        return cls(app, writer, cost_loader,
+                   rates=config.get("token_credits_per_million"),
+                   user_hour=budgets.get("user_hour_credits"),
+                   app_hour=budgets.get("app_hour_credits"),
+                   economy_at=config.get("economy_at", 0.8),
+                   economy_model=config.get("economy_model"))
+
+    def token_credits(self, model, tokens):
+        rate = self.rates.get(model, self.rates.get("default", DEFAULT_TOKEN_CREDITS))
+        return tokens * float(rate) / 1_000_000
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="usage-meter", daemon=True)
+            self._thread.start()
+
+    def _queue(self, row):
+        if len(self._rows) >= self.max_queue:
+            self._rows.popleft()
+            self.counters["dropped"] += 1
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+
+    def _spent(self, user, credits):
+        now = time.monotonic()
+        for key in (user, _APP):
+            self._spend[key].append((now, credits))
+
+    def record_tokens(self, kind, user, session_id, model, tokens_in, tokens_out, estimated=False, elapsed_ms=None):
+        """Meter one agent or Complete call; never waits on Snowflake"""
+        credits = self.token_credits(model, tokens_in + tokens_out)
+        with self._lock:
+            self._queue((self.app, user, session_id, kind, model, tokens_in, tokens_out, estimated,
+                         None, None, elapsed_ms, credits, _now()))
+            self._spent(user, credits)
+            self.counters["token_calls"] += 1
+            self.counters["tokens_in"] += tokens_in
+            self.counters["tokens_out"] += tokens_out
+            self.counters["estimated_calls"] += bool(estimated)
+            self._start()
+
+    def record_query(self, user, session_id, query_id, elapsed_ms=None):
+        """Meter one warehouse query; its cost is read from the query history in the background"""
+        if not query_id:
+            return
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                self.counters["dropped"] += 1
+                return
+            self._pending[query_id] = [user, session_id, elapsed_ms, _now(), time.monotonic(), 0]
+            self.counters["queries"] += 1
+            self._start()
+
+    def _query_row(self, query_id, pending, bytes_scanned=None, elapsed_ms=None, warehouse_size=None):
+        user, session_id, measured_ms, recorded_at = pending[:4]
+        elapsed_ms = elapsed_ms if elapsed_ms is not None else measured_ms
+        credits = (elapsed_ms or 0) / 3_600_000 * CREDITS_PER_HOUR.get(warehouse_size, 1)
+        self._spent(user, credits)
+        return (self.app, user, session_id, "query", warehouse_size, None, None, None,
+                query_id, bytes_scanned, elapsed_ms, credits, recorded_at)
+
+    def _resolve(self, everything=False):
+        """Move queries whose cost is known, or will never be, from pending to the row queue"""
+        cutoff = time.monotonic() - self.cost_delay_s
+        with self._lock:
+            due = [q for q, p in self._pending.items() if everything or p[4] <= cutoff]
+        if not due:
+            return
+        found = {}
+        try:
+            for start in range(0, len(due), 1000):
+                history = self.cost_loader(cost_sql(due[start:start + 1000]))
+                for row in history.itertuples(index=False):
+                    found[row.QUERY_ID] = row
+        except Exception as e:
+            self.last_error = e
+        with self._lock:
+            for query_id in due:
+                pending = self._pending.get(query_id)
+                if pending is None:
+                    continue
+                row = found.get(query_id)
+                if row is not None:
+                    del self._pending[query_id]
+                    self._queue(self._query_row(query_id, pending, int(row.BYTES_SCANNED or 0),
+                                                int(row.TOTAL_ELAPSED_TIME or 0), row.WAREHOUSE_SIZE))
+                    continue
+                pending[5] += 1
+                if everything or pending[5] >= self.max_cost_attempts:
+                    del self._pending[query_id]
+                    self.counters["queries_unresolved"] += 1
+                    self._queue(self._query_row(query_id, pending))
+
+    def _write(self):
+        with self._lock:
+            batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+        if not batch:
+            return False
+        try:
+            self.writer(insert_sql(len(batch)), [value for row in batch for value in row])
+        except Exception as e:
+            # Put the batch back for the next round; the queue bound drops the oldest rows
+            self.last_error = e
+            with self._lock:
+                self._rows.extendleft(reversed(batch))
+                while len(self._rows) > self.max_queue:
+                    self._rows.popleft()
+                    self.counters["dropped"] += 1
+            return False
+        self.last_error = None
+        with self._lock:
+            self.counters["written"] += len(batch)
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self._resolve()
+            while self._write():
+                pass
+
+    def flush(self):
+        """Resolve what the query history has and write every queued row now"""
+        if self._thread is None:
+            return
+        self._resolve(everything=True)
+        while self._write():
+            pass
+
+    def spent(self, user=_APP):
+        """Credits of a user, or by default of the whole app, over the last ``window_s`` seconds"""
+        cutoff = time.monotonic() - self.window_s
+        with self._lock:
+            spend = self._spend[user]
+            while spend and spend[0][0] < cutoff:
+                spend.popleft()
+            return sum(credits for _, credits in spend)
+
+    def level(self, user):
+        """``normal``, ``economy`` or ``exhausted`` by the fuller of the user's and the app's budgets"""
+        used = max(self.spent(user) / self.user_hour if self.user_hour else 0.0,
+                   self.spent() / self.app_hour if self.app_hour else 0.0)
+        if used >= 1.0:
+            return "exhausted"
+        return "economy" if used >= self.economy_at else "normal"
+
+    def degraded(self, level):
+        """Count a call answered in ``economy`` or ``exhausted`` mode"""
+        with self._lock:
+            self.counters[level] += 1
+
+    def agent_model(self, user, model):
+        """Model for an agent call by ``user``: the economy model in economy mode, None once the budget is spent"""
+        level = self.level(user)
+        if level == "exhausted":
+            self.degraded(level)
+            return None
+        if level == "economy" and self.economy_model:
+            self.degraded(level)
+            return self.economy_model
+        return model
+
+    def record_agent(self, user, session_id, model, question, events, answer, elapsed_ms=None):
+        """Meter an agent answer; without token counts in ``events``, estimate them from ``question`` and ``answer()``"""
+        usage = agent_usage(events)
+        estimated = usage is None
+        if estimated:
+            usage = (estimate_tokens(question), estimate_tokens(answer()))
+        self.record_tokens("agent", user, session_id, model, *usage, estimated=estimated, elapsed_ms=elapsed_ms)
+
+    def usage(self, user):
+        """This user's and the app's spend over the last hour against their budgets"""
+        return {"level": self.level(user), "user_credits": self.spent(user), "user_budget": self.user_hour,
+                "app_credits": self.spent(), "app_budget": self.app_hour}
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters, queued=len(self._rows), resolving=len(self._pending))
+        counters["last_error"] = str(self.last_error) if self.last_error else None
+        return counters
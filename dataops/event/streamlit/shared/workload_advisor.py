@@ -0,0 +1,276 @@
+"""
+Physical-design advice from the SQL the apps actually run.
+
+Every app tags its Snowpark session with ``QUERY_TAG``, so its statements can
+be found in ``INFORMATION_SCHEMA.QUERY_HISTORY`` together with their elapsed
+time, bytes scanned and partition pruning. ``query_shape`` reduces a statement
+to its structure: the tables it reads, its group-by keys, the columns it filters
+on (``lookups`` are the ones compared with ``=`` or ``IN`` against literals)
+and its aggregates. ``workload`` groups the history by shape and ranks the
+shapes by warehouse credits.
+
+``recommend`` turns the costly shapes into DDL: a dynamic-table rollup for
+decomposable aggregates, a clustering key when pruning is poor, and search
+optimization for point lookups on ``*_ID`` columns. The estimated saving
+assumes that elapsed time scales with the share of data scanned. A rollup is
+assumed to scan ``ROLLUP_SCAN`` of the base table, a clustered table
+``CLUSTERED_SCAN`` and a search-optimized lookup ``LOOKUP_SCAN``. Refresh and
+maintenance credits are not subtracted.
+"""
+from collections import namedtuple
+
+from query_reuse import tokenize
+from time_pyramid import SOURCES as ROLLUP_SOURCES
+
+APP_TAGS = ("telco_network_ops", "telco_customer_analytics", "cortex_chat")
+
+HISTORY_SQL = """
+SELECT query_id, query_text, query_tag, warehouse_size, total_elapsed_time, bytes_scanned,
+       partitions_scanned, partitions_total, start_time
+FROM TABLE(information_schema.query_history(
+    end_time_range_start => DATEADD(day, -{days}, CURRENT_TIMESTAMP()), result_limit => 10000))
+WHERE query_tag IN ({tags})
+  AND query_type = 'SELECT'
+  AND execution_status = 'SUCCESS'
+"""
+
+TIME_COLUMNS = {
+    "NETWORK_PERFORMANCE": ("MEASUREMENT_TIMESTAMP", "hour"),
+    "CUSTOMER_USAGE": ("USAGE_DATE", "day"),
+    "SERVICE_QUALITY_METRICS": ("QUALITY_MEASUREMENT_TIME", "hour"),
+    "NETWORK_INCIDENTS": ("INCIDENT_START_TIME", "hour"),
+}
+
+# Credits per hour by warehouse size
+CREDITS_PER_HOUR = {"X-Small": 1, "Small": 2, "Medium": 4, "Large": 8, "X-Large": 16,
+                    "2X-Large": 32, "3X-Large": 64, "4X-Large": 128}
+
+ROLLUP_SCAN = 0.05
+CLUSTERED_SCAN = 0.1
+LOOKUP_SCAN = 0.01
+
+AGGREGATES = {"SUM", "AVG", "COUNT", "MIN", "MAX", "MEDIAN", "STDDEV", "VARIANCE", "PERCENTILE_CONT",
+              "APPROX_COUNT_DISTINCT", "APPROX_PERCENTILE", "COUNT_IF", "ANY_VALUE", "LISTAGG"}
+DECOMPOSABLE = {"SUM", "AVG", "COUNT", "MIN", "MAX"}
+
+_CLAUSES = {"SELECT", "FROM", "JOIN", "WHERE", "GROUP", "HAVING", "ORDER", "QUALIFY", "LIMIT", "ON",
+            "UNION", "EXCEPT", "MINUS", "INTERSECT", "WITH"}
+_KEYWORDS = _CLAUSES | {
+    "AND", "OR", "NOT", "NULL", "IS", "IN", "BETWEEN", "LIKE", "ILIKE", "CASE", "WHEN", "THEN", "ELSE",
+    "END", "DISTINCT", "AS", "ASC", "DESC", "TRUE", "FALSE", "INTERVAL", "ALL", "ANY", "EXISTS", "OVER",
+    "PARTITION", "BY", "ROWS", "RANGE", "NULLS", "FIRST", "LAST", "INNER", "LEFT", "RIGHT", "FULL",
+    "OUTER", "CROSS", "USING", "TABLE", "LATERAL", "ROLLUP", "CUBE", "GROUPING", "SETS",
+    "YEAR", "QUARTER", "MONTH", "WEEK", "DAY", "HOUR", "MINUTE", "SECOND",
+    "CURRENT_DATE", "CURRENT_TIMESTAMP", "CURRENT_TIME", "SYSDATE", "LOCALTIMESTAMP",
+}
+
+# Functions that take a FROM inside their arguments
+_FROM_FUNCTIONS = {"EXTRACT", "TRIM", "SUBSTRING", "POSITION"}
+
+Shape = namedtuple("Shape", ["tables", "group_by", "filters", "lookups", "aggregates"])
+
+
+def history_sql(days=7, tags=APP_TAGS):
+    """Successful SELECTs of the apps; INFORMATION_SCHEMA keeps seven days"""
+    return HISTORY_SQL.format(days=min(7, int(days)), tags=", ".join(f"'{t}'" for t in tags))
+
+
+def _is_column(tokens, i):
+    kind, text = tokens[i]
+    if kind == "quoted":
+        return True
+    if kind != "word" or text in _KEYWORDS:
+        return False
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    # Function names and table qualifiers are not columns
+    return following not in (("op", "("), ("op", "."))
+
+
+def _name(token):
+    kind, text = token
+    return text.strip('"').upper() if kind == "quoted" else text
+
+
+def _enclosing(tokens):
+    """Per token: the innermost function it is an argument of, and the opening parenthesis of the nearest aggregate"""
+    stack, result = [], []
+    for i, token in enumerate(tokens):
+        if token == ("op", ")") and stack:
+            stack.pop()
+        function = stack[-1][0] if stack else None
+        aggregate = next((opening for name, opening in reversed(stack) if name in AGGREGATES), None)
+        result.append((function, aggregate))
+        if token == ("op", "("):
+            previous = tokens[i - 1] if i else None
+            stack.append((previous[1] if previous and previous[0] == "word" else None, i))
+    return result
+
+
+def query_shape(sql):
+    """Tables, group-by keys, filter and lookup columns, and aggregates of a statement"""
+    tokens = tokenize(sql)
+    enclosing = _enclosing(tokens)
+    ctes = {tokens[i - 1][1] for i in range(1, len(tokens) - 1)
+            if tokens[i] == ("word", "AS") and tokens[i + 1] == ("op", "(") and tokens[i - 1][0] == "word"}
+    tables, group_by, filters, lookups = set(), set(), set(), set()
+    arguments = {}
+    select_keys, group_all = set(), False
+    clause = None
+    for i, (kind, text) in enumerate(tokens):
+        function, aggregate = enclosing[i]
+        if kind == "word" and text in _CLAUSES and function not in _FROM_FUNCTIONS:
+            clause = text
+            if text in ("FROM", "JOIN") and i + 1 < len(tokens) and tokens[i + 1][0] in ("word", "quoted"):
+                j = i + 1
+                while j + 2 < len(tokens) and tokens[j + 1] == ("op", "."):
+                    j += 2
+                name = _name(tokens[j])
+                if name not in ctes and name not in _KEYWORDS:
+                    tables.add(name)
+            continue
+        if kind == "word" and text in AGGREGATES and i + 1 < len(tokens) and tokens[i + 1] == ("op", "("):
+            # Filled in with the first column of the argument list below
+            arguments[i + 1] = [text, "", None]
+            continue
+        if aggregate is not None:
+            call = arguments.get(aggregate)
+            if call is not None:
+                if text == "DISTINCT":
+                    call[1] = "DISTINCT "
+                elif call[2] is None and _is_column(tokens, i):
+                    call[2] = _name(tokens[i])
+            continue
+        if clause == "GROUP" and (text == "ALL" or kind == "number"):
+            group_all = True
+        if not _is_column(tokens, i):
+            continue
+        column = _name(tokens[i])
+        if clause == "SELECT":
+            previous = tokens[i - 1]
+            # A word right after an expression is its alias
+            if previous not in (("word", "AS"), ("op", ")")) and not (previous[0] in ("word", "quoted") and previous[1] not in _KEYWORDS):
+                select_keys.add(column)
+        elif clause == "GROUP":
+            group_by.add(column)
+        elif clause in ("WHERE", "HAVING", "QUALIFY"):
+            filters.add(column)
+            following = tokens[i + 1:i + 3]
+            if following[:1] == [("op", "=")] and len(following) > 1 and following[1][0] in ("string", "number"):
+                lookups.add(column)
+            elif following == [("word", "IN"), ("op", "(")] and i + 3 < len(tokens) and tokens[i + 3][0] in ("string", "number"):
+                lookups.add(column)
+    aggregates = {f"{name}({distinct}{column or '*'})" for name, distinct, column in arguments.values()}
+    if group_all:
+        group_by |= select_keys
+    return Shape(tuple(sorted(tables)), tuple(sorted(group_by)), tuple(sorted(filters)),
+                 tuple(sorted(lookups)), tuple(sorted(aggregates)))
+
+
+def _credits(history):
+    rate = history["WAREHOUSE_SIZE"].map(CREDITS_PER_HOUR).astype(float).fillna(1.0)
+    return history["TOTAL_ELAPSED_TIME"].astype(float) / 3_600_000 * rate
+
+
+def workload(history):
+    """One row per query shape with its runs, elapsed seconds, bytes, pruning and credits, costliest first"""
+    import pandas as pd
+    if history.empty:
+        return pd.DataFrame(columns=["SHAPE", "RUNS", "TOTAL_S", "GB_SCANNED", "SCAN_FRACTION", "CREDITS",
+                                     "APPS", "EXAMPLE"])
+    history = history.assign(
+        SHAPE=[query_shape(sql) for sql in history["QUERY_TEXT"]],
+        CREDITS=_credits(history),
+        SCAN_FRACTION=history["PARTITIONS_SCANNED"].astype(float)
+        / history["PARTITIONS_TOTAL"].astype(float).where(lambda t: t > 0),
+    )
+    grouped = history.groupby("SHAPE", sort=False)
+    shapes = pd.DataFrame({
+        "RUNS": grouped.size(),
+        "TOTAL_S": grouped["TOTAL_ELAPSED_TIME"].sum().astype(float) / 1000,
+        "GB_SCANNED": grouped["BYTES_SCANNED"].sum().astype(float) / 1024 ** 3,
+        "SCAN_FRACTION": grouped["SCAN_FRACTION"].mean(),
+        "PARTITIONS_TOTAL": grouped["PARTITIONS_TOTAL"].max(),
+        "CREDITS": grouped["CREDITS"].sum(),
+        "APPS": grouped["QUERY_TAG"].agg(lambda tags: ", ".join(sorted(set(tags)))),
+        "EXAMPLE": grouped["QUERY_TEXT"].first(),
+    }).reset_index()
+    return shapes.sort_values("CREDITS", ascending=False, ignore_index=True)
+
+
+def describe(shape):
+    parts = [" + ".join(shape.tables) or "(no table)"]
+    if shape.aggregates:
+        parts.append(", ".join(shape.aggregates))
+    if shape.group_by:
+        parts.append("by " + ", ".join(shape.group_by))
+    if shape.filters:
+        parts.append("where " + ", ".join(shape.filters))
+    return " · ".join(parts)
+
+
+def _rollup(shape, table, warehouse):
+    """(kind, DDL) of a rollup serving the shape's aggregates from a base table, or None"""
+    functions = {a.split("(")[0] for a in shape.aggregates}
+    if table not in TIME_COLUMNS or not shape.aggregates or not functions <= DECOMPOSABLE \
+            or any("DISTINCT" in a for a in shape.aggregates):
+        return None
+    time_column, unit = TIME_COLUMNS.get(table, (None, None))
+    keys = sorted((set(shape.group_by) | set(shape.filters)) - {time_column})
+    if any(k.endswith("_ID") for k in keys):
+        # Per-entity keys barely aggregate
+        return None
+    measures = sorted({a[a.index("(") + 1:-1] for a in shape.aggregates} - {"*"})
+    source = ROLLUP_SOURCES.get(table)
+    if source and set(keys) <= set(source["dimensions"]) and set(measures) <= set(source["metrics"]):
+        return ("existing rollup", f"-- Served by the existing {table}_ROLLUP_* dynamic tables; "
+                                   f"add them to the semantic model to route these questions there")
+    select = []
+    if time_column and time_column in set(shape.group_by) | set(shape.filters):
+        select.append(f"DATE_TRUNC('{unit}', {time_column}) AS {time_column}_{unit.upper()}")
+    select += keys + ["COUNT(*) AS ROW_COUNT"]
+    for m in measures:
+        select += [f"COUNT({m}) AS {m}_N", f"SUM({m}) AS {m}_SUM", f"MIN({m}) AS {m}_MIN", f"MAX({m}) AS {m}_MAX"]
+    name = "_".join([table, "BY"] + (keys or [unit.upper() if unit else "ALL"]))
+    columns = ",\n       ".join(select)
+    return "rollup", (f"CREATE OR REPLACE DYNAMIC TABLE {name}\n"
+                      f"    TARGET_LAG = '15 minutes'\n"
+                      f"    WAREHOUSE = {warehouse}\n"
+                      f"AS\nSELECT {columns}\n"
+                      f"FROM {table}\nGROUP BY ALL;")
+
+
+def recommend(shapes, warehouse="COMPUTE_WH", top=10, min_partitions=16, poor_pruning=0.3):
+    """DDL for the costliest shapes with an estimated saving in seconds and credits"""
+    import pandas as pd
+    rows = []
+    for shape, runs, total_s, fraction, partitions, credits in shapes[
+            ["SHAPE", "RUNS", "TOTAL_S", "SCAN_FRACTION", "PARTITIONS_TOTAL", "CREDITS"]].head(top).itertuples(index=False):
+        if len(shape.tables) != 1:
+            # Columns cannot be attributed to tables without the schema
+            continue
+        table = shape.tables[0]
+        fraction = 1.0 if pd.isna(fraction) else float(fraction)
+        candidates = []
+        rollup = _rollup(shape, table, warehouse)
+        if rollup:
+            candidates.append(rollup + (1 - ROLLUP_SCAN,))
+        large = not pd.isna(partitions) and partitions >= min_partitions
+        if large and fraction > poor_pruning:
+            ids = [c for c in shape.lookups if c.endswith("_ID")]
+            if ids:
+                candidates.append(("search optimization",
+                                   f"ALTER TABLE {table} ADD SEARCH OPTIMIZATION ON EQUALITY({', '.join(ids)});",
+                                   max(0.0, 1 - LOOKUP_SCAN / fraction)))
+            time_column, _ = TIME_COLUMNS.get(table, (None, None))
+            keys = [f"TO_DATE({time_column})"] if time_column in shape.filters else []
+            keys += [c for c in shape.lookups if not c.endswith("_ID") and c != time_column][:2]
+            if keys:
+                candidates.append(("clustering key", f"ALTER TABLE {table} CLUSTER BY ({', '.join(keys)});",
+                                   max(0.0, 1 - CLUSTERED_SCAN / fraction)))
+        for kind, ddl, share in candidates:
+            rows.append({"SHAPE": describe(shape), "KIND": kind, "TABLE": table, "RUNS": runs,
+                         "TOTAL_S": total_s, "EST_SAVING_S": total_s * share,
+                         "EST_SAVING_CREDITS": credits * share, "DDL": ddl})
+    result = pd.DataFrame(rows, columns=["SHAPE", "KIND", "TABLE", "RUNS", "TOTAL_S", "EST_SAVING_S",
+                                         "EST_SAVING_CREDITS", "DDL"])
+    return result.sort_values("EST_SAVING_CREDITS", ascending=False, ignore_index=True)
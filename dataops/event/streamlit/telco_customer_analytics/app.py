@@ -1,41 +1,221 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import json
 import _snowflake
-import re
-import pandas as pd
+import time
+import yaml
 from snowflake.snowpark.context import get_active_session
-import plotly.express as px
-import plotly.graph_objects as go
+from resilient_agent import (AgentCallError, AnswerCache, CircuitOpenError,
+                             ResilientCaller, fallback_events, match_verified_query)
+from model_router import ModelRouter
+from arrow_results import describe_footprint, result_frame
+from downsample import downsample_frame, render_chart
+from freshness import Watermarks, answer_tables, markers_sql
+from query_reuse import QueryReuse, async_result
+from query_scheduler import DeadlineExceeded, QueryScheduler
+from conversation_log import RESTORE_SQL as CONVERSATION_SQL, ConversationLog, new_conversation_id
+from bulk_questions import agent_asker, render_bulk_questions
+from result_grid import render_result_grid
+from figure_cache import FigureCache
+from prewarm import Prewarm, prewarm_sql
+from rerun_profiler import run_profiled
+from usage_meter import UsageMeter, describe_usage
 
 logo = 'snowflake_logo_color_rgb.svg'
+
+@st.cache_resource
+def get_stylesheet():
+    """extra.css, read from disk once per process"""
+    with open('extra.css') as ab:
+        return f"<style>{ab.read()}</style>"
+
 session = get_active_session()
-model = 'llama3.3-70b'
 st.set_page_config(layout="wide", page_title="Telco Customer Analytics")
 
-with open('extra.css') as ab:
-    st.markdown(f"<style>{ab.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
 
 st.logo(logo)
 
 API_ENDPOINT = "/api/v2/cortex/agent:run"
-API_TIMEOUT = 50000
+API_TIMEOUT = 50000  # upper bound in milliseconds; the caller adapts below it
 
 CORTEX_SEARCH_SERVICES = "DEFAULT_SCHEMA.CUSTOMER_DOCUMENTATION"
 SEMANTIC_MODELS = "@CORTEX_ANALYST.CORTEX_ANALYST/telco_semantic_model.yaml"
+QUERY_TAG = "telco_customer_analytics"  # finds this app's statements in the query history
+
+if session.query_tag != QUERY_TAG:
+    session.query_tag = QUERY_TAG
+
+DASHBOARD_TAB = "📊 Dashboard"
+ASSISTANT_TAB = "💬 AI Assistant"
+ANALYTICS_TAB = "📈 Advanced Analytics"
+TABS = [DASHBOARD_TAB, ASSISTANT_TAB, ANALYTICS_TAB]
 
-def run_snowflake_query(query):
-    """Run Snowflake SQL Query"""
+@st.cache_resource
+def get_query_scheduler():
+    """Priority admission of warehouse queries and agent calls, shared by every session"""
+    return QueryScheduler()
+
+@st.cache_resource
+def get_usage_meter():
+    """Tokens, credits and warehouse queries per user and session, written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return UsageMeter.from_config(
+        'usage_budgets.yaml', QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda sql: result_frame(session.sql(sql)), "background"))
+
+def usage_context():
+    """User name and Streamlit session ID that usage is attributed to"""
+    ctx = get_script_run_ctx()
+    return st.experimental_user.get('user_name'), ctx.session_id if ctx else None
+
+def run_snowflake_query(query, priority="interactive"):
+    """Run Snowflake SQL Query in the scheduler's ``priority`` class, metered to the current user"""
+    user, session_id = usage_context()
     try:
-        df = session.sql(query.replace(';',''))
+        started = time.perf_counter()
+        df = get_query_scheduler().run(
+            lambda: result_frame(session.sql(query.replace(';','')).collect_nowait(), session=session), priority)
+        get_usage_meter().record_query(user, session_id, df.attrs["footprint"]["query_id"],
+                                       (time.perf_counter() - started) * 1000)
         return df
+
+    except DeadlineExceeded:
+        # Dropped while queued behind higher-priority work; the next rerun asks again
+        return None
     except Exception as e:
         st.error(f"Error executing SQL: {str(e)}")
         return None
 
-def snowflake_api_call(query: str, limit: int = 10):
-    """Make an Agent API Call"""
-    payload = {
-        "model": f"{model}",
+@st.cache_resource
+def get_figure_cache():
+    """Dashboard figures as JSON by data fingerprint, shared by every session"""
+    return FigureCache()
+
+@st.cache_resource
+def get_agent_caller():
+    """One resilient agent caller per app process, shared by every session"""
+    return ResilientCaller(max_timeout_ms=API_TIMEOUT)
+
+@st.cache_resource
+def get_answer_cache():
+    """Last good agent answer per question, used while the agent is unavailable"""
+    return AnswerCache()
+
+@st.cache_resource
+def get_watermarks():
+    """Per-table data versions shared by every session, for invalidating cached results"""
+    return Watermarks(get_query_scheduler().wrap(
+        lambda: result_frame(session.sql(markers_sql())), "background"))
+
+@st.cache_resource
+def get_query_reuse():
+    """Agent SQL results by normalized fingerprint and table versions, shared by every session"""
+    return QueryReuse(get_query_scheduler().wrap(
+        lambda sql: async_result(session.sql(sql).collect_nowait(), session), "interactive"))
+
+def run_agent_query(sql):
+    """Run agent SQL, reusing the result of an equivalent query while its tables are unchanged"""
+    sql = sql.replace(';', '')
+    df = get_query_reuse().run(sql, get_watermarks().tag_sql(sql))
+    footprint = df.attrs.get("footprint", {})
+    if footprint.get("source") != "memory":
+        get_usage_meter().record_query(*usage_context(), footprint.get("query_id"))
+    return df
+
+@st.cache_resource
+def get_conversation_log():
+    """Answered turns queued for CONVERSATION_HISTORY and written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return ConversationLog(
+        QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda user, app, cid: result_frame(session.sql(CONVERSATION_SQL, params=[user, app, cid])),
+                       "interactive"))
+
+def conversation_id():
+    """ID of this conversation, kept in the URL so that a reload restores it"""
+    if "conversation" not in st.query_params:
+        st.query_params["conversation"] = new_conversation_id()
+    return st.query_params["conversation"]
+
+def restore_messages(key="messages"):
+    """This session's chat messages; after a reload they are read back from the history table"""
+    if key not in st.session_state:
+        reloaded = "conversation" in st.query_params
+        cid = conversation_id()
+        messages = get_conversation_log().restore(cid, st.experimental_user.get('user_name')) if reloaded else []
+        if messages is None:
+            # A shared link to another user's conversation: start this user's own
+            st.query_params["conversation"] = new_conversation_id()
+            messages = []
+        st.session_state[key] = messages
+    return st.session_state[key]
+
+def log_turn(query, text, sql, started):
+    """Queue an answered turn for the history table; adds no latency to the answer"""
+    call = st.session_state.get('last_agent_call', {})
+    get_conversation_log().record(conversation_id(), query, text, sql=sql, model=call.get('model'),
+                                  route=call.get('route'), agent_ms=call.get('agent_ms'),
+                                  answer_ms=(time.perf_counter() - started) * 1000,
+                                  user=st.experimental_user.get('user_name'))
+
+@st.cache_data(ttl=3600)
+def get_semantic_model():
+    """Semantic model YAML from the Cortex Analyst stage"""
+    try:
+        with session.file.get_stream(SEMANTIC_MODELS) as f:
+            return yaml.safe_load(f) or {}
+    except Exception:
+        return {}
+
+def get_verified_queries():
+    """Verified queries from the semantic model, used while the agent is unavailable"""
+    return get_semantic_model().get('verified_queries', [])
+
+@st.cache_resource
+def build_model_router():
+    """Routes each request to a model by complexity, shared by every session"""
+    return ModelRouter.from_config('model_routes.yaml')
+
+def get_model_router():
+    """The shared router, given the semantic model's table vocabulary once the model can be read"""
+    router = build_model_router()
+    if not router.vocabulary:
+        # A failed stage read returns {}; try again rather than route without tables for good
+        router.set_semantic_model(get_semantic_model())
+    return router
+
+@st.cache_resource
+def get_prewarm():
+    """Reads the semantic model and resumes the warehouse once per process, alongside the first page load"""
+    scheduler = get_query_scheduler()
+    prewarm = Prewarm([
+        ("semantic model", get_semantic_model),
+        ("warehouse", lambda: scheduler.run(
+            lambda: session.sql(prewarm_sql(get_semantic_model())).collect(), "background")),
+    ])
+    # The step thread reads the semantic model through st.cache_data
+    add_script_run_ctx(prewarm.thread)
+    return prewarm.start()
+
+def fallback_response(query):
+    """Answer from the answer cache or the closest verified query"""
+    cached = get_answer_cache().get(query, get_watermarks().is_current)
+    if cached is not None:
+        st.info("ℹ️ Showing the last answer to this question while the agent is unavailable.")
+        return cached
+    verified = match_verified_query(query, get_verified_queries())
+    if verified:
+        st.info("ℹ️ Answering from the closest verified query while the agent is unavailable.")
+        return fallback_events(f"Closest verified question: **{verified['question']}**", verified['sql'])
+    return None
+
+def agent_payload(query, model):
+    """Agent request body with the analyst and search tools"""
+    return {
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -70,11 +250,25 @@ def snowflake_api_call(query: str, limit: int = 10):
             }
         }
     }
+
+def snowflake_api_call(query: str, limit: int = 10):
+    """Make an Agent API Call, within this hour's usage budget"""
+    user, session_id = usage_context()
+    route, agent_model = get_model_router().route(query)
+    agent_model = get_usage_meter().agent_model(user, agent_model)
+    if agent_model is None:
+        st.warning("⚠️ This hour's usage budget is spent; answering from cached and verified answers only.")
+        return fallback_response(query)
+    payload = agent_payload(query, agent_model)
     
+    started = time.perf_counter()
+    answered = False
     try:
-        resp = _snowflake.send_snow_api_request(
-            "POST", API_ENDPOINT, {}, {}, payload, None, API_TIMEOUT
-        )
+        resp = get_query_scheduler().run(lambda: get_agent_caller().call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ))
         
         if resp["status"] != 200:
             st.error(f"❌ HTTP Error: {resp['status']} - {resp.get('reason', 'Unknown reason')}")
@@ -86,11 +280,24 @@ def snowflake_api_call(query: str, limit: int = 10):
             st.error("❌ Failed to parse API response.")
             return None
             
+        get_answer_cache().put(query, response_content, get_watermarks().tag(answer_tables(resp["content"])))
+        text, sql, _ = process_sse_response(response_content)
+        get_usage_meter().record_agent(user, session_id, agent_model, query, response_content,
+                                       lambda: text + sql, (time.perf_counter() - started) * 1000)
+        # Route quality counts answers with SQL or text, not just a successful HTTP call
+        answered = bool(sql or text.strip())
         return response_content
             
+    except (CircuitOpenError, AgentCallError) as e:
+        st.warning(f"⚠️ Cortex Agent unavailable: {str(e)}")
+        return fallback_response(query)
     except Exception as e:
         st.error(f"Error making request: {str(e)}")
         return None
+    finally:
+        get_model_router().record(route, time.perf_counter() - started, answered)
+        st.session_state.last_agent_call = {"route": route, "model": agent_model,
+                                            "agent_ms": (time.perf_counter() - started) * 1000}
 
 def process_sse_response(response):
     """Process SSE response"""
@@ -140,9 +347,9 @@ def get_customer_overview():
         FROM customer_usage 
         WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())
         """
-        result = run_snowflake_query(query)
-        if result:
-            return result.to_pandas().iloc[0]
+        result = run_snowflake_query(query, "sidebar")
+        if result is not None:
+            return result.iloc[0]
     except:
         pass
     return None
@@ -161,9 +368,9 @@ def get_top_service_plans():
         ORDER BY customer_count DESC
         LIMIT 5
         """
-        result = run_snowflake_query(query)
-        if result:
-            return result.to_pandas()
+        result = run_snowflake_query(query, "sidebar")
+        if result is not None:
+            return result
     except:
         pass
     return None
@@ -181,16 +388,75 @@ def get_usage_trends():
         GROUP BY usage_date
         ORDER BY usage_date
         """
-        result = run_snowflake_query(query)
-        if result:
-            return result.to_pandas()
+        result = run_snowflake_query(query, "sidebar")
+        if result is not None:
+            return result
     except:
         pass
     return None
 
+def get_customer_segmentation():
+    """Get customer segments by monthly bill"""
+    query = """
+    SELECT 
+        CASE 
+            WHEN monthly_bill_amount >= 100 THEN 'Premium'
+            WHEN monthly_bill_amount >= 60 THEN 'Standard'
+            ELSE 'Basic'
+        END as segment,
+        COUNT(DISTINCT customer_id) as customer_count,
+        AVG(data_usage_gb) as avg_data_usage,
+        AVG(monthly_bill_amount) as avg_bill
+    FROM customer_usage 
+    WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())
+    GROUP BY segment
+    ORDER BY avg_bill DESC
+    """
+    result = run_snowflake_query(query, "sidebar")
+    if result is not None:
+        return result
+    return None
+
+def get_device_usage():
+    """Get usage by device type"""
+    query = """
+    SELECT 
+        device_type,
+        COUNT(DISTINCT customer_id) as users,
+        AVG(data_usage_gb) as avg_data_usage,
+        AVG(voice_minutes) as avg_voice_minutes
+    FROM customer_usage 
+    WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())
+    GROUP BY device_type
+    ORDER BY users DESC
+    """
+    result = run_snowflake_query(query, "sidebar")
+    if result is not None:
+        return result
+    return None
+
+def load_tab_data(name, loader, tables=("CUSTOMER_USAGE",)):
+    """Fetch a tab's data when first viewed and keep it for the session until one of its tables changes"""
+    tab_data = st.session_state.setdefault('tab_data', {})
+    watermarks = get_watermarks()
+    if name not in tab_data or not watermarks.is_current(tab_data[name][0]):
+        tag = watermarks.tag(tables)
+        data = loader()
+        if data is None:
+            return None
+        tab_data[name] = (tag, data)
+    return tab_data[name][1]
+
+def select_customer_query(query):
+    """Quick insight button callback: queue the question and open the assistant"""
+    st.session_state.customer_query = query
+    st.session_state.active_tab = ASSISTANT_TAB
+
 def create_plan_distribution_chart(df):
     """Create service plan distribution chart"""
     if df is not None and not df.empty:
+        # plotly.express is imported on the first figure cache miss, not at startup
+        import plotly.express as px
         fig = px.pie(df, values='CUSTOMER_COUNT', names='SERVICE_PLAN', 
                      title='Customer Distribution by Service Plan',
                      color_discrete_sequence=px.colors.qualitative.Set3)
@@ -201,6 +467,8 @@ def create_plan_distribution_chart(df):
 def create_usage_trend_chart(df):
     """Create usage trend chart"""
     if df is not None and not df.empty:
+        import plotly.graph_objects as go
+        df = downsample_frame(df.set_index('USAGE_DATE')).reset_index()
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=df['USAGE_DATE'], y=df['AVG_DAILY_USAGE'],
                                 mode='lines+markers', name='Avg Daily Usage (GB)',
@@ -212,17 +480,103 @@ def create_usage_trend_chart(df):
         return fig
     return None
 
+def create_segmentation_chart(df):
+    """Create customer segmentation chart"""
+    if df is not None and not df.empty:
+        import plotly.express as px
+        return px.bar(df, x='SEGMENT', y='CUSTOMER_COUNT',
+                      title='Customer Segmentation',
+                      color='AVG_BILL',
+                      color_continuous_scale='Blues')
+    return None
+
+def create_device_chart(df):
+    """Create device usage chart"""
+    if df is not None and not df.empty:
+        import plotly.express as px
+        return px.pie(df, values='USERS', names='DEVICE_TYPE',
+                      title='Device Usage Distribution')
+    return None
+
+def run_export_sql(sql, params=None):
+    """Run a result export statement and return its rows"""
+    return get_query_scheduler().run(lambda: session.sql(sql, params=params).collect())
+
+def bulk_asker():
+    """Thread-safe answer and query callables for bulk runs, bound to the shared resources"""
+    scheduler, caller, reuse, watermarks = get_query_scheduler(), get_agent_caller(), get_query_reuse(), get_watermarks()
+
+    def send(question, model):
+        payload = agent_payload(question, model)
+        resp = scheduler.run(lambda: caller.call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ), "bulk")
+        if resp["status"] != 200:
+            raise RuntimeError(f"HTTP {resp['status']} - {resp.get('reason', 'Unknown reason')}")
+        return json.loads(resp["content"])
+
+    def parse(events):
+        text, sql, _ = process_sse_response(events)
+        return text.replace("【†", "[").replace("†】", "]"), sql
+
+    return agent_asker(send, parse, lambda sql: scheduler.run(lambda: reuse.run(sql, watermarks.tag_sql(sql)), "bulk"),
+                       get_model_router(), get_usage_meter(), *usage_context())
+
 def main():
+    get_prewarm()
     st.markdown('<h0black>SNOWFLAKE | </h0black><h0blue>TELCO CUSTOMER ANALYTICS</h0blue><BR>', unsafe_allow_html=True)
 
     # Create main dashboard layout
-    tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "💬 AI Assistant", "📈 Advanced Analytics"])
+    # Sidebar for customer analytics
+    with st.sidebar:
+        st.markdown("### 🎯 **Quick Customer Insights**")
+        
+        customer_queries = [
+            "Show top 10 customers by data usage",
+            "What's the average bill by service plan?",
+            "Which customers use the most voice minutes?",
+            "Revenue analysis by customer segment",
+            "Customer churn risk indicators",
+            "Service plan upgrade recommendations"
+        ]
+        
+        for query in customer_queries:
+            st.button(f"🔍 {query}", key=f"cust_{hash(query)}", use_container_width=True,
+                      on_click=select_customer_query, args=(query,))
+
+        with st.expander("⚙️ Model routing"):
+            # Building the router reads the semantic model, which the first page load does not wait for
+            if get_prewarm().done("semantic model"):
+                st.dataframe([dict(route=r, **s) for r, s in get_model_router().stats().items()], hide_index=True)
+            else:
+                st.caption("Loading the semantic model…")
+
+        with st.expander("⏱️ Query scheduling"):
+            st.dataframe([dict(priority=p, **s) for p, s in get_query_scheduler().stats().items()], hide_index=True)
+
+        with st.expander("🚀 Startup"):
+            st.dataframe(get_prewarm().stats(), hide_index=True)
+
+        with st.expander("💳 Usage"):
+            st.caption(describe_usage(get_usage_meter().usage(usage_context()[0])))
+            st.dataframe([get_usage_meter().stats()], hide_index=True)
+
+        with st.expander("🖼️ Chart cache"):
+            st.dataframe([get_figure_cache().stats()], hide_index=True)
+
+    # Only the active tab runs, so chatting never re-queries the dashboards
+    active_tab = st.radio("View", TABS, horizontal=True, key="active_tab", label_visibility="collapsed")
     
-    with tab1:
+    if active_tab == DASHBOARD_TAB:
         st.markdown("### 📊 **Customer Overview Dashboard**")
         
+        if st.button("🔄 Refresh data", key="refresh_tab_data"):
+            st.session_state.tab_data = {}
+
         # Get overview data
-        overview = get_customer_overview()
+        overview = load_tab_data('overview', get_customer_overview)
         
         if overview is not None:
             col1, col2, col3, col4 = st.columns(4)
@@ -243,9 +597,9 @@ def main():
         
         with col1:
             st.markdown("#### 🥧 **Service Plan Distribution**")
-            plan_data = get_top_service_plans()
+            plan_data = load_tab_data('service_plans', get_top_service_plans)
             if plan_data is not None and not plan_data.empty:
-                chart = create_plan_distribution_chart(plan_data)
+                chart = get_figure_cache().figure('plan_distribution', plan_data, create_plan_distribution_chart)
                 if chart:
                     st.plotly_chart(chart, use_container_width=True)
                 
@@ -254,9 +608,9 @@ def main():
         
         with col2:
             st.markdown("#### 📈 **Usage Trends**")
-            trend_data = get_usage_trends()
+            trend_data = load_tab_data('usage_trends', get_usage_trends)
             if trend_data is not None and not trend_data.empty:
-                chart = create_usage_trend_chart(trend_data)
+                chart = get_figure_cache().figure('usage_trend', trend_data, create_usage_trend_chart)
                 if chart:
                     st.plotly_chart(chart, use_container_width=True)
                 
@@ -271,49 +625,32 @@ def main():
                     else:
                         st.info(f"📉 Usage decreased by {abs(change):.1f}% over last week")
 
-    with tab2:
+    if active_tab == ASSISTANT_TAB:
         st.markdown("### 💬 **Customer Analytics AI Assistant**")
+        render_bulk_questions(bulk_asker)
         
-        # Sidebar for customer analytics
-        with st.sidebar:
-            st.markdown("### 🎯 **Quick Customer Insights**")
-            
-            customer_queries = [
-                "Show top 10 customers by data usage",
-                "What's the average bill by service plan?",
-                "Which customers use the most voice minutes?",
-                "Revenue analysis by customer segment",
-                "Customer churn risk indicators",
-                "Service plan upgrade recommendations"
-            ]
-            
-            for query in customer_queries:
-                if st.button(f"🔍 {query}", key=f"cust_{hash(query)}", use_container_width=True):
-                    st.session_state.customer_query = query
-                    st.rerun()
-
         # Handle quick query
         if hasattr(st.session_state, 'customer_query'):
             query = st.session_state.customer_query
             delattr(st.session_state, 'customer_query')
             
             # Add to messages and process
-            if 'customer_messages' not in st.session_state:
-                st.session_state.customer_messages = []
+            restore_messages('customer_messages')
             
             st.session_state.customer_messages.append({"role": "user", "content": query})
             
             with st.spinner("Analyzing customer data..."):
+                started = time.perf_counter()
                 response = snowflake_api_call(query, 1)
                 text, sql, citations = process_sse_response(response)
                 
                 if text:
                     text = text.replace("【†", "[").replace("†】", "]")
                     st.session_state.customer_messages.append({"role": "assistant", "content": text})
+                    log_turn(query, text, sql, started)
 
         # Initialize session state for customer chat
-        if 'customer_messages' not in st.session_state:
-            st.session_state.customer_messages = []
+        restore_messages('customer_messages')
 
         # Display customer chat messages
         for message in st.session_state.customer_messages:
@@ -329,6 +666,7 @@ def main():
             
             # Get response from API
             with st.spinner("Analyzing customer data..."):
+                started = time.perf_counter()
                 response = snowflake_api_call(query, 1)
                 text, sql, citations = process_sse_response(response)
                 
@@ -336,6 +674,7 @@ def main():
                 if text:
                     text = text.replace("【†", "[").replace("†】", "]")
                     st.session_state.customer_messages.append({"role": "assistant", "content": text})
+                    log_turn(query, text, sql, started)
                     
                     with st.chat_message("assistant", avatar="📊"):
                         st.markdown(text.replace("•", "\n\n"))
@@ -357,14 +696,15 @@ def main():
 
                     with st.expander("📈 Customer Data Visualization", expanded=True):
                         try:
-                            analysis_results = run_snowflake_query(sql).to_pandas()
+                            analysis_results = run_agent_query(sql)
                             
                             if not analysis_results.empty:
                                 if len(analysis_results.index) > 1:
                                     data_tab, chart_tab = st.tabs(["📋 Data", "📊 Visualization"])
                                     
                                     with data_tab:
-                                        st.dataframe(analysis_results, use_container_width=True)
+                                        render_result_grid(analysis_results, run_export_sql)
+                                        st.caption(describe_footprint(analysis_results))
                                     
                                     with chart_tab:
                                         # Smart chart selection based on data
@@ -373,7 +713,8 @@ def main():
                                             if len(analysis_results.columns) >= 2:
                                                 # Create appropriate chart based on data structure
                                                 if 'DATE' in str(analysis_results.columns).upper() or 'TIME' in str(analysis_results.columns).upper():
-                                                    st.line_chart(analysis_results.set_index(analysis_results.columns[0]), color='#29B5E8')
+                                                    render_chart(analysis_results.set_index(analysis_results.columns[0]),
+                                                                 "st.line_chart(analysis_results, color='#29B5E8')", key="zoom_line")
                                                 else:
                                                     st.bar_chart(analysis_results.set_index(analysis_results.columns[0]), color='#29B5E8')
                                             else:
@@ -383,7 +724,7 @@ def main():
                         except Exception as e:
                             st.error(f"Error processing customer data: {str(e)}")
 
-    with tab3:
+    if active_tab == ANALYTICS_TAB:
         st.markdown("### 📈 **Advanced Customer Analytics**")
         
         col1, col2 = st.columns(2)
@@ -391,33 +732,14 @@ def main():
         with col1:
             st.markdown("#### 🎯 **Customer Segmentation**")
             try:
-                segmentation_query = """
-                SELECT 
-                    CASE 
-                        WHEN monthly_bill_amount >= 100 THEN 'Premium'
-                        WHEN monthly_bill_amount >= 60 THEN 'Standard'
-                        ELSE 'Basic'
-                    END as segment,
-                    COUNT(DISTINCT customer_id) as customer_count,
-                    AVG(data_usage_gb) as avg_data_usage,
-                    AVG(monthly_bill_amount) as avg_bill
-                FROM customer_usage 
-                WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())
-                GROUP BY segment
-                ORDER BY avg_bill DESC
-                """
-                
-                seg_result = run_snowflake_query(segmentation_query)
-                if seg_result:
-                    seg_df = seg_result.to_pandas()
+                seg_df = load_tab_data('segmentation', get_customer_segmentation)
+                if seg_df is not None:
                     st.dataframe(seg_df, use_container_width=True)
                     
                     # Create segment visualization
-                    fig = px.bar(seg_df, x='SEGMENT', y='CUSTOMER_COUNT',
-                               title='Customer Segmentation',
-                               color='AVG_BILL',
-                               color_continuous_scale='Blues')
-                    st.plotly_chart(fig, use_container_width=True)
+                    fig = get_figure_cache().figure('segmentation', seg_df, create_segmentation_chart)
+                    if fig:
+                        st.plotly_chart(fig, use_container_width=True)
                     
             except Exception as e:
                 st.error(f"Error loading segmentation data: {str(e)}")
@@ -425,33 +747,20 @@ def main():
         with col2:
             st.markdown("#### 📱 **Device Usage Analysis**")
             try:
-                device_query = """
-                SELECT 
-                    device_type,
-                    COUNT(DISTINCT customer_id) as users,
-                    AVG(data_usage_gb) as avg_data_usage,
-                    AVG(voice_minutes) as avg_voice_minutes
-                FROM customer_usage 
-                WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())
-                GROUP BY device_type
-                ORDER BY users DESC
-                """
-                
-                device_result = run_snowflake_query(device_query)
-                if device_result:
-                    device_df = device_result.to_pandas()
+                device_df = load_tab_data('device_usage', get_device_usage)
+                if device_df is not None:
                     st.dataframe(device_df, use_container_width=True)
                     
                     # Create device pie chart
-                    fig = px.pie(device_df, values='USERS', names='DEVICE_TYPE',
-                               title='Device Usage Distribution')
-                    st.plotly_chart(fig, use_container_width=True)
+                    fig = get_figure_cache().figure('device_usage', device_df, create_device_chart)
+                    if fig:
+                        st.plotly_chart(fig, use_container_width=True)
                     
             except Exception as e:
                 st.error(f"Error loading device data: {str(e)}")
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main, f"{QUERY_TAG} rerun")
 
 # Sample Customer Analytics Questions:
 # - What is the average data usage by service plan?
@@ -1,38 +1,218 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import json
 import _snowflake
 import re
+import time
+import yaml
+from datetime import date, datetime, timedelta
 from snowflake.snowpark.context import get_active_session
+from resilient_agent import (AgentCallError, AnswerCache, CircuitOpenError,
+                             ResilientCaller, fallback_events, match_verified_query)
+from model_router import ModelRouter
+from arrow_results import describe_footprint, result_frame
+from downsample import render_chart
+from freshness import Watermarks, answer_tables, markers_sql
+from query_reuse import QueryReuse, async_result
+from query_scheduler import DeadlineExceeded, QueryScheduler
+from conversation_log import RESTORE_SQL as CONVERSATION_SQL, ConversationLog, new_conversation_id
+from bulk_questions import agent_asker, render_bulk_questions
+from result_grid import render_result_grid
+from prewarm import Prewarm, prewarm_sql
+from rerun_profiler import run_profiled
+from usage_meter import REPORT_SQL as USAGE_REPORT_SQL, UsageMeter, complete_response, describe_usage
+from workload_advisor import describe, history_sql, recommend, workload
+from time_pyramid import SOURCES as ROLLUP_SOURCES, pyramid_query
+from kpi_cube import METRICS as CUBE_METRICS, CubeCache, cube_sql
+from anomaly_detector import AnomalyMonitor, measurements_sql
+from alert_feed import ALERTS_SQL as ACTIVE_ALERTS_SQL, VERSION_SQL as ALERT_VERSION_SQL, AlertFeed
+from incident_correlation import (METRICS as IMPACT_METRICS, IncidentIndex, attach_incidents,
+                                  degraded_windows, incidents_sql, kpi_deltas, series_sql)
 logo = 'snowflake_logo_color_rgb.svg'
+
+@st.cache_resource
+def get_stylesheet():
+    """extra.css, read from disk once per process"""
+    with open('extra.css') as ab:
+        return f"<style>{ab.read()}</style>"
+
 session = get_active_session()
-model = 'llama3.3-70b'
 st.set_page_config(layout="wide")
-with open('extra.css') as ab:
-    st.markdown(f"<style>{ab.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
 
 st.logo(logo)
-session = get_active_session()
 
 API_ENDPOINT = "/api/v2/cortex/agent:run"
-API_TIMEOUT = 50000  # in milliseconds
+API_TIMEOUT = 50000  # upper bound in milliseconds; the caller adapts below it
 
 CORTEX_SEARCH_SERVICES = "DEFAULT_SCHEMA.NETWORK_DOCUMENTATION"
 SEMANTIC_MODELS = "@CORTEX_ANALYST.CORTEX_ANALYST/telco_semantic_model.yaml"
+QUERY_TAG = "telco_network_ops"  # finds this app's statements in the query history
+ECONOMY_CHART = "st.bar_chart(analysis_results, color='#29B5E8')"  # chart without a suggestion call
+
+if session.query_tag != QUERY_TAG:
+    session.query_tag = QUERY_TAG
+
+@st.cache_resource
+def get_query_scheduler():
+    """Priority admission of warehouse queries and agent calls, shared by every session"""
+    return QueryScheduler()
+
+@st.cache_resource
+def get_usage_meter():
+    """Tokens, credits and warehouse queries per user and session, written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return UsageMeter.from_config(
+        'usage_budgets.yaml', QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda sql: result_frame(session.sql(sql)), "background"))
 
-def run_snowflake_query(query):
-    """Run Snowflake SQL Query"""
+def usage_context():
+    """User name and Streamlit session ID that usage is attributed to"""
+    ctx = get_script_run_ctx()
+    return st.experimental_user.get('user_name'), ctx.session_id if ctx else None
+
+def run_snowflake_query(query, priority="interactive"):
+    """Run Snowflake SQL Query in the scheduler's ``priority`` class, metered to the current user"""
+    user, session_id = usage_context()
     try:
-        df = session.sql(query.replace(';',''))
+        started = time.perf_counter()
+        df = get_query_scheduler().run(
+            lambda: result_frame(session.sql(query.replace(';','')).collect_nowait(), session=session), priority)
+        get_usage_meter().record_query(user, session_id, df.attrs["footprint"]["query_id"],
+                                       (time.perf_counter() - started) * 1000)
         return df
 
+    except DeadlineExceeded:
+        # Dropped while queued behind higher-priority work; the next rerun asks again
+        return None
     except Exception as e:
         st.error(f"Error executing SQL: {str(e)}")
-        return None, None
+        return None
 
-def snowflake_api_call(query: str, limit: int = 10):
-    """Make an Agent API Call"""
-    payload = {
-        "model": f"{model}",
+@st.cache_resource
+def get_agent_caller():
+    """One resilient agent caller per app process, shared by every session"""
+    return ResilientCaller(max_timeout_ms=API_TIMEOUT)
+
+@st.cache_resource
+def get_answer_cache():
+    """Last good agent answer per question, used while the agent is unavailable"""
+    return AnswerCache()
+
+@st.cache_resource
+def get_watermarks():
+    """Per-table data versions shared by every session, for invalidating cached results"""
+    return Watermarks(get_query_scheduler().wrap(
+        lambda: result_frame(session.sql(markers_sql())), "background"))
+
+@st.cache_resource
+def get_query_reuse():
+    """Agent SQL results by normalized fingerprint and table versions, shared by every session"""
+    return QueryReuse(get_query_scheduler().wrap(
+        lambda sql: async_result(session.sql(sql).collect_nowait(), session), "interactive"))
+
+def run_agent_query(sql):
+    """Run agent SQL, reusing the result of an equivalent query while its tables are unchanged"""
+    sql = sql.replace(';', '')
+    df = get_query_reuse().run(sql, get_watermarks().tag_sql(sql))
+    footprint = df.attrs.get("footprint", {})
+    if footprint.get("source") != "memory":
+        get_usage_meter().record_query(*usage_context(), footprint.get("query_id"))
+    return df
+
+@st.cache_resource
+def get_conversation_log():
+    """Answered turns queued for CONVERSATION_HISTORY and written in batches, shared by every session"""
+    scheduler = get_query_scheduler()
+    return ConversationLog(
+        QUERY_TAG,
+        scheduler.wrap(lambda sql, params: session.sql(sql, params=params).collect(), "background"),
+        scheduler.wrap(lambda user, app, cid: result_frame(session.sql(CONVERSATION_SQL, params=[user, app, cid])),
+                       "interactive"))
+
+def conversation_id():
+    """ID of this conversation, kept in the URL so that a reload restores it"""
+    if "conversation" not in st.query_params:
+        st.query_params["conversation"] = new_conversation_id()
+    return st.query_params["conversation"]
+
+def restore_messages(key="messages"):
+    """This session's chat messages; after a reload they are read back from the history table"""
+    if key not in st.session_state:
+        reloaded = "conversation" in st.query_params
+        cid = conversation_id()
+        messages = get_conversation_log().restore(cid, st.experimental_user.get('user_name')) if reloaded else []
+        if messages is None:
+            # A shared link to another user's conversation: start this user's own
+            st.query_params["conversation"] = new_conversation_id()
+            messages = []
+        st.session_state[key] = messages
+    return st.session_state[key]
+
+def log_turn(query, text, sql, started):
+    """Queue an answered turn for the history table; adds no latency to the answer"""
+    call = st.session_state.get('last_agent_call', {})
+    get_conversation_log().record(conversation_id(), query, text, sql=sql, model=call.get('model'),
+                                  route=call.get('route'), agent_ms=call.get('agent_ms'),
+                                  answer_ms=(time.perf_counter() - started) * 1000,
+                                  user=st.experimental_user.get('user_name'))
+
+@st.cache_data(ttl=3600)
+def get_semantic_model():
+    """Semantic model YAML from the Cortex Analyst stage"""
+    try:
+        with session.file.get_stream(SEMANTIC_MODELS) as f:
+            return yaml.safe_load(f) or {}
+    except Exception:
+        return {}
+
+def get_verified_queries():
+    """Verified queries from the semantic model, used while the agent is unavailable"""
+    return get_semantic_model().get('verified_queries', [])
+
+@st.cache_resource
+def build_model_router():
+    """Routes each request to a model by complexity, shared by every session"""
+    return ModelRouter.from_config('model_routes.yaml')
+
+def get_model_router():
+    """The shared router, given the semantic model's table vocabulary once the model can be read"""
+    router = build_model_router()
+    if not router.vocabulary:
+        # A failed stage read returns {}; try again rather than route without tables for good
+        router.set_semantic_model(get_semantic_model())
+    return router
+
+@st.cache_resource
+def get_prewarm():
+    """Reads the semantic model and resumes the warehouse once per process, alongside the first page load"""
+    scheduler = get_query_scheduler()
+    prewarm = Prewarm([
+        ("semantic model", get_semantic_model),
+        ("warehouse", lambda: scheduler.run(
+            lambda: session.sql(prewarm_sql(get_semantic_model())).collect(), "background")),
+    ])
+    # The step thread reads the semantic model through st.cache_data
+    add_script_run_ctx(prewarm.thread)
+    return prewarm.start()
+
+def fallback_response(query):
+    """Answer from the answer cache or the closest verified query"""
+    cached = get_answer_cache().get(query, get_watermarks().is_current)
+    if cached is not None:
+        st.info("ℹ️ Showing the last answer to this question while the agent is unavailable.")
+        return cached
+    verified = match_verified_query(query, get_verified_queries())
+    if verified:
+        st.info("ℹ️ Answering from the closest verified query while the agent is unavailable.")
+        return fallback_events(f"Closest verified question: **{verified['question']}**", verified['sql'])
+    return None
+
+def agent_payload(query, model):
+    """Agent request body with the analyst and search tools"""
+    return {
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -67,17 +247,25 @@ def snowflake_api_call(query: str, limit: int = 10):
             }
         }
     }
+
+def snowflake_api_call(query: str, limit: int = 10):
+    """Make an Agent API Call, within this hour's usage budget"""
+    user, session_id = usage_context()
+    route, agent_model = get_model_router().route(query)
+    agent_model = get_usage_meter().agent_model(user, agent_model)
+    if agent_model is None:
+        st.warning("⚠️ This hour's usage budget is spent; answering from cached and verified answers only.")
+        return fallback_response(query)
+    payload = agent_payload(query, agent_model)
     
+    started = time.perf_counter()
+    answered = False
     try:
-        resp = _snowflake.send_snow_api_request(
-            "POST",  # method
-            API_ENDPOINT,  # path
-            {},  # headers
-            {},  # params
-            payload,  # body
-            None,  # request_guid
-            API_TIMEOUT,  # timeout in milliseconds,
-        )
+        resp = get_query_scheduler().run(lambda: get_agent_caller().call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ))
         
         if resp["status"] != 200:
             st.error(f"❌ HTTP Error: {resp['status']} - {resp.get('reason', 'Unknown reason')}")
@@ -91,11 +279,24 @@ def snowflake_api_call(query: str, limit: int = 10):
             st.error(f"Raw response: {resp['content'][:200]}...")
             return None
             
+        get_answer_cache().put(query, response_content, get_watermarks().tag(answer_tables(resp["content"])))
+        text, sql, _ = process_sse_response(response_content)
+        get_usage_meter().record_agent(user, session_id, agent_model, query, response_content,
+                                       lambda: text + sql, (time.perf_counter() - started) * 1000)
+        # Route quality counts answers with SQL or text, not just a successful HTTP call
+        answered = bool(sql or text.strip())
         return response_content
             
+    except (CircuitOpenError, AgentCallError) as e:
+        st.warning(f"⚠️ Cortex Agent unavailable: {str(e)}")
+        return fallback_response(query)
     except Exception as e:
         st.error(f"Error making request: {str(e)}")
         return None
+    finally:
+        get_model_router().record(route, time.perf_counter() - started, answered)
+        st.session_state.last_agent_call = {"route": route, "model": agent_model,
+                                            "agent_ms": (time.perf_counter() - started) * 1000}
 
 def process_sse_response(response):
     """Process SSE response"""
@@ -137,15 +338,29 @@ def process_sse_response(response):
     return text, sql, citations
 
 @st.cache_data
-def execute_cortex_complete_sql(prompt):
+def execute_cortex_complete_sql(prompt, model_name):
     """
-    Execute Cortex Complete using the SQL API
+    Execute Cortex Complete using the SQL API; the options argument makes it report token usage
     """
-    cmd = "SELECT snowflake.cortex.complete(?, ?) AS response"
-    df_response = session.sql(cmd, params=[f"{model}", prompt]).collect()
-    response_txt = df_response[0].RESPONSE
+    user, session_id = usage_context()
+    cmd = ("SELECT snowflake.cortex.complete(?, ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', ?)), "
+           "OBJECT_CONSTRUCT()) AS response")
+    started = time.perf_counter()
+    df_response = get_query_scheduler().run(lambda: session.sql(cmd, params=[model_name, prompt]).collect())
+    response_txt, tokens_in, tokens_out, estimated = complete_response(df_response[0].RESPONSE, prompt)
+    get_usage_meter().record_tokens("complete", user, session_id, model_name, tokens_in, tokens_out, estimated,
+                                    (time.perf_counter() - started) * 1000)
     return response_txt
 
+def suggest_chart(prompt, model_name):
+    """Chart code from Cortex Complete, or in economy mode a plain bar chart without the call"""
+    meter = get_usage_meter()
+    if meter.level(usage_context()[0]) != "normal":
+        meter.degraded("economy")
+        st.caption("No chart suggestion while this hour's usage budget is nearly spent.")
+        return ECONOMY_CHART
+    return execute_cortex_complete_sql(prompt, model_name)
+
 @st.cache_data
 def extract_python_code(text):
     """
@@ -175,38 +390,265 @@ def get_network_status_summary():
         FROM network_performance 
         WHERE measurement_timestamp >= DATEADD(hour, -1, CURRENT_TIMESTAMP())
         """
-        result = run_snowflake_query(query)
-        if result:
-            return result.to_pandas().iloc[0]
+        result = run_snowflake_query(query, "sidebar")
+        if result is not None:
+            return result.iloc[0]
     except:
         pass
     return None
 
+@st.cache_resource
+def get_alert_feed():
+    """Active alerts shared by every session, reloaded only when the incident stream advances"""
+    scheduler = get_query_scheduler()
+    return AlertFeed(scheduler.wrap(lambda: result_frame(session.sql(ALERT_VERSION_SQL)), "sidebar"),
+                     scheduler.wrap(lambda: result_frame(session.sql(ACTIVE_ALERTS_SQL)), "sidebar"))
+
 def get_critical_incidents():
     """Get current critical incidents"""
     try:
-        query = """
-        SELECT incident_id, incident_type, affected_region, customers_affected
-        FROM network_incidents 
-        WHERE severity_level = 'CRITICAL' 
-        AND incident_end_time IS NULL
-        ORDER BY incident_start_time DESC
-        LIMIT 5
-        """
-        result = run_snowflake_query(query)
-        if result:
-            return result.to_pandas()
+        return get_alert_feed().critical(limit=5)
+    except:
+        pass
+    return None
+
+@st.cache_resource
+def get_anomaly_monitor():
+    """Per-tower KPI anomaly state shared by every session, fed with measurements past its watermark"""
+    return AnomalyMonitor(get_query_scheduler().wrap(
+        lambda since, tower: result_frame(session.sql(measurements_sql(), params=[since, since, tower])), "sidebar"))
+
+def get_anomalies():
+    """Worst current per-tower KPI anomalies"""
+    try:
+        monitor = get_anomaly_monitor()
+        monitor.refresh()
+        return monitor.ranked(limit=5)
     except:
         pass
     return None
 
+@st.cache_data(ttl=3600, max_entries=256)
+def get_kpi_series(sql, params, versions=()):
+    """KPI series from a rollup pyramid query; ``versions`` keys it to the rollup level's data"""
+    return get_query_scheduler().run(lambda: result_frame(session.sql(sql, params=params)), "sidebar")
+
+@st.fragment
+def kpi_trends():
+    """Zoomable KPI trends over the rollup pyramid; changing a control reruns only this view"""
+    with st.expander("📈 Network KPI Trends"):
+        col1, col2, col3, col4 = st.columns(4)
+        source = col1.selectbox("Source", list(ROLLUP_SOURCES), key="kpi_source")
+        metric = col2.selectbox("Metric", ROLLUP_SOURCES[source]["metrics"], key="kpi_metric")
+        statistic = col3.selectbox("Statistic", ["AVG", "P50", "P95", "MIN", "MAX"], key="kpi_statistic")
+        split = col4.selectbox("Split by", ["None"] + ROLLUP_SOURCES[source]["dimensions"], key="kpi_split")
+        today = date.today()
+        selected = st.date_input("Range", value=(today - timedelta(days=90), today), key="kpi_range")
+        if len(selected) != 2:
+            return
+        start = datetime.combine(selected[0], datetime.min.time())
+        end = datetime.combine(selected[1], datetime.min.time()) + timedelta(days=1)
+        group_by = None if split == "None" else (split,)
+        try:
+            sql, params, level = pyramid_query(source, metric, start, end, max_points=500, group_by=group_by)
+            series = get_kpi_series(sql, params, get_watermarks().tag_sql(sql))
+        except Exception as e:
+            st.info(f"KPI rollups are not available: {str(e)}")
+            return
+        if series.empty:
+            st.info("No measurements in this range")
+            return
+        value = f"{statistic}_VALUE"
+        if group_by:
+            chart_data = series.pivot(index="BUCKET_START", columns=split, values=value)
+        else:
+            chart_data = series.set_index("BUCKET_START")[[value]]
+        st.line_chart(chart_data)
+        st.caption(f"{len(series):,} buckets from the {level} rollup")
+
+@st.cache_resource
+def get_kpi_cube():
+    """Hourly KPI cube shared by every session, refreshed in the background"""
+    return CubeCache(get_query_scheduler().wrap(
+        lambda: result_frame(session.sql(cube_sql(hours=168))), "background"), refresh_s=300)
+
+@st.fragment
+def kpi_slicer():
+    """Instant KPI slices from the in-memory cube; changing a control reruns only this view"""
+    with st.expander("🧊 KPI Slicer"):
+        try:
+            cube = get_kpi_cube().get()
+        except Exception as e:
+            st.info(f"KPI cube is not available: {str(e)}")
+            return
+        if not len(cube.hours):
+            st.info("No network measurements in the last week")
+            return
+        col1, col2, col3, col4 = st.columns(4)
+        metric = col1.selectbox("Metric", CUBE_METRICS, key="cube_metric")
+        group_by = col2.multiselect("Group by", ["region", "network_type", "tower", "hour"], default=["region"], key="cube_group_by")
+        regions = col3.multiselect("Regions", list(cube.regions), key="cube_regions")
+        network_types = col4.multiselect("Network types", list(cube.network_types), key="cube_network_types")
+        hours = len(cube.hours)
+        if hours > 1:
+            hours = st.slider("Last hours", 1, hours, min(24, hours), key="cube_hours")
+
+        started = time.perf_counter()
+        result = cube.query(metric, group_by, regions, network_types, start=cube.hours[-hours])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        keys = [c for c in result.columns if c in ("REGION", "NETWORK_TYPE", "CELL_TOWER_ID")]
+        if "hour" in group_by and len(keys) <= 1:
+            if keys:
+                st.line_chart(result.pivot(index="HOUR_BUCKET", columns=keys[0], values="AVG_VALUE"))
+            else:
+                st.line_chart(result.set_index("HOUR_BUCKET")[["AVG_VALUE"]])
+        st.dataframe(result, hide_index=True, use_container_width=True)
+        stats = get_kpi_cube().stats()
+        st.caption(f"{len(result):,} rows in {elapsed_ms:.1f} ms from a cube of {stats['towers']:,} towers × "
+                   f"{stats['hours']} hours ({stats['mb']:.1f} MB, built {stats['age_s']:.0f}s ago)")
+
+# The TTL slides the look-back window; new data is picked up through the versions
+@st.cache_data(ttl=300)
+def get_incident_impact(hours, versions=()):
+    """Per-incident KPI deltas and degraded KPI windows with the incidents that overlap them"""
+    load = get_query_scheduler().wrap(lambda sql: result_frame(session.sql(sql)), "sidebar")
+    incidents = load(incidents_sql(hours + 24))
+    series = load(series_sql(hours + 24))
+    index = IncidentIndex(incidents)
+    windows = degraded_windows(series)
+    windows = windows[windows["WINDOW_END"] >= datetime.now() - timedelta(hours=hours)]
+    windows = attach_incidents(windows, index, lead=timedelta(hours=1))
+    return kpi_deltas(index, series), windows
+
+@st.fragment
+def incident_impact():
+    """Incident-to-KPI correlation; changing a control reruns only this view"""
+    with st.expander("🔗 Incident Correlation"):
+        col1, col2 = st.columns(2)
+        metric = col1.selectbox("Metric", list(IMPACT_METRICS), key="impact_metric")
+        days = col2.selectbox("Look back (days)", [1, 7, 30], index=1, key="impact_days")
+        try:
+            deltas, windows = get_incident_impact(days * 24, get_watermarks().tag(["NETWORK_INCIDENTS", "NETWORK_PERFORMANCE_ROLLUP_15M"]))
+        except Exception as e:
+            st.info(f"Incident correlation is not available: {str(e)}")
+            return
+
+        st.markdown("**Degraded KPI windows**")
+        if windows.empty:
+            st.success("No degraded KPI windows")
+        else:
+            shown = windows.assign(INCIDENTS=windows["INCIDENTS"].map(lambda ids: ", ".join(ids) or "unexplained"))
+            st.dataframe(shown.sort_values("SCORE", ascending=False), hide_index=True, use_container_width=True)
+
+        st.markdown(f"**{metric} before and during each incident**")
+        if deltas.empty:
+            st.info("No incidents in this range")
+        else:
+            columns = ["INCIDENT_ID", "INCIDENT_TYPE", "SEVERITY_LEVEL", "AFFECTED_REGION", "INCIDENT_START_TIME",
+                       "IS_OPEN", f"{metric}_BEFORE", f"{metric}_DURING", f"{metric}_DELTA"]
+            impact = deltas[columns].sort_values(f"{metric}_DELTA", key=lambda d: -d.abs(), na_position="last")
+            st.dataframe(impact, hide_index=True, use_container_width=True)
+
+@st.cache_data(ttl=3600)
+def get_workload(days):
+    """Query shapes of the three apps ranked by credits, with the DDL that would serve them"""
+    history = get_query_scheduler().run(
+        lambda: result_frame(session.sql(history_sql(days))), "background")
+    shapes = workload(history)
+    return shapes, recommend(shapes, warehouse=session.get_current_warehouse() or "COMPUTE_WH")
+
+@st.fragment
+def workload_advisor():
+    """Costliest query shapes and materialization advice; changing a control reruns only this view"""
+    with st.expander("🧭 Workload Advisor"):
+        days = st.selectbox("Look back (days)", [1, 7], index=1, key="advisor_days")
+        try:
+            shapes, advice = get_workload(days)
+        except Exception as e:
+            st.info(f"Query history is not available: {str(e)}")
+            return
+        if shapes.empty:
+            st.info("No app queries in the history yet")
+            return
+
+        st.markdown("**Costliest query shapes**")
+        shown = shapes.assign(SHAPE=shapes["SHAPE"].map(describe)).drop(columns=["EXAMPLE"])
+        st.dataframe(shown.head(20), hide_index=True, use_container_width=True)
+        st.caption(f"{int(shapes['RUNS'].sum()):,} statements in {len(shapes):,} shapes, "
+                   f"{shapes['CREDITS'].sum():.3f} credits")
+
+        st.markdown("**Recommendations**")
+        if advice.empty:
+            st.success("No rollup, clustering key or search optimization would pay off for this workload")
+        for row in advice.itertuples(index=False):
+            st.markdown(f"**{row.KIND}** on `{row.TABLE}` for {row.SHAPE}: saves about {row.EST_SAVING_S:,.0f}s "
+                        f"({row.EST_SAVING_CREDITS:.3f} credits) of {row.TOTAL_S:,.0f}s over {row.RUNS:,} runs")
+            st.code(row.DDL, language="sql")
+
+@st.cache_data(ttl=300)
+def get_usage_report(hours):
+    """Tokens, queries and credits of the three apps per user and hour"""
+    return get_query_scheduler().run(
+        lambda: result_frame(session.sql(USAGE_REPORT_SQL, params=[hours])), "background")
+
+@st.fragment
+def usage_report():
+    """Admin view of metered usage per app, user and hour; changing a control reruns only this view"""
+    with st.expander("💳 Usage by user"):
+        hours = st.selectbox("Look back (hours)", [1, 24, 168], index=1, key="usage_hours")
+        try:
+            report = get_usage_report(hours)
+        except Exception as e:
+            st.info(f"Usage metering is not available: {str(e)}")
+            return
+        if report.empty:
+            st.info("No metered usage yet")
+            return
+        by_user = (report.groupby(["APP", "USER_NAME"], observed=True, dropna=False)
+                   [["CALLS", "TOKENS_IN", "TOKENS_OUT", "QUERIES", "GB_SCANNED", "CREDITS"]].sum()
+                   .sort_values("CREDITS", ascending=False).reset_index())
+        st.markdown("**By user**")
+        st.dataframe(by_user, hide_index=True, use_container_width=True)
+        st.markdown("**By hour**")
+        st.dataframe(report, hide_index=True, use_container_width=True)
+        st.caption(f"{report['CREDITS'].sum():.3f} credits over the last {hours} hours")
+
+def run_export_sql(sql, params=None):
+    """Run a result export statement and return its rows"""
+    return get_query_scheduler().run(lambda: session.sql(sql, params=params).collect())
+
+def bulk_asker():
+    """Thread-safe answer and query callables for bulk runs, bound to the shared resources"""
+    scheduler, caller, reuse, watermarks = get_query_scheduler(), get_agent_caller(), get_query_reuse(), get_watermarks()
+
+    def send(question, model):
+        payload = agent_payload(question, model)
+        resp = scheduler.run(lambda: caller.call(
+            lambda timeout: _snowflake.send_snow_api_request(
+                "POST", API_ENDPOINT, {}, {}, payload, None, timeout
+            )
+        ), "bulk")
+        if resp["status"] != 200:
+            raise RuntimeError(f"HTTP {resp['status']} - {resp.get('reason', 'Unknown reason')}")
+        return json.loads(resp["content"])
+
+    def parse(events):
+        text, sql, _ = process_sse_response(events)
+        return text.replace("【†", "[").replace("†】", "]"), sql
+
+    return agent_asker(send, parse, lambda sql: scheduler.run(lambda: reuse.run(sql, watermarks.tag_sql(sql)), "bulk"),
+                       get_model_router(), get_usage_meter(), *usage_context())
+
 def main():
+    get_prewarm()
     st.markdown('<h0black>SNOWFLAKE | </h0black><h0blue>TELCO NETWORK OPERATIONS</h0blue><BR>', unsafe_allow_html=True)
 
     # Sidebar for new chat and network status
     with st.sidebar:
         if st.button("NEW CONVERSATION", key="new_chat", type="secondary"):
             st.session_state.messages = []
+            st.query_params["conversation"] = new_conversation_id()
             st.rerun()
         
         st.markdown("---")
@@ -230,6 +672,15 @@ def main():
                 st.error(f"**{incident['INCIDENT_TYPE']}**\n{incident['AFFECTED_REGION']} - {incident['CUSTOMERS_AFFECTED']:,} customers affected")
         else:
             st.success("No critical incidents")
+
+        # Per-tower KPI anomalies
+        st.markdown("### 📡 **Performance Anomalies**")
+        anomalies = get_anomalies()
+        if anomalies is not None and not anomalies.empty:
+            for _, anomaly in anomalies.iterrows():
+                st.warning(f"**{anomaly['CELL_TOWER_ID']}** {anomaly['METRIC']}\n{anomaly['VALUE']:,.2f} vs {anomaly['EXPECTED']:,.2f} expected ({anomaly['SCORE']:.1f}σ)")
+        else:
+            st.success("No performance anomalies")
         
         st.markdown("---")
         st.markdown("### 🔧 **Quick Actions**")
@@ -248,28 +699,52 @@ def main():
                 st.session_state.quick_query = query
                 st.rerun()
 
+        with st.expander("⚙️ Model routing"):
+            # Building the router reads the semantic model, which the first page load does not wait for
+            if get_prewarm().done("semantic model"):
+                st.dataframe([dict(route=r, **s) for r, s in get_model_router().stats().items()], hide_index=True)
+            else:
+                st.caption("Loading the semantic model…")
+
+        with st.expander("⏱️ Query scheduling"):
+            st.dataframe([dict(priority=p, **s) for p, s in get_query_scheduler().stats().items()], hide_index=True)
+
+        with st.expander("🚀 Startup"):
+            st.dataframe(get_prewarm().stats(), hide_index=True)
+
+        with st.expander("💳 Usage"):
+            st.caption(describe_usage(get_usage_meter().usage(usage_context()[0])))
+            st.dataframe([get_usage_meter().stats()], hide_index=True)
+
+    kpi_trends()
+    kpi_slicer()
+    incident_impact()
+    workload_advisor()
+    usage_report()
+    render_bulk_questions(bulk_asker)
+
     # Handle quick query
     if hasattr(st.session_state, 'quick_query'):
         query = st.session_state.quick_query
         delattr(st.session_state, 'quick_query')
         
         # Add to messages and process
-        if 'messages' not in st.session_state:
-            st.session_state.messages = []
+        restore_messages()
         
         st.session_state.messages.append({"role": "user", "content": query})
         
         with st.spinner("Processing your request..."):
+            started = time.perf_counter()
             response = snowflake_api_call(query, 1)
             text, sql, citations = process_sse_response(response)
             
             if text:
                 text = text.replace("【†", "[").replace("†】", "]")
                 st.session_state.messages.append({"role": "assistant", "content": text})
+                log_turn(query, text, sql, started)
 
     # Initialize session state
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    restore_messages()
 
     # Display chat messages
     for message in st.session_state.messages:
@@ -285,6 +760,7 @@ def main():
         
         # Get response from API
         with st.spinner("Analyzing network data..."):
+            started = time.perf_counter()
             response = snowflake_api_call(query, 1)
             text, sql, citations = process_sse_response(response)
             
@@ -293,6 +769,7 @@ def main():
                 text = text.replace("【†", "[")
                 text = text.replace("†】", "]")
                 st.session_state.messages.append({"role": "assistant", "content": text})
+                log_turn(query, text, sql, started)
                 
                 with st.chat_message("assistant", avatar="🔧"):
                     st.markdown(text.replace("•", "\n\n"))
@@ -304,9 +781,8 @@ def main():
                             doc_id = citation.get("doc_id", "")
                             if doc_id:
                                 query_ref = f"SELECT CONTENT FROM DEFAULT_SCHEMA.NETWORK_DOCUMENTATION WHERE DOCUMENT_ID = '{doc_id}'"
-                                result = run_snowflake_query(query_ref)
-                                if result:
-                                    result_df = result.to_pandas()
+                                result_df = run_snowflake_query(query_ref)
+                                if result_df is not None:
                                     if not result_df.empty:
                                         doc_content = result_df.iloc[0, 0]
                                     else:
@@ -325,17 +801,20 @@ def main():
 
                 with st.expander("📈 Data Visualization", expanded=True):
                     try:
-                        analysis_results = run_snowflake_query(sql).to_pandas()
+                        analysis_results = run_agent_query(sql)
 
                         if len(analysis_results.index) > 1:
                             data_tab, suggested_plot, line_tab, bar_tab, scatter_tab = st.tabs(
                              ["📋 Data", "🎯 Suggested Plot", "📈 Line Chart", "📊 Bar Chart","🔷 Scatter Chart"]
                          )
-                            data_tab.dataframe(analysis_results, use_container_width=True)
+                            with data_tab:
+                                render_result_grid(analysis_results, run_export_sql)
+                            data_tab.caption(describe_footprint(analysis_results))
                             
                             if len(analysis_results.columns) > 1:
                                 analysis_results = analysis_results.set_index(analysis_results.columns[0])
                             
+                            execution_code = None
                             with suggested_plot:
                                 try:
                                     prompt = f'''
@@ -350,42 +829,36 @@ def main():
                                                 Choose only 1 value for X and 1 value for Y. for each chart, add color='#29B5E8'
                                                 For telco data, use appropriate chart types (line charts for time series, bar charts for comparisons).
                                                 '''
-                                    code = execute_cortex_complete_sql(prompt)
+                                    chart_route, chart_model = get_model_router().route(prompt, chart=True)
+                                    started = time.perf_counter()
+                                    code = suggest_chart(prompt, chart_model)
                                     execution_code = extract_python_code(code)
+                                    get_model_router().record(chart_route, time.perf_counter() - started, execution_code is not None)
                                     
                                     if execution_code:
                                         st.code(execution_code, language="python", line_numbers=False)
-                                        exec(execution_code)
+                                        render_chart(analysis_results, execution_code, key="zoom_suggested")
                                 except Exception as e:
                                     st.error(f"Could not generate chart: {str(e)}")
                             
                             with line_tab:
-                                try:
-                                    if execution_code:
-                                        exec(replace_chart_function(execution_code, 'line_chart'))
-                                except:
-                                    st.line_chart(analysis_results, color='#29B5E8')
+                                render_chart(analysis_results, execution_code and replace_chart_function(execution_code, 'line_chart'),
+                                             key="zoom_line", fallback_code="st.line_chart(analysis_results, color='#29B5E8')")
                             
                             with bar_tab:
-                                try: 
-                                    if execution_code:
-                                        exec(replace_chart_function(execution_code, 'bar_chart'))
-                                except:
-                                    st.bar_chart(analysis_results, color='#29B5E8')
+                                render_chart(analysis_results, execution_code and replace_chart_function(execution_code, 'bar_chart'),
+                                             key="zoom_bar", fallback_code="st.bar_chart(analysis_results, color='#29B5E8')")
                                     
                             with scatter_tab:
-                                try: 
-                                    if execution_code:
-                                        exec(replace_chart_function(execution_code, 'scatter_chart'))
-                                except:
-                                    pass
+                                render_chart(analysis_results, execution_code and replace_chart_function(execution_code, 'scatter_chart'),
+                                             key="zoom_scatter")
                         else:
                             st.dataframe(analysis_results, use_container_width=True)
                     except Exception as e:
                         st.error(f"Error processing data: {str(e)}")
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main, f"{QUERY_TAG} rerun")
 
 # Sample Questions to try:
     
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The apps import the shared modules as top-level modules, and so do the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "shared"))
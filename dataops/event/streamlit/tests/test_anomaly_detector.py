@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_detector import AnomalyMonitor, TowerAnomalyDetector
+
+NORMAL = {"LATENCY_MS": 12.0, "PACKET_LOSS_PERCENT": 0.1, "THROUGHPUT_MBPS": 800.0, "UPTIME_PERCENT": 99.9}
+
+
+def _batch(towers, minutes, start="2026-03-01", overrides=None):
+    """One row per tower per minute at jittered normal values; ``overrides`` maps (tower, minute) to values"""
+    rng = np.random.default_rng(len(towers) * 1000 + minutes)
+    times = pd.date_range(start, periods=minutes, freq="min")
+    rows = []
+    for m, ts in enumerate(times):
+        for tower in towers:
+            row = {"CELL_TOWER_ID": tower, "REGION": "Northeast", "MEASUREMENT_TIMESTAMP": ts}
+            row.update({k: v * (1 + rng.normal(scale=0.01)) for k, v in NORMAL.items()})
+            row.update((overrides or {}).get((tower, m), {}))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_no_anomalies_during_warmup():
+    detector = TowerAnomalyDetector(warmup=20)
+    batch = _batch(["T1"], 10, overrides={("T1", 9): {"LATENCY_MS": 500.0}})
+    assert detector.update(batch).empty
+
+
+def test_a_spike_is_flagged_for_its_tower_and_metric_only():
+    detector = TowerAnomalyDetector(warmup=20)
+    detector.update(_batch(["T1", "T2"], 30))
+    found = detector.update(_batch(["T1", "T2"], 1, start="2026-03-01 01:00", overrides={("T2", 0): {"LATENCY_MS": 80.0}}))
+    assert list(found["CELL_TOWER_ID"]) == ["T2"]
+    assert list(found["METRIC"]) == ["LATENCY_MS"]
+    assert found["VALUE"].iloc[0] == 80.0
+    assert found["EXPECTED"].iloc[0] == pytest.approx(12.0, rel=0.05)
+    assert found["REGION"].iloc[0] == "Northeast"
+
+
+@pytest.mark.parametrize("metric, value, flagged", [
+    ("LATENCY_MS", 2.0, False),          # lower latency is good
+    ("THROUGHPUT_MBPS", 200.0, True),    # lower throughput is bad
+    ("THROUGHPUT_MBPS", 2000.0, False),
+    ("UPTIME_PERCENT", 90.0, True),
+])
+def test_only_the_bad_direction_is_flagged(metric, value, flagged):
+    detector = TowerAnomalyDetector(warmup=20)
+    detector.update(_batch(["T1"], 30))
+    found = detector.update(_batch(["T1"], 1, start="2026-03-01 01:00", overrides={("T1", 0): {metric: value}}))
+    assert (metric in set(found.get("METRIC", []))) is flagged
+
+
+def test_one_batch_equals_the_same_rows_one_at_a_time():
+    batch = _batch(["T1", "T2", "T3"], 40, overrides={("T3", 35): {"PACKET_LOSS_PERCENT": 5.0}})
+    whole = TowerAnomalyDetector(warmup=20)
+    found = whole.update(batch)
+    single = TowerAnomalyDetector(warmup=20)
+    stepwise = pd.concat([single.update(batch.iloc[[i]]) for i in range(len(batch))], ignore_index=True)
+    assert np.allclose(whole.mean, single.mean) and np.allclose(whole.var, single.var)
+    pd.testing.assert_frame_equal(found.reset_index(drop=True), stepwise.reset_index(drop=True))
+
+
+def test_missing_values_do_not_move_the_state():
+    detector = TowerAnomalyDetector(warmup=1)
+    detector.update(_batch(["T1"], 5))
+    mean, count = detector.mean.copy(), detector.count.copy()
+    detector.update(_batch(["T1"], 1, start="2026-03-01 01:00", overrides={("T1", 0): {"LATENCY_MS": np.nan}}))
+    assert detector.mean[0, 0] == mean[0, 0] and detector.count[0, 0] == count[0, 0]
+
+
+def test_monitor_reads_every_row_once_across_a_limit_that_splits_a_timestamp():
+    rows = _batch([f"T{i}" for i in range(7)], 10).sort_values(["MEASUREMENT_TIMESTAMP", "CELL_TOWER_ID"])
+    fed = []
+
+    class Recorder:
+        def update(self, batch):
+            fed.append(batch)
+            return pd.DataFrame()
+
+    def loader(since, tower):
+        ts = rows["MEASUREMENT_TIMESTAMP"]
+        after = (ts > since) | ((ts == since) & (rows["CELL_TOWER_ID"] > tower))
+        return rows[after].head(5)
+
+    monitor = AnomalyMonitor(loader, Recorder(), lookback_hours=24 * 365)
+    for _ in range(20):
+        monitor.refresh(force=True)
+    read = pd.concat(fed)
+    assert len(read) == len(rows)
+    assert not read.duplicated(["CELL_TOWER_ID", "MEASUREMENT_TIMESTAMP"]).any()
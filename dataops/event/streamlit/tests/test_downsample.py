@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample_frame, downsample_indices, is_time_series, lttb_indices, minmax_indices
+
+
+def test_lttb_keeps_the_end_points_and_the_count():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    out = lttb_indices(x, y, 100)
+    assert len(out) == 100
+    assert out[0] == 0 and out[-1] == 999
+    assert np.all(np.diff(out) > 0)
+
+
+def test_lttb_keeps_a_single_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[437] = 10.0
+    assert 437 in lttb_indices(x, y, 50)
+
+
+@pytest.mark.parametrize("n_out", [0, 2, 1000, 5000])
+def test_lttb_returns_everything_it_cannot_reduce(n_out):
+    x = np.arange(1000, dtype=float)
+    assert len(lttb_indices(x, x, n_out)) == 1000
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    y = np.random.default_rng(0).normal(size=10000)
+    out = minmax_indices(y, 100)
+    assert y.argmax() in out and y.argmin() in out
+    assert len(out) <= 200
+
+
+def test_downsample_indices_skips_missing_values():
+    y = np.arange(100, dtype=float)
+    y[::2] = np.nan
+    out = downsample_indices(np.arange(100), y, 1000)
+    assert not np.isnan(y[out]).any()
+    assert len(out) == 50
+
+
+def _series(n, groups=1, columns=1, seed=0):
+    rng = np.random.default_rng(seed)
+    per = n // groups
+    frame = pd.DataFrame({f"V{i}": rng.normal(size=per * groups) for i in range(columns)},
+                         index=np.tile(pd.date_range("2026-01-01", periods=per, freq="min"), groups))
+    if groups > 1:
+        frame["TOWER"] = np.repeat([f"T{g:04d}" for g in range(groups)], per)
+    return frame
+
+
+def test_small_or_non_time_frames_are_returned_as_is():
+    small = _series(100)
+    assert downsample_frame(small, max_points=500) is small
+    plain = pd.DataFrame({"V": np.arange(5000.0)})
+    assert not is_time_series(plain)
+    assert downsample_frame(plain, max_points=500) is plain
+
+
+@pytest.mark.parametrize("groups, columns", [(1, 1), (1, 3), (10, 1), (2000, 1), (2000, 3)])
+def test_downsample_frame_stays_within_the_point_budget(groups, columns):
+    frame = _series(200000, groups, columns)
+    out = downsample_frame(frame, max_points=5000)
+    assert len(out) <= 5000
+    assert out.index.is_monotonic_increasing
+
+
+def test_downsample_frame_keeps_every_series_when_they_fit():
+    out = downsample_frame(_series(200000, groups=10), max_points=5000)
+    assert out["TOWER"].nunique() == 10
+
+
+def test_downsample_frame_keeps_the_largest_series_when_they_do_not_fit():
+    frame = _series(200000, groups=2000)
+    # One series runs a month longer than the others
+    longer = frame[frame["TOWER"] == "T0007"]
+    longer.index = longer.index + pd.Timedelta(days=30)
+    frame = pd.concat([frame, longer])
+    out = downsample_frame(frame, max_points=300)
+    assert len(out) <= 300
+    assert "T0007" in set(out["TOWER"])
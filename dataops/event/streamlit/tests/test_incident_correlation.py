@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from incident_correlation import METRICS, IncidentIndex, attach_incidents, kpi_deltas
+
+NOW = pd.Timestamp("2026-03-02 00:00")
+
+
+def _incidents(*rows):
+    """(id, region, start, end) tuples; ``end=None`` is an open incident"""
+    return pd.DataFrame([{
+        "INCIDENT_ID": incident_id, "INCIDENT_TYPE": "FIBER_CUT", "SEVERITY_LEVEL": "HIGH",
+        "AFFECTED_REGION": region, "INCIDENT_START_TIME": pd.Timestamp(start),
+        "INCIDENT_END_TIME": pd.Timestamp(end) if end else pd.NaT,
+    } for incident_id, region, start, end in rows])
+
+
+def _matches(index, region, start, end):
+    windows, incidents = index.overlapping([region], [pd.Timestamp(start)], [pd.Timestamp(end)])
+    return sorted(index.frame["INCIDENT_ID"].to_numpy()[incidents])
+
+
+INDEX = IncidentIndex(_incidents(
+    ("A", "Northeast", "2026-03-01 10:00", "2026-03-01 11:00"),
+    ("B", "Northeast", "2026-03-01 12:00", "2026-03-01 12:30"),
+    ("C", "Midwest", "2026-03-01 10:00", "2026-03-01 11:00"),
+    ("D", "Northeast", "2026-03-01 20:00", None),
+), now=NOW)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2026-03-01 09:00", "2026-03-01 10:00", []),          # window ends as A starts
+    ("2026-03-01 11:00", "2026-03-01 12:00", []),          # window starts as A ends, ends as B starts
+    ("2026-03-01 09:59", "2026-03-01 10:01", ["A"]),
+    ("2026-03-01 10:59", "2026-03-01 12:01", ["A", "B"]),
+    ("2026-03-01 10:15", "2026-03-01 10:30", ["A"]),       # window inside the incident
+    ("2026-03-01 08:00", "2026-03-01 13:00", ["A", "B"]),  # incidents inside the window
+    ("2026-03-01 23:00", "2026-03-01 23:15", ["D"]),       # open incidents run until now
+    ("2026-03-02 00:00", "2026-03-02 00:15", []),
+])
+def test_overlapping_treats_incidents_as_half_open_intervals(start, end, expected):
+    assert _matches(INDEX, "Northeast", start, end) == expected
+
+
+def test_overlapping_only_matches_the_window_region():
+    assert _matches(INDEX, "Midwest", "2026-03-01 10:30", "2026-03-01 12:15") == ["C"]
+    assert _matches(INDEX, "Southwest", "2026-03-01 10:30", "2026-03-01 12:15") == []
+
+
+def test_overlapping_returns_positions_of_the_windows_it_was_given():
+    regions = ["Southwest", "Northeast", "Midwest", "Northeast"]
+    starts = pd.to_datetime(["2026-03-01 10:30", "2026-03-01 13:00", "2026-03-01 10:30", "2026-03-01 12:10"])
+    ends = starts + pd.Timedelta(minutes=15)
+    windows, incidents = INDEX.overlapping(regions, starts, ends)
+    pairs = sorted(zip(windows, INDEX.frame["INCIDENT_ID"].to_numpy()[incidents]))
+    assert pairs == [(2, "C"), (3, "B")]
+
+
+def test_a_long_incident_is_found_from_a_window_long_after_it_started():
+    index = IncidentIndex(_incidents(
+        ("LONG", "West", "2026-02-20 00:00", "2026-03-01 12:00"),
+        ("SHORT", "West", "2026-03-01 09:00", "2026-03-01 09:05"),
+    ), now=NOW)
+    assert _matches(index, "West", "2026-03-01 11:00", "2026-03-01 11:15") == ["LONG"]
+
+
+def test_attach_incidents_lead_reaches_back_before_the_window():
+    windows = pd.DataFrame({"REGION": ["Northeast"], "WINDOW_START": [pd.Timestamp("2026-03-01 11:15")],
+                            "WINDOW_END": [pd.Timestamp("2026-03-01 11:45")]})
+    assert attach_incidents(windows, INDEX)["INCIDENTS"][0] == []
+    assert attach_incidents(windows, INDEX, lead=timedelta(minutes=30))["INCIDENTS"][0] == ["A"]
+
+
+def _series(region, start, hours, latency):
+    """15-minute buckets of two samples each; ``latency(bucket_start)`` gives the sample value"""
+    buckets = pd.date_range(start, periods=hours * 4, freq="15min")
+    frame = pd.DataFrame({"REGION": region, "BUCKET_START": buckets})
+    for metric in METRICS:
+        frame[f"{metric}_N"] = 2
+        frame[f"{metric}_SUM"] = 2 * 50.0
+    frame["LATENCY_MS_SUM"] = [2 * latency(b) for b in buckets]
+    return frame
+
+
+def test_kpi_deltas_compare_the_baseline_with_the_incident():
+    spike = lambda b: 90.0 if pd.Timestamp("2026-03-01 10:00") <= b < pd.Timestamp("2026-03-01 11:00") else 10.0
+    series = pd.concat([_series("Northeast", "2026-02-28 00:00", 48, spike),
+                        _series("Midwest", "2026-02-28 00:00", 48, lambda b: 30.0)])
+    deltas = kpi_deltas(INDEX, series, baseline_hours=2, now=NOW).set_index("INCIDENT_ID")
+    assert deltas.loc["A", "LATENCY_MS_BEFORE"] == 10.0
+    assert deltas.loc["A", "LATENCY_MS_DURING"] == 90.0
+    assert deltas.loc["A", "LATENCY_MS_DELTA"] == 80.0
+    assert deltas.loc["A", "THROUGHPUT_MBPS_DELTA"] == 0.0
+    # B's two-hour baseline starts at 10:00 and takes in the whole spike
+    assert deltas.loc["B", "LATENCY_MS_BEFORE"] == pytest.approx((4 * 90.0 + 4 * 10.0) / 8)
+    assert deltas.loc["C", "LATENCY_MS_DELTA"] == 0.0
+    assert deltas.loc["D", "IS_OPEN"] and not deltas.loc["A", "IS_OPEN"]
+    assert deltas.loc["D", "LATENCY_MS_DURING"] == 10.0
+
+
+def test_kpi_deltas_are_nan_without_samples():
+    series = _series("Northeast", "2026-03-01 10:00", 1, lambda b: 10.0)
+    deltas = kpi_deltas(INDEX, series, baseline_hours=2, now=NOW).set_index("INCIDENT_ID")
+    assert np.isnan(deltas.loc["A", "LATENCY_MS_BEFORE"])
+    assert deltas.loc["A", "LATENCY_MS_DURING"] == 10.0
+    assert np.isnan(deltas.loc["C", "LATENCY_MS_DURING"])
+    assert kpi_deltas(INDEX, series.iloc[:0]).empty
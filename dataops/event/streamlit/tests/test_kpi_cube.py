@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpi_cube import CELL_BYTES, METRICS, KpiCube
+
+HOURS = pd.date_range("2026-03-01", periods=6, freq="h")
+TOWERS = {"T1": ("Northeast", "5G"), "T2": ("Northeast", "4G_LTE"), "T3": ("Midwest", "5G")}
+
+
+def _frame():
+    """Cube rows where LATENCY_MS in each (tower, hour) is a known pair of samples"""
+    rows = []
+    for t, (tower, (region, network_type)) in enumerate(TOWERS.items()):
+        for h, hour in enumerate(HOURS):
+            row = {"REGION": region, "NETWORK_TYPE": network_type, "CELL_TOWER_ID": tower, "HOUR_BUCKET": hour}
+            # Two samples: 10 * (t + 1) + h and that plus 2
+            low = 10.0 * (t + 1) + h
+            for metric in METRICS:
+                row.update({f"{metric}_N": 2, f"{metric}_SUM": 2 * low + 2, f"{metric}_SUMSQ": low ** 2 + (low + 2) ** 2,
+                            f"{metric}_MIN": low, f"{metric}_MAX": low + 2})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def cube():
+    return KpiCube(_frame())
+
+
+def test_one_tower_one_hour(cube):
+    out = cube.query("LATENCY_MS", group_by=("tower", "hour"), towers=["T2"],
+                     start=HOURS[3], end=HOURS[4])
+    assert len(out) == 1
+    row = out.iloc[0]
+    assert row["CELL_TOWER_ID"] == "T2" and row["HOUR_BUCKET"] == HOURS[3]
+    assert row["SAMPLES"] == 2
+    assert row["AVG_VALUE"] == pytest.approx(24.0)
+    assert (row["MIN_VALUE"], row["MAX_VALUE"]) == (23.0, 25.0)
+    assert row["STDDEV_VALUE"] == pytest.approx(1.0)
+
+
+def test_one_tower_all_hours(cube):
+    out = cube.query("LATENCY_MS", group_by=("tower",), towers=["T1"])
+    row = out.iloc[0]
+    assert row["SAMPLES"] == 12
+    assert row["AVG_VALUE"] == pytest.approx(np.mean([10 + h + d for h in range(6) for d in (0, 2)]))
+    assert (row["MIN_VALUE"], row["MAX_VALUE"]) == (10.0, 17.0)
+
+
+def test_the_end_hour_is_excluded(cube):
+    out = cube.query("LATENCY_MS", group_by=("hour",), start=HOURS[1], end=HOURS[3])
+    assert list(out["HOUR_BUCKET"]) == list(HOURS[1:3])
+
+
+def test_group_by_region_and_network_type(cube):
+    out = cube.query("LATENCY_MS", group_by=("region", "network_type"), start=HOURS[0], end=HOURS[1])
+    by_key = {(r.REGION, r.NETWORK_TYPE): r for r in out.itertuples()}
+    assert set(by_key) == {("Midwest", "5G"), ("Northeast", "4G_LTE"), ("Northeast", "5G")}
+    assert by_key[("Northeast", "5G")].AVG_VALUE == pytest.approx(11.0)
+    assert by_key[("Midwest", "5G")].AVG_VALUE == pytest.approx(31.0)
+
+
+def test_filters_combine(cube):
+    out = cube.query("LATENCY_MS", group_by=("tower",), regions=["Northeast"], network_types=["5G"])
+    assert list(out["CELL_TOWER_ID"]) == ["T1"]
+
+
+def test_an_empty_slice_has_no_rows(cube):
+    assert cube.query("LATENCY_MS", towers=["T9"]).empty
+    assert cube.query("LATENCY_MS", start=HOURS[-1] + pd.Timedelta(hours=1)).empty
+
+
+def test_unknown_metric_or_dimension_is_rejected(cube):
+    with pytest.raises(ValueError):
+        cube.query("JITTER_MS")
+    with pytest.raises(ValueError):
+        cube.query("LATENCY_MS", group_by=("city",))
+
+
+def test_truncation_keeps_the_latest_hours():
+    per_hour = len(TOWERS) * len(METRICS) * CELL_BYTES
+    cube = KpiCube(_frame(), max_bytes=2 * per_hour)
+    assert cube.truncated
+    assert list(cube.hours) == list(HOURS[-2:])
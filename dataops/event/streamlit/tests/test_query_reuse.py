@@ -0,0 +1,59 @@
+import pytest
+
+from query_reuse import fingerprint, normalize_sql
+
+
+@pytest.mark.parametrize("a, b", [
+    # Formatting, keyword case, comments and a trailing semicolon
+    ("select region, avg(latency_ms) from network_performance group by region",
+     "SELECT region,\n  AVG(latency_ms) -- per region\nFROM network_performance\nGROUP BY region;"),
+    # Table aliases, with and without AS
+    ("SELECT p.region FROM network_performance p WHERE p.latency_ms > 50",
+     "SELECT np.region FROM network_performance AS np WHERE np.latency_ms > 50"),
+    ("SELECT a.x, b.y FROM t1 a JOIN t2 b ON a.id = b.id",
+     "SELECT q.x, r.y FROM t1 q JOIN t2 r ON q.id = r.id"),
+    # Literal IN lists in any order
+    ("SELECT * FROM t WHERE region IN ('West_Coast', 'Northeast')",
+     "SELECT * FROM t WHERE region IN ('Northeast', 'West_Coast')"),
+    ("SELECT * FROM t WHERE id IN (3, 1, 2)", "SELECT * FROM t WHERE id IN (1, 2, 3)"),
+])
+def test_equivalent_statements_share_a_fingerprint(a, b):
+    assert normalize_sql(a) == normalize_sql(b)
+    assert fingerprint(a) == fingerprint(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    # String literals are case sensitive
+    ("SELECT * FROM t WHERE region = 'West_Coast'", "SELECT * FROM t WHERE region = 'west_coast'"),
+    # So are quoted identifiers
+    ('SELECT "Region" FROM t', 'SELECT "REGION" FROM t'),
+    # Different literals, limits and operators
+    ("SELECT * FROM t WHERE latency_ms > 50", "SELECT * FROM t WHERE latency_ms > 500"),
+    ("SELECT * FROM t LIMIT 10", "SELECT * FROM t LIMIT 100"),
+    ("SELECT * FROM t WHERE region IN ('a', 'b')", "SELECT * FROM t WHERE region NOT IN ('a', 'b')"),
+    # Different IN lists, and IN lists whose order matters because they hold a column
+    ("SELECT * FROM t WHERE id IN (1, 2)", "SELECT * FROM t WHERE id IN (1, 2, 3)"),
+    ("SELECT * FROM t WHERE 1 IN (a, 2)", "SELECT * FROM t WHERE 1 IN (2, a)"),
+    # A column that happens to share its name with another query's alias
+    ("SELECT a FROM t", "SELECT b FROM t"),
+    # Aliases swapped between two tables
+    ("SELECT a.x FROM t1 a JOIN t2 b ON a.id = b.id", "SELECT b.x FROM t1 a JOIN t2 b ON a.id = b.id"),
+])
+def test_different_statements_do_not_share_a_fingerprint(a, b):
+    assert fingerprint(a) != fingerprint(b)
+
+
+def test_a_column_named_like_an_alias_is_not_renamed():
+    assert normalize_sql("SELECT a, a.b FROM t a") == "SELECT A , T1 . B FROM T T1"
+
+
+def test_literals_off_keeps_the_shape_only():
+    a = "SELECT * FROM t WHERE region = 'West_Coast' AND latency_ms > 50"
+    b = "SELECT * FROM t WHERE region = 'Northeast' AND latency_ms > 80"
+    assert fingerprint(a) != fingerprint(b)
+    assert fingerprint(a, literals=False) == fingerprint(b, literals=False)
+
+
+def test_string_contents_are_not_normalized():
+    assert "'-- not a comment'" in normalize_sql("SELECT '-- not a comment' FROM t")
+    assert "'a  b'" in normalize_sql("SELECT * FROM t WHERE x = 'a  b'")
@@ -0,0 +1,531 @@
+"""
+Golden-question latency and accuracy benchmark for the agent pipeline.
+
+The golden set (``golden_set.yaml``) is built from the sample questions at the
+bottom of each app and the ``verified_queries`` in the semantic model. Each
+question is run through the same pipeline as the apps (agent call, SQL
+execution, chart-suggestion Complete call) and scored on:
+
+* latency of each stage and end to end
+* token use of the agent and Complete calls
+* SQL correctness: the generated result is compared with the result of the
+  verified SQL, or checked against the expected result shape
+* failure rate
+
+Results are written as JSON. Passing ``--baseline`` with an earlier results
+file prints the per-question and overall deltas so a change of model,
+semantic model or prompt that slows answers down or breaks them stands out.
+
+    python golden_benchmark.py build
+    python golden_benchmark.py run --connection telco --concurrency 4 --out run.json
+    python golden_benchmark.py run --connection telco --baseline last_week.json
+    python golden_benchmark.py run --connection telco --routed
+    python golden_benchmark.py run --connection telco --compare-routes
+    python golden_benchmark.py run --stub          # dry run against stubs.py
+"""
+import argparse
+import hashlib
+import json
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import yaml
+
+TOOLS_DIR = Path(__file__).resolve().parent
+STREAMLIT_DIR = TOOLS_DIR.parent
+EVENT_DIR = STREAMLIT_DIR.parent
+SHARED_DIR = STREAMLIT_DIR / "shared"
+GOLDEN_SET = TOOLS_DIR / "golden_set.yaml"
+MODEL_ROUTES = SHARED_DIR / "model_routes.yaml"
+SEMANTIC_MODEL_FILE = EVENT_DIR / "analyst" / "telco_semantic_model.yaml"
+
+APPS = {
+    "telco_network_ops": "DEFAULT_SCHEMA.NETWORK_DOCUMENTATION",
+    "telco_customer_analytics": "DEFAULT_SCHEMA.CUSTOMER_DOCUMENTATION",
+    "cortex_chat": "DEFAULT_SCHEMA.NETWORK_DOCUMENTATION",
+}
+
+API_ENDPOINT = "/api/v2/cortex/agent:run"
+API_TIMEOUT = 50000  # in milliseconds
+MODEL = "llama3.3-70b"
+SEMANTIC_MODELS = "@CORTEX_ANALYST.CORTEX_ANALYST/telco_semantic_model.yaml"
+
+CHART_PROMPT = '''
+Create a streamlit plot using st.line_chart OR st.bar_chart OR st.scatter_chart
+based on the dataframe called "analysis_results" with given columns: {columns}.
+Give me ONLY the code itself based on the columns.
+Select only columns relevant to the query - {question}.
+Do not create fake data.
+Do not include imports.
+Do not include any columns that are not provided.
+Only return the best chart for the data.
+Choose only 1 value for X and 1 value for Y. for each chart, add color='#29B5E8'
+For telco data, use appropriate chart types (line charts for time series, bar charts for comparisons).
+'''
+
+
+# --------------------------------------------------------------------------
+# Golden set
+# --------------------------------------------------------------------------
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")[:60]
+
+
+def sample_questions(app):
+    """Questions listed in the trailing 'Sample ... Questions' comment of an app"""
+    source = (STREAMLIT_DIR / app / "app.py").read_text()
+    marker = re.search(r"^# Sample .*Questions.*$", source, re.MULTILINE)
+    if not marker:
+        return []
+    return re.findall(r"^#\s*-\s*(.+?)\s*$", source[marker.end():], re.MULTILINE)
+
+
+def verified_queries(path=SEMANTIC_MODEL_FILE):
+    with open(path) as f:
+        return yaml.safe_load(f).get("verified_queries", [])
+
+
+def build_golden_set(path=GOLDEN_SET):
+    """(Re)build the golden set, keeping any hand-curated expectations by id"""
+    curated = {}
+    if path.exists():
+        with open(path) as f:
+            curated = {q["id"]: q for q in (yaml.safe_load(f) or {}).get("questions", [])}
+
+    questions = []
+    for vq in verified_queries():
+        questions.append({
+            "id": vq["name"],
+            "app": "telco_network_ops",
+            "question": vq["question"],
+            "expected_sql": vq["sql"],
+        })
+    for app in APPS:
+        for question in sample_questions(app):
+            questions.append({"id": f"{app}.{slug(question)}", "app": app, "question": question})
+
+    for q in questions:
+        previous = curated.get(q["id"], {})
+        q["expect"] = previous.get("expect", {"min_rows": 1})
+    with open(path, "w") as f:
+        yaml.safe_dump({"questions": questions}, f, sort_keys=False, allow_unicode=True, width=120)
+    return questions
+
+
+def load_golden_set(path=GOLDEN_SET):
+    with open(path) as f:
+        return yaml.safe_load(f)["questions"]
+
+
+# --------------------------------------------------------------------------
+# Pipeline
+# --------------------------------------------------------------------------
+
+def agent_payload(question, search_service, model=MODEL, semantic_model=SEMANTIC_MODELS):
+    """Same request body the apps send in snowflake_api_call"""
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": question}]}],
+        "tools": [
+            {"tool_spec": {"type": "cortex_analyst_text_to_sql", "name": "analyst1"}},
+            {"tool_spec": {"type": "cortex_search", "name": "search1"}},
+        ],
+        "tool_resources": {
+            "analyst1": {"semantic_model_file": semantic_model},
+            "search1": {"name": search_service, "max_results": 10, "id_column": "DOCUMENT_ID"},
+        },
+    }
+
+
+def parse_sse(body):
+    """Turn a raw server-sent-events body into the event list _snowflake returns"""
+    events = []
+    for block in body.split("\n\n"):
+        name, data = None, []
+        for line in block.splitlines():
+            if line.startswith("event:"):
+                name = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+        if name and data:
+            try:
+                events.append({"event": name, "data": json.loads("\n".join(data))})
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def parse_agent_events(events):
+    """Extract text, SQL and token usage from the agent event list"""
+    text, sql, tokens = "", "", {"input": 0, "output": 0}
+    for event in events or []:
+        data = event.get("data", {}) if isinstance(event, dict) else {}
+        usage = data.get("usage") or data.get("metadata", {}).get("usage")
+        if usage:
+            tokens["input"] += usage.get("input_tokens", usage.get("prompt_tokens", 0))
+            tokens["output"] += usage.get("output_tokens", usage.get("completion_tokens", 0))
+        if event.get("event") != "message.delta":
+            continue
+        for item in data.get("delta", {}).get("content", []):
+            if item.get("type") == "text":
+                text += item.get("text", "")
+            elif item.get("type") == "tool_results":
+                for result in item.get("tool_results", {}).get("content", []):
+                    if result.get("type") == "json":
+                        text += result.get("json", {}).get("text", "")
+                        sql = result.get("json", {}).get("sql", "") or sql
+    return text, sql, tokens
+
+
+class SnowflakeBackend:
+    """Runs the pipeline against a real account through a Snowpark session"""
+
+    def __init__(self, connection_name):
+        from snowflake.snowpark import Session
+
+        self.session = Session.builder.config("connection_name", connection_name).create()
+
+    def agent(self, payload):
+        import requests
+
+        conn = self.session.connection
+        resp = requests.post(
+            f"https://{conn.host}{API_ENDPOINT}",
+            json=payload,
+            headers={
+                "Authorization": f'Snowflake Token="{conn.rest.token}"',
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            },
+            timeout=API_TIMEOUT / 1000,
+        )
+        resp.raise_for_status()
+        return parse_sse(resp.text)
+
+    def sql(self, query):
+        return self.session.sql(query.replace(";", "")).to_pandas()
+
+    def complete(self, model, prompt):
+        # The options argument makes Complete return JSON that includes token usage
+        cmd = "SELECT snowflake.cortex.complete(?, PARSE_JSON(?), {}) AS response"
+        messages = json.dumps([{"role": "user", "content": prompt}])
+        row = self.session.sql(cmd, params=[model, messages]).collect()[0]
+        body = json.loads(row.RESPONSE)
+        usage = body.get("usage", {})
+        return body["choices"][0]["messages"], {
+            "input": usage.get("prompt_tokens", 0), "output": usage.get("completion_tokens", 0)
+        }
+
+
+class StubBackend:
+    """Runs the pipeline against the fake backends in stubs.py"""
+
+    def __init__(self, agent_latency=0.5, sql_latency=0.1, complete_latency=0.3):
+        import stubs
+
+        self._stubs = stubs
+        self._backend = stubs.StubBackend(
+            agent_latency=stubs.Latency(agent_latency, agent_latency / 4),
+            sql_latency=stubs.Latency(sql_latency, sql_latency / 4),
+            complete_latency=stubs.Latency(complete_latency, complete_latency / 4),
+        )
+
+    def agent(self, payload):
+        resp = self._backend.send_snow_api_request("POST", API_ENDPOINT, {}, {}, payload, None, API_TIMEOUT)
+        return json.loads(resp["content"])
+
+    def sql(self, query):
+        return self._stubs.FakeDataFrame(self._backend, query).to_pandas()
+
+    def complete(self, model, prompt):
+        self._backend.complete_latency.wait()
+        return self._stubs.CANNED_CHART, {"input": len(prompt) // 4, "output": 16}
+
+
+def _normalized_column(series):
+    values = []
+    for v in series.tolist():
+        if isinstance(v, float):
+            v = round(v, 4)
+        values.append(str(v))
+    return sorted(values)
+
+
+def results_match(expected, actual):
+    """True when every expected column appears, by value, in the actual result.
+
+    Column names, column order and row order are ignored because the agent is
+    free to alias, reorder and sort differently from the verified SQL.
+    """
+    if len(expected) != len(actual):
+        return False
+    actual_columns = [_normalized_column(actual[c]) for c in actual.columns]
+    return all(_normalized_column(expected[c]) in actual_columns for c in expected.columns)
+
+
+def check_shape(expect, frame):
+    """Validate a result against the expected shape of a golden question"""
+    problems = []
+    if len(frame) < expect.get("min_rows", 1):
+        problems.append(f"{len(frame)} rows < min_rows {expect.get('min_rows', 1)}")
+    if "max_rows" in expect and len(frame) > expect["max_rows"]:
+        problems.append(f"{len(frame)} rows > max_rows {expect['max_rows']}")
+    columns = [c.upper() for c in frame.columns]
+    for fragment in expect.get("columns_like", []):
+        if not any(fragment.upper() in c for c in columns):
+            problems.append(f"no column like {fragment!r}")
+    return problems
+
+
+def run_question(backend, q, model, semantic_model, with_chart, expected_cache, router=None):
+    """Run one golden question through agent -> SQL -> chart and score it.
+
+    With a ``router`` the agent and chart models are picked per request the
+    way the apps pick them, and ``model`` is ignored.
+    """
+    record = {"id": q["id"], "app": q["app"], "question": q["question"], "status": "ok",
+              "tokens": {"input": 0, "output": 0}, "timings": {}}
+    chart_model = model
+    if router is not None:
+        record["route"], model = router.route(q["question"])
+        _, chart_model = router.route(q["question"], chart=True)
+    record["model"] = model
+    started = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        events = backend.agent(agent_payload(q["question"], APPS[q["app"]], model, semantic_model))
+        record["timings"]["agent_s"] = time.perf_counter() - t
+        text, sql, tokens = parse_agent_events(events)
+        record["tokens"] = tokens
+        record["sql"] = sql
+        if not sql:
+            record["status"] = "no_sql" if text else "no_answer"
+            return record
+
+        t = time.perf_counter()
+        frame = backend.sql(sql)
+        record["timings"]["sql_s"] = time.perf_counter() - t
+        record["rows"] = len(frame)
+        record["columns"] = list(frame.columns)
+
+        problems = check_shape(q.get("expect", {}), frame)
+        if q.get("expected_sql"):
+            expected = expected_cache.get(q["id"])
+            if expected is None:
+                expected = expected_cache[q["id"]] = backend.sql(q["expected_sql"])
+            if not results_match(expected, frame):
+                problems.append("result differs from verified SQL")
+        record["correct"] = not problems
+        record["problems"] = problems
+
+        if with_chart and len(frame.index) > 1:
+            t = time.perf_counter()
+            _, chart_tokens = backend.complete(chart_model, CHART_PROMPT.format(columns=list(frame.columns), question=q["question"]))
+            record["timings"]["chart_s"] = time.perf_counter() - t
+            record["tokens"]["input"] += chart_tokens["input"]
+            record["tokens"]["output"] += chart_tokens["output"]
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        record["timings"]["total_s"] = time.perf_counter() - started
+    return record
+
+
+# --------------------------------------------------------------------------
+# Reporting
+# --------------------------------------------------------------------------
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+def summarize(records):
+    totals = [r["timings"]["total_s"] for r in records]
+    scored = [r for r in records if "correct" in r]
+    return {
+        "questions": len(records),
+        "failures": sum(r["status"] != "ok" for r in records),
+        "failure_rate": sum(r["status"] != "ok" for r in records) / len(records) if records else 0.0,
+        "accuracy": sum(r["correct"] for r in scored) / len(scored) if scored else 0.0,
+        "p50_s": percentile(totals, 50),
+        "p95_s": percentile(totals, 95),
+        "tokens_in": sum(r["tokens"]["input"] for r in records),
+        "tokens_out": sum(r["tokens"]["output"] for r in records),
+    }
+
+
+def run_config(model, semantic_model):
+    """What the run depended on, so reports can tell which change moved the numbers"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=TOOLS_DIR, text=True).strip()
+    except Exception:
+        commit = None
+    return {
+        "model": model,
+        "semantic_model": semantic_model,
+        "semantic_model_sha": hashlib.sha1(SEMANTIC_MODEL_FILE.read_bytes()).hexdigest()[:12],
+        "chart_prompt_sha": hashlib.sha1(CHART_PROMPT.encode()).hexdigest()[:12],
+        "git_commit": commit,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def format_report(run, baseline=None, latency_tolerance=0.2):
+    previous = {r["id"]: r for r in baseline["records"]} if baseline else {}
+    lines = [f"{'id':<58}{'status':>10}{'correct':>9}{'total s':>9}{'tokens':>8}{'Δ s':>8}  flags"]
+    lines.append("-" * len(lines[0]))
+    for r in run["records"]:
+        total = r["timings"]["total_s"]
+        flags, delta = [], ""
+        before = previous.get(r["id"])
+        if before:
+            diff = total - before["timings"]["total_s"]
+            delta = f"{diff:+.2f}"
+            if diff > latency_tolerance * before["timings"]["total_s"]:
+                flags.append("SLOWER")
+            if before.get("correct") and not r.get("correct"):
+                flags.append("WRONG")
+            if before["status"] == "ok" and r["status"] != "ok":
+                flags.append("FAILED")
+        correct = {True: "yes", False: "no"}.get(r.get("correct"), "-")
+        tokens = r["tokens"]["input"] + r["tokens"]["output"]
+        lines.append(f"{r['id'][:57]:<58}{r['status']:>10}{correct:>9}{total:>9.2f}{tokens:>8}{delta:>8}  {' '.join(flags)}")
+
+    s = run["summary"]
+    lines.append("")
+    lines.append(
+        f"questions={s['questions']} failure_rate={s['failure_rate']:.1%} accuracy={s['accuracy']:.1%} "
+        f"p50={s['p50_s']:.2f}s p95={s['p95_s']:.2f}s tokens={s['tokens_in']}/{s['tokens_out']}"
+    )
+    if baseline:
+        b = baseline["summary"]
+        lines.append(
+            f"vs baseline ({baseline['config'].get('model')}, {baseline['config'].get('git_commit')}): "
+            f"accuracy {s['accuracy'] - b['accuracy']:+.1%}, failure_rate {s['failure_rate'] - b['failure_rate']:+.1%}, "
+            f"p50 {s['p50_s'] - b['p50_s']:+.2f}s, p95 {s['p95_s'] - b['p95_s']:+.2f}s"
+        )
+    return "\n".join(lines)
+
+
+def run_benchmark(backend, questions, model=MODEL, semantic_model=SEMANTIC_MODELS,
+                  concurrency=4, with_chart=True, router=None):
+    expected_cache = {}
+    records = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_question, backend, q, model, semantic_model, with_chart, expected_cache, router)
+                   for q in questions]
+        for future in as_completed(futures):
+            records.append(future.result())
+    order = {q["id"]: i for i, q in enumerate(questions)}
+    records.sort(key=lambda r: order[r["id"]])
+    config = run_config("routed" if router else model, semantic_model)
+    if router is not None:
+        config["routes"] = dict(router.routes)
+    return {"config": config, "summary": summarize(records), "records": records}
+
+
+def load_router():
+    sys.path.insert(0, str(SHARED_DIR))
+    from model_router import ModelRouter
+
+    with open(SEMANTIC_MODEL_FILE) as f:
+        return ModelRouter.from_config(MODEL_ROUTES, yaml.safe_load(f))
+
+
+def compare_routes(backend, questions, router, semantic_model, concurrency, with_chart):
+    """Offline route comparison: every configured model on every question, then the router"""
+    runs = {}
+    for model in sorted(set(router.routes.values())):
+        runs[model] = run_benchmark(backend, questions, model, semantic_model, concurrency, with_chart)
+    runs["routed"] = run_benchmark(backend, questions, semantic_model=semantic_model,
+                                   concurrency=concurrency, with_chart=with_chart, router=router)
+    return runs
+
+
+def format_route_comparison(runs):
+    lines = [f"{'strategy':<22}{'accuracy':>10}{'failures':>10}{'p50 s':>8}{'p95 s':>8}{'tokens':>9}"]
+    lines.append("-" * len(lines[0]))
+    for name, run in runs.items():
+        s = run["summary"]
+        lines.append(f"{name:<22}{s['accuracy']:>10.1%}{s['failure_rate']:>10.1%}{s['p50_s']:>8.2f}"
+                     f"{s['p95_s']:>8.2f}{s['tokens_in'] + s['tokens_out']:>9}")
+    routed = runs.get("routed")
+    if routed:
+        lines.append("")
+        lines.append(f"{'route':<22}{'model':<18}{'questions':>10}{'accuracy':>10}{'p50 s':>8}")
+        for route, model in routed["config"]["routes"].items():
+            records = [r for r in routed["records"] if r.get("route") == route]
+            if records:
+                s = summarize(records)
+                lines.append(f"{route:<22}{model:<18}{len(records):>10}{s['accuracy']:>10.1%}{s['p50_s']:>8.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="rebuild golden_set.yaml from the apps and the semantic model")
+
+    run = sub.add_parser("run", help="run the golden set through the agent pipeline")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--connection", help="connection name from connections.toml")
+    source.add_argument("--stub", action="store_true", help="use the stubbed backends")
+    strategy = run.add_mutually_exclusive_group()
+    strategy.add_argument("--model", default=MODEL, help="send every request to this model")
+    strategy.add_argument("--routed", action="store_true", help="pick models with model_routes.yaml like the apps")
+    strategy.add_argument("--compare-routes", action="store_true",
+                          help="run every routed model and the router itself, and compare them")
+    run.add_argument("--semantic-model", default=SEMANTIC_MODELS)
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--no-chart", action="store_true", help="skip the chart-suggestion Complete call")
+    run.add_argument("--app", choices=list(APPS), help="only run questions for one app")
+    run.add_argument("--out", help="write the results JSON here")
+    run.add_argument("--baseline", help="earlier results JSON to compare against")
+    run.add_argument("--latency-tolerance", type=float, default=0.2,
+                     help="flag questions more than this fraction slower than baseline")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        questions = build_golden_set()
+        print(f"wrote {len(questions)} questions to {GOLDEN_SET}")
+        return
+
+    sys.path.insert(0, str(TOOLS_DIR))
+    backend = StubBackend() if args.stub else SnowflakeBackend(args.connection)
+    questions = load_golden_set()
+    if args.app:
+        questions = [q for q in questions if q["app"] == args.app]
+
+    if args.compare_routes:
+        runs = compare_routes(backend, questions, load_router(), args.semantic_model,
+                              args.concurrency, not args.no_chart)
+        print(format_route_comparison(runs))
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(runs, f, indent=2, default=str)
+        return
+
+    router = load_router() if args.routed else None
+    result = run_benchmark(backend, questions, args.model, args.semantic_model,
+                           args.concurrency, not args.no_chart, router)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(result, baseline, args.latency_tolerance))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Concurrent-session load test for the Telco Streamlit apps.
+
+Drives N simulated users through scripted sessions (quick-query clicks, chat
+questions, tab switches, sidebar refreshes) using Streamlit's headless
+``AppTest`` runner against stubbed Snowflake backends, and reports rerun
+latency percentiles, throughput and peak RSS for each concurrency level.
+
+Each concurrency level runs in a fresh process so peak RSS is not carried
+over from the previous level. Example:
+
+    python load_test.py --app telco_network_ops --users 1 5 10 25 \
+        --agent-latency 2.0 --sql-latency 0.3 --steps 6
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent
+STREAMLIT_DIR = TOOLS_DIR.parent
+EVENT_DIR = STREAMLIT_DIR.parent
+SHARED_DIR = STREAMLIT_DIR / "shared"
+EXTRA_CSS = EVENT_DIR / "homepage" / "docs" / "stylesheets" / "extra.css"
+LOGO = EVENT_DIR / "logos" / "snowflake_logo_color_rgb.svg"
+
+APPS = ["telco_network_ops", "telco_customer_analytics", "cortex_chat"]
+
+NETWORK_QUICK_QUERIES = [
+    "Show network performance by region",
+    "What critical incidents happened today?",
+    "Top 10 customers by data usage",
+    "Network latency trends last hour",
+    "5G network performance summary",
+]
+CUSTOMER_QUICK_QUERIES = [
+    "Show top 10 customers by data usage",
+    "What's the average bill by service plan?",
+    "Which customers use the most voice minutes?",
+    "Revenue analysis by customer segment",
+    "Customer churn risk indicators",
+    "Service plan upgrade recommendations",
+]
+CUSTOMER_TABS = ["📊 Dashboard", "💬 AI Assistant", "📈 Advanced Analytics"]
+CHAT_QUESTIONS = [
+    "What is the average network latency by region in the last hour?",
+    "Show me critical incidents from the past 24 hours",
+    "Which customers are using the most data this month?",
+    "What is the 5G network performance compared to 4G?",
+    "How many network incidents occurred this week by type?",
+    "Show network uptime trends for the Northeast region",
+    "What is the average customer bill amount by service plan?",
+]
+
+# Weighted action mix per app: (weight, action). Actions are resolved by run_step.
+SCRIPTS = {
+    "telco_network_ops": [(3, "quick_query"), (4, "chat"), (2, "refresh"), (1, "new_chat")],
+    "telco_customer_analytics": [(3, "quick_query"), (3, "chat"), (3, "tab_switch"), (1, "refresh")],
+    "cortex_chat": [(6, "chat"), (2, "refresh"), (1, "new_chat")],
+}
+
+
+def stage_app(app, dest):
+    """Lay out an app the way deploy_streamlit.sql PUTs it into its stage"""
+    shutil.copy(STREAMLIT_DIR / app / "app.py", dest)
+    shutil.copy(EXTRA_CSS, dest)
+    shutil.copy(LOGO, dest)
+    if SHARED_DIR.is_dir():
+        for module in list(SHARED_DIR.glob("*.py")) + list(SHARED_DIR.glob("*.yaml")):
+            shutil.copy(module, dest)
+    return Path(dest) / "app.py"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_step(at, app, action, rng):
+    """Apply one scripted user action to an AppTest session and rerun it"""
+    if action == "quick_query":
+        if app == "telco_network_ops":
+            key = f"quick_{hash(rng.choice(NETWORK_QUICK_QUERIES))}"
+        else:
+            key = f"cust_{hash(rng.choice(CUSTOMER_QUICK_QUERIES))}"
+        at.button(key=key).click()
+    elif action == "chat":
+        if not len(at.chat_input):
+            # The customer app only renders the chat box on its assistant tab
+            at.radio(key="active_tab").set_value(CUSTOMER_TABS[1])
+            at.run()
+        at.chat_input[0].set_value(rng.choice(CHAT_QUESTIONS))
+    elif action == "new_chat":
+        at.button(key="new_chat").click()
+    elif action == "tab_switch":
+        at.radio(key="active_tab").set_value(rng.choice(CUSTOMER_TABS))
+    at.run()
+
+
+class _PinnedRuntimeMeta(type):
+    def __setattr__(cls, name, value):
+        if name != "_instance":
+            super().__setattr__(name, value)
+
+
+class _PinnedRuntime(metaclass=_PinnedRuntimeMeta):
+    """Stands in for ``Runtime`` inside AppTest so runs cannot swap the singleton"""
+
+
+def share_runtime():
+    """Give every AppTest session in this process one runtime, like a real server.
+
+    AppTest installs and tears down a private mock ``Runtime`` on each run,
+    which breaks when sessions run concurrently and gives every rerun an
+    empty ``st.cache_data`` store. Pinning one shared runtime fixes both.
+    Each run also compiles the script on its own; concurrent ``compile()``
+    calls can fail on Python 3.11, so the runs share one script cache as the
+    sessions of a server do.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = shared
+    app_test.Runtime = _PinnedRuntime
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+def simulate_user(app_path, app, user_id, steps, think_time, timeout, seed, results, lock):
+    """One simulated operator: initial page load followed by scripted actions"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + user_id)
+    weights, actions = zip(*SCRIPTS[app])
+    latencies, errors = [], 0
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    plan = ["load"] + rng.choices(actions, weights=weights, k=steps)
+    for action in plan:
+        started = time.perf_counter()
+        try:
+            if action == "load":
+                at.run()
+            else:
+                run_step(at, app, action, rng)
+            if len(at.exception):
+                errors += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+    with lock:
+        results["latencies"].extend(latencies)
+        results["errors"] += errors
+
+
+def run_level(app, users, steps, think_time, timeout, seed, latency_config):
+    """Run one concurrency level in the current process and return its stats"""
+    import stubs
+
+    backend = stubs.install(stubs.StubBackend(
+        agent_latency=stubs.Latency(*latency_config["agent"]),
+        sql_latency=stubs.Latency(*latency_config["sql"]),
+        complete_latency=stubs.Latency(*latency_config["complete"]),
+    ))
+    workdir = tempfile.mkdtemp(prefix=f"{app}_")
+    app_path = stage_app(app, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    share_runtime()
+
+    results = {"latencies": [], "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=simulate_user,
+                         args=(app_path, app, i, steps, think_time, timeout, seed, results, lock))
+        for i in range(users)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = results["latencies"]
+    return {
+        "app": app,
+        "users": users,
+        "reruns": len(latencies),
+        "errors": results["errors"],
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "elapsed_s": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "backend_calls": dict(backend.calls),
+    }
+
+
+def _worker(args):
+    sys.path.insert(0, str(TOOLS_DIR))
+    return run_level(*args)
+
+
+def format_report(rows):
+    header = f"{'app':<26}{'users':>6}{'reruns':>8}{'errors':>7}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'rerun/s':>9}{'RSS MB':>9}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['app']:<26}{r['users']:>6}{r['reruns']:>8}{r['errors']:>7}"
+            f"{r['p50_s']:>8.2f}{r['p95_s']:>8.2f}{r['p99_s']:>8.2f}"
+            f"{r['throughput_rps']:>9.2f}{r['peak_rss_mb']:>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=APPS + ["all"], default="all")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--steps", type=int, default=5, help="scripted actions per user after the first load")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max random pause between actions (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest rerun timeout (s)")
+    parser.add_argument("--agent-latency", type=float, default=2.0, help="agent API base latency (s)")
+    parser.add_argument("--sql-latency", type=float, default=0.3, help="warehouse query base latency (s)")
+    parser.add_argument("--complete-latency", type=float, default=1.0, help="Cortex Complete base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.25, help="fraction of base latency added as jitter")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    latency_config = {
+        "agent": (args.agent_latency, args.agent_latency * args.jitter),
+        "sql": (args.sql_latency, args.sql_latency * args.jitter),
+        "complete": (args.complete_latency, args.complete_latency * args.jitter),
+    }
+    apps = APPS if args.app == "all" else [args.app]
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for app in apps:
+        for users in args.users:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                row = pool.submit(_worker, (app, users, args.steps, args.think_time,
+                                            args.timeout, args.seed, latency_config)).result()
+            rows.append(row)
+            print(format_report([row]).splitlines()[-1], flush=True)
+
+    print()
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Partition pruning of the app queries before and after the physical layout.
+
+Generates a large synthetic copy of the telco tables in a scratch schema, with
+the rows in random order as the sample inserts leave them. It then runs the
+app's filter and point-lookup queries and reads ``PARTITIONS_SCANNED`` and
+``PARTITIONS_TOTAL`` for each from the query history. Next it applies the
+clustering keys and search optimization from section 10 of
+``configure_attendee_account.template.sql`` (``table_layouts``) and runs the
+queries again.
+
+Automatic clustering converges in the background. To measure the clustered
+state right away, the benchmark rewrites each clustered table once in
+clustering-key order. Search optimization is awaited until its build reaches
+100%, up to ``--so-timeout``. The result cache is off for the session.
+
+    python pruning_benchmark.py --connection telco
+    python pruning_benchmark.py --connection telco --scale 0.1 --keep
+    python pruning_benchmark.py --connection telco --skip-generate --out pruning.json
+"""
+import argparse
+import ast
+import json
+import re
+import time
+
+from golden_benchmark import EVENT_DIR
+
+CONFIGURE_TEMPLATE = EVENT_DIR / "configure_attendee_account.template.sql"
+
+# Rows per table at --scale 1
+ROWS = {
+    "NETWORK_PERFORMANCE": 50_000_000,
+    "CUSTOMER_USAGE": 20_000_000,
+    "SERVICE_QUALITY_METRICS": 5_000_000,
+    "NETWORK_INCIDENTS": 1_000_000,
+    "NETWORK_DOCUMENTATION": 200_000,
+}
+
+GENERATE_SQL = {
+    "NETWORK_PERFORMANCE": """
+CREATE OR REPLACE TABLE NETWORK_PERFORMANCE AS
+SELECT
+    'TOWER_' || LPAD(UNIFORM(1, 20000, RANDOM())::VARCHAR, 6, '0') AS CELL_TOWER_ID,
+    ARRAY_CONSTRUCT('5G', '4G_LTE', '5G_MMWAVE')[UNIFORM(0, 2, RANDOM())]::VARCHAR AS NETWORK_TYPE,
+    ARRAY_CONSTRUCT('Northeast', 'West_Coast', 'Midwest', 'Southeast', 'Southwest', 'Mountain')
+        [UNIFORM(0, 5, RANDOM())]::VARCHAR AS REGION,
+    DATEADD(second, -UNIFORM(0, 90 * 86400, RANDOM()), CURRENT_TIMESTAMP())::TIMESTAMP_NTZ AS MEASUREMENT_TIMESTAMP,
+    UNIFORM(5, 80, RANDOM())::FLOAT AS LATENCY_MS,
+    UNIFORM(50, 2000, RANDOM())::FLOAT AS THROUGHPUT_MBPS,
+    UNIFORM(0, 200, RANDOM()) / 100.0 AS PACKET_LOSS_PERCENT,
+    99 + UNIFORM(0, 100, RANDOM()) / 100.0 AS UPTIME_PERCENT
+FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+""",
+    "CUSTOMER_USAGE": """
+CREATE OR REPLACE TABLE CUSTOMER_USAGE AS
+SELECT
+    'CUST_' || LPAD(UNIFORM(1, 2000000, RANDOM())::VARCHAR, 7, '0') AS CUSTOMER_ID,
+    ARRAY_CONSTRUCT('UNLIMITED_5G', 'FAMILY_PLAN', 'BASIC_4G', 'BUSINESS_PRO', 'IOT_BASIC', 'PREPAID')
+        [UNIFORM(0, 5, RANDOM())]::VARCHAR AS SERVICE_PLAN,
+    ARRAY_CONSTRUCT('SMARTPHONE', 'TABLET', 'HOTSPOT', 'IOT_DEVICE', 'SMARTWATCH')
+        [UNIFORM(0, 4, RANDOM())]::VARCHAR AS DEVICE_TYPE,
+    DATEADD(day, -UNIFORM(0, 365, RANDOM()), CURRENT_DATE()) AS USAGE_DATE,
+    UNIFORM(0, 5000, RANDOM()) / 100.0 AS DATA_USAGE_GB,
+    UNIFORM(0, 1200, RANDOM()) AS VOICE_MINUTES,
+    UNIFORM(0, 500, RANDOM()) AS SMS_COUNT,
+    UNIFORM(1500, 19000, RANDOM()) / 100.0 AS MONTHLY_BILL_AMOUNT
+FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+""",
+    "SERVICE_QUALITY_METRICS": """
+CREATE OR REPLACE TABLE SERVICE_QUALITY_METRICS AS
+SELECT
+    ARRAY_CONSTRUCT('VOICE_CALL', 'DATA_SESSION', 'VIDEO_STREAMING', 'SMS')[UNIFORM(0, 3, RANDOM())]::VARCHAR AS SERVICE_TYPE,
+    ARRAY_CONSTRUCT('URBAN', 'SUBURBAN', 'RURAL', 'HIGHWAY')[UNIFORM(0, 3, RANDOM())]::VARCHAR AS GEOGRAPHIC_AREA,
+    DATEADD(second, -UNIFORM(0, 90 * 86400, RANDOM()), CURRENT_TIMESTAMP())::TIMESTAMP_NTZ AS QUALITY_MEASUREMENT_TIME,
+    UNIFORM(0, 300, RANDOM()) / 100.0 AS CALL_DROP_RATE,
+    90 + UNIFORM(0, 1000, RANDOM()) / 100.0 AS DATA_SUCCESS_RATE,
+    UNIFORM(10, 50, RANDOM()) / 10.0 AS CUSTOMER_SATISFACTION_SCORE
+FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+""",
+    "NETWORK_INCIDENTS": """
+CREATE OR REPLACE TABLE NETWORK_INCIDENTS AS
+SELECT
+    INCIDENT_ID, INCIDENT_TYPE, SEVERITY_LEVEL, AFFECTED_REGION, INCIDENT_START_TIME,
+    DATEADD(minute, DURATION_MINUTES, INCIDENT_START_TIME) AS INCIDENT_END_TIME,
+    CUSTOMERS_AFFECTED, DURATION_MINUTES, REVENUE_IMPACT
+FROM (
+    SELECT
+        'INC_' || LPAD(SEQ8()::VARCHAR, 8, '0') AS INCIDENT_ID,
+        ARRAY_CONSTRUCT('HARDWARE_FAILURE', 'NETWORK_CONGESTION', 'FIBER_CUT', 'POWER_OUTAGE')
+            [UNIFORM(0, 3, RANDOM())]::VARCHAR AS INCIDENT_TYPE,
+        ARRAY_CONSTRUCT('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')[UNIFORM(0, 3, RANDOM())]::VARCHAR AS SEVERITY_LEVEL,
+        ARRAY_CONSTRUCT('Northeast', 'West_Coast', 'Midwest', 'Southeast', 'Southwest', 'Mountain')
+            [UNIFORM(0, 5, RANDOM())]::VARCHAR AS AFFECTED_REGION,
+        DATEADD(second, -UNIFORM(0, 365 * 86400, RANDOM()), CURRENT_TIMESTAMP())::TIMESTAMP_NTZ AS INCIDENT_START_TIME,
+        UNIFORM(100, 50000, RANDOM()) AS CUSTOMERS_AFFECTED,
+        UNIFORM(5, 600, RANDOM()) AS DURATION_MINUTES,
+        UNIFORM(100, 100000, RANDOM())::FLOAT AS REVENUE_IMPACT
+    FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+)
+""",
+    "NETWORK_DOCUMENTATION": """
+CREATE OR REPLACE TABLE NETWORK_DOCUMENTATION AS
+SELECT
+    'DOC_' || LPAD(ID::VARCHAR, 7, '0') AS DOCUMENT_ID,
+    ARRAY_CONSTRUCT('TROUBLESHOOTING', 'BEST_PRACTICES', 'RUNBOOK', 'POLICY')[UNIFORM(0, 3, RANDOM())]::VARCHAR AS DOCUMENT_TYPE,
+    'Generated document ' || ID AS TITLE,
+    RANDSTR(2000, RANDOM()) AS CONTENT,
+    'generated,benchmark' AS TAGS,
+    DATEADD(day, -UNIFORM(0, 365, RANDOM()), CURRENT_DATE()) AS CREATED_DATE
+FROM (
+    SELECT SEQ8() AS ID FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+)
+-- Random order, as with the IDs of documents added over time by many authors
+ORDER BY RANDOM()
+""",
+}
+
+# Filters and point lookups of the apps, one per query pattern
+QUERIES = [
+    ("network_status", "NETWORK_PERFORMANCE", """
+SELECT AVG(uptime_percent), AVG(latency_ms), COUNT(DISTINCT cell_tower_id), MAX(measurement_timestamp)
+FROM network_performance
+WHERE measurement_timestamp >= DATEADD(hour, -1, CURRENT_TIMESTAMP())"""),
+    ("region_week", "NETWORK_PERFORMANCE", """
+SELECT network_type, AVG(latency_ms), AVG(throughput_mbps)
+FROM network_performance
+WHERE region = 'Northeast' AND measurement_timestamp >= DATEADD(day, -7, CURRENT_TIMESTAMP())
+GROUP BY network_type"""),
+    ("tower_lookup", "NETWORK_PERFORMANCE", """
+SELECT * FROM network_performance WHERE cell_tower_id = 'TOWER_001234'"""),
+    ("customer_month", "CUSTOMER_USAGE", """
+SELECT COUNT(DISTINCT customer_id), AVG(monthly_bill_amount), SUM(data_usage_gb)
+FROM customer_usage
+WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE())"""),
+    ("customer_lookup", "CUSTOMER_USAGE", """
+SELECT * FROM customer_usage WHERE customer_id = 'CUST_0012345'"""),
+    ("quality_area_day", "SERVICE_QUALITY_METRICS", """
+SELECT service_type, AVG(call_drop_rate), AVG(data_success_rate)
+FROM service_quality_metrics
+WHERE geographic_area = 'URBAN' AND quality_measurement_time >= DATEADD(hour, -24, CURRENT_TIMESTAMP())
+GROUP BY service_type"""),
+    ("incidents_day", "NETWORK_INCIDENTS", """
+SELECT incident_id, incident_type, severity_level, affected_region, customers_affected
+FROM network_incidents
+WHERE incident_start_time >= DATEADD(hour, -24, CURRENT_TIMESTAMP())"""),
+    ("document_lookup", "NETWORK_DOCUMENTATION", """
+SELECT CONTENT FROM network_documentation WHERE document_id = 'DOC_0001234'"""),
+]
+
+STATS_SQL = """
+SELECT partitions_scanned, partitions_total, bytes_scanned, total_elapsed_time
+FROM TABLE(information_schema.query_history_by_session(result_limit => 1000))
+WHERE query_id = ?
+"""
+
+
+def table_layouts(path=CONFIGURE_TEMPLATE):
+    """The ``table_layouts`` list from the deployment template"""
+    match = re.search(r"\{%\s*set table_layouts\s*=\s*(\[.*?\])\s*%\}", path.read_text(), re.DOTALL)
+    if not match:
+        raise SystemExit(f"no table_layouts in {path}")
+    return ast.literal_eval(match.group(1))
+
+
+def query_stats(session, query_id, attempts=10):
+    """Pruning and timing of a finished query from the session's history"""
+    for _ in range(attempts):
+        rows = session.sql(STATS_SQL, params=[query_id]).collect()
+        if rows and rows[0][1] is not None:
+            scanned, total, bytes_scanned, elapsed_ms = rows[0]
+            return {"partitions_scanned": scanned, "partitions_total": total,
+                    "bytes_scanned": bytes_scanned, "elapsed_ms": elapsed_ms}
+        time.sleep(1)
+    raise RuntimeError(f"no query history for {query_id}")
+
+
+def run_queries(session, label):
+    results = {}
+    for name, _, sql in QUERIES:
+        job = session.sql(sql).collect_nowait()
+        job.result()
+        results[name] = query_stats(session, job.query_id)
+        stats = results[name]
+        print(f"  {label:<7}{name:<20}{stats['partitions_scanned']:>8,} / {stats['partitions_total']:<8,}"
+              f"{stats['elapsed_ms']:>8,} ms")
+    return results
+
+
+def generate(session, scale):
+    for table, sql in GENERATE_SQL.items():
+        rows = max(1000, int(ROWS[table] * scale))
+        started = time.perf_counter()
+        session.sql(sql.format(rows=rows)).collect()
+        print(f"  generated {table} ({rows:,} rows) in {time.perf_counter() - started:.0f}s")
+
+
+def wait_for_search_optimization(session, table, timeout_s):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        rows = session.sql(f"SHOW TABLES LIKE '{table}'").collect()
+        progress = rows[0].as_dict().get("search_optimization_progress") if rows else None
+        if progress is not None and float(progress) >= 100:
+            return True
+        time.sleep(15)
+    return False
+
+
+def apply_layouts(session, layouts, so_timeout_s):
+    """Rewrite clustered tables in key order, declare the keys, and build search optimization"""
+    applied = {}
+    for layout in layouts:
+        table = layout["table"]
+        notes = []
+        if layout["cluster_by"]:
+            keys = layout["cluster_by"]
+            session.sql(f"CREATE OR REPLACE TABLE {table}_SORTED CLUSTER BY ({keys}) AS "
+                        f"SELECT * FROM {table} ORDER BY {keys}").collect()
+            session.sql(f"ALTER TABLE {table} SWAP WITH {table}_SORTED").collect()
+            session.sql(f"DROP TABLE {table}_SORTED").collect()
+            notes.append(f"cluster by ({keys})")
+        if layout["search_optimization"]:
+            try:
+                session.sql(f"ALTER TABLE {table} ADD SEARCH OPTIMIZATION ON {layout['search_optimization']}").collect()
+            except Exception as e:
+                notes.append(f"search optimization unavailable: {e}")
+            else:
+                ready = wait_for_search_optimization(session, table, so_timeout_s)
+                notes.append(f"search optimization on {layout['search_optimization']}"
+                             + ("" if ready else " (still building)"))
+        applied[table] = notes
+        print(f"  {table}: {'; '.join(notes) or 'no layout'}")
+    return applied
+
+
+def pruned(stats):
+    total = stats["partitions_total"] or 0
+    return 1 - stats["partitions_scanned"] / total if total else 0.0
+
+
+def format_report(before, after):
+    lines = [f"{'query':<20}{'table':<25}{'partitions':>11}{'scanned before':>16}{'scanned after':>15}"
+             f"{'pruned before':>15}{'pruned after':>14}{'ms before':>11}{'ms after':>10}"]
+    for name, table, _ in QUERIES:
+        b, a = before[name], after[name]
+        lines.append(f"{name:<20}{table:<25}{a['partitions_total']:>11,}{b['partitions_scanned']:>16,}"
+                     f"{a['partitions_scanned']:>15,}{pruned(b):>15.1%}{pruned(a):>14.1%}"
+                     f"{b['elapsed_ms']:>11,}{a['elapsed_ms']:>10,}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connection", required=True, help="connection name from connections.toml")
+    parser.add_argument("--schema", default="PRUNING_BENCHMARK", help="scratch schema in the connection's database")
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the default row counts")
+    parser.add_argument("--skip-generate", action="store_true", help="reuse the tables of an earlier --keep run")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    parser.add_argument("--so-timeout", type=int, default=1800, help="seconds to wait for search optimization")
+    parser.add_argument("--out", help="write the results JSON here")
+    args = parser.parse_args(argv)
+
+    from snowflake.snowpark import Session
+
+    session = Session.builder.config("connection_name", args.connection).create()
+    session.sql(f"CREATE SCHEMA IF NOT EXISTS {args.schema}").collect()
+    session.sql(f"USE SCHEMA {args.schema}").collect()
+    session.sql("ALTER SESSION SET USE_CACHED_RESULT = FALSE").collect()
+    try:
+        if not args.skip_generate:
+            print("generating")
+            generate(session, args.scale)
+        print("before layout")
+        before = run_queries(session, "before")
+        print("applying layout")
+        applied = apply_layouts(session, table_layouts(), args.so_timeout)
+        print("after layout")
+        after = run_queries(session, "after")
+        print()
+        print(format_report(before, after))
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump({"scale": args.scale, "layouts": applied, "before": before, "after": after}, f, indent=2)
+    finally:
+        if not args.keep:
+            session.sql(f"DROP SCHEMA IF EXISTS {args.schema}").collect()
+
+
+if __name__ == "__main__":
+    main()
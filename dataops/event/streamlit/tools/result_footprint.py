@@ -0,0 +1,208 @@
+"""
+Memory and serialization cost of a query result, before and after compaction.
+
+Runs the same query the way the apps do, with ``collect_nowait``, and builds
+its frame on three paths:
+
+* ``arrow_results``: the ``AsyncJob`` read as Arrow and compacted by
+  ``shared/arrow_results.py``
+* ``via_pandas``: the job's ``result("pandas")`` copied to Arrow and compacted
+* ``to_pandas``: the job's ``result("pandas")`` as is
+
+For each path it reports the frame's in-memory footprint, the process's peak
+resident memory while the frame was built, the build time, and the time and
+size of the Arrow IPC payload Streamlit sends to the browser. Every path runs
+in its own process, so memory freed by one path cannot be reused by the next.
+
+By default a synthetic ``CUSTOMER_USAGE`` result is generated; with
+``--connection`` the query runs against Snowflake instead. Example:
+
+    python result_footprint.py --rows 1000000
+    python result_footprint.py --connection telco --query "SELECT * FROM CUSTOMER_USAGE"
+"""
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pyarrow as pa
+
+from load_test import SHARED_DIR
+
+sys.path.insert(0, str(SHARED_DIR))
+import arrow_results  # noqa: E402
+
+PATHS = ["arrow_results", "via_pandas", "to_pandas"]
+PLANS = ["UNLIMITED_5G", "FAMILY_PLAN", "BASIC_4G", "BUSINESS_PRO", "IOT_BASIC", "PREPAID"]
+DEVICES = ["SMARTPHONE", "TABLET", "HOTSPOT", "IOT_DEVICE", "SMARTWATCH"]
+
+
+class SyntheticJob:
+    """Snowpark ``AsyncJob`` stand-in over an in-memory Arrow table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.query_id = str(uuid.uuid4())
+
+    def result(self, result_type="row"):
+        return self.table.to_pandas()
+
+
+class SyntheticCursor:
+    """Connector cursor stand-in returning the job's table"""
+
+    def __init__(self, job):
+        self.job = job
+
+    def get_results_from_sfqid(self, query_id):
+        pass
+
+    def fetch_arrow_all(self):
+        return self.job.table
+
+    def close(self):
+        pass
+
+
+class SyntheticSession:
+    def __init__(self, job):
+        self.connection = self
+        self.job = job
+
+    def cursor(self):
+        return SyntheticCursor(self.job)
+
+
+def synthetic_customer_usage(rows, customers=50000, seed=7):
+    """Arrow table shaped like a ``SELECT *`` over CUSTOMER_USAGE"""
+    rng = np.random.default_rng(seed)
+    ids = np.array([f"CUST_{i:07d}" for i in range(customers)])
+    start = np.datetime64("2025-01-01")
+    return pa.table({
+        "CUSTOMER_ID": ids[rng.integers(0, customers, rows)],
+        "SERVICE_PLAN": np.array(PLANS)[rng.integers(0, len(PLANS), rows)],
+        "DEVICE_TYPE": np.array(DEVICES)[rng.integers(0, len(DEVICES), rows)],
+        "USAGE_DATE": start + rng.integers(0, 60, rows).astype("timedelta64[D]"),
+        "DATA_USAGE_GB": np.round(rng.gamma(2.0, 10.0, rows), 1),
+        "VOICE_MINUTES": rng.integers(0, 1200, rows),
+        "SMS_COUNT": rng.integers(0, 500, rows),
+        "MONTHLY_BILL_AMOUNT": np.round(rng.uniform(15, 190, rows), 2),
+    })
+
+
+def snowflake_job(connection, query):
+    from snowflake.snowpark import Session
+
+    session = Session.builder.config("connection_name", connection).create()
+    return session.sql(query).collect_nowait(), session
+
+
+def rss_bytes():
+    """Resident memory of this process, or None where ``/proc`` is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * 4096
+    except OSError:
+        return None
+
+
+class PeakRss:
+    """Highest resident memory above the starting point while entered, sampled every millisecond"""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._start = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _sample(self):
+        while self._start is not None:
+            self.peak = max(self.peak, rss_bytes() - self._start)
+            if self._stop.wait(0.001):
+                break
+
+
+def serialize_seconds(df):
+    """Time and size of the Arrow IPC payload Streamlit builds for st.dataframe"""
+    started = time.perf_counter()
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return time.perf_counter() - started, sink.getvalue().size
+
+
+def build(path, job, session):
+    if path == "arrow_results":
+        return arrow_results.result_frame(job, session=session)
+    if path == "via_pandas":
+        table = pa.Table.from_pandas(job.result("pandas"), preserve_index=False)
+        return arrow_results.to_frame(arrow_results.compact_table(table))
+    return job.result("pandas")
+
+
+def measure(path, args):
+    """Build one path's frame in this process and return its measurements"""
+    if args.connection:
+        job, session = snowflake_job(args.connection, args.query)
+    else:
+        job = SyntheticJob(synthetic_customer_usage(args.rows))
+        session = SyntheticSession(job)
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        df = build(path, job, session)
+        build_s = time.perf_counter() - started
+    ser_s, payload = serialize_seconds(df)
+    return {
+        "path": path,
+        "rows": len(df),
+        "memory_mb": arrow_results.footprint(df) / 2 ** 20,
+        "peak_rss_mb": rss.peak / 2 ** 20 if rss_bytes() is not None else None,
+        "build_s": build_s,
+        "serialize_s": ser_s,
+        "payload_mb": payload / 2 ** 20,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic CUSTOMER_USAGE rows")
+    parser.add_argument("--connection", help="connections.toml entry; query Snowflake instead of synthetic data")
+    parser.add_argument("--query", default="SELECT * FROM CUSTOMER_USAGE")
+    parser.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.path:
+        print(json.dumps(measure(args.path, args)))
+        return
+
+    rows = []
+    for path in PATHS:
+        child = [sys.executable, __file__, "--path", path, "--rows", str(args.rows), "--query", args.query]
+        if args.connection:
+            child += ["--connection", args.connection]
+        out = subprocess.run(child, check=True, capture_output=True, text=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+    print(f"{rows[0]['rows']:,} rows")
+    print(f"{'path':<15}{'memory MB':>11}{'peak RSS MB':>13}{'build s':>10}{'serialize s':>13}{'payload MB':>12}")
+    for r in rows:
+        peak = "n/a" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f}"
+        print(f"{r['path']:<15}{r['memory_mb']:>11.1f}{peak:>13}{r['build_s']:>10.2f}"
+              f"{r['serialize_s']:>13.2f}{r['payload_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
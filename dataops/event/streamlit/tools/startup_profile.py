@@ -0,0 +1,231 @@
+"""
+Import-time and first-paint profile of the Telco Streamlit apps.
+
+Cold start is what an operator sees after the app container restarts or the
+warehouse has suspended. This tool breaks it down for each app:
+
+* imports: each top-level import statement of ``app.py`` timed in a fresh
+  interpreter, plus self time per package from ``python -X importtime``.
+* first paint: a fresh process runs one session of the app with ``AppTest``
+  against the stubbed backends. It records when the first element, the first
+  data element (metric, table or chart) and the end of the script reached the
+  browser, and the warehouse and stage calls and waits on the way. The
+  warehouse starts suspended: the first query resumes it and every query
+  waits until it has resumed (``--resume-latency``). A second session in the
+  same process shows the warm rerun for comparison.
+
+Example:
+
+    python startup_profile.py --app all --sql-latency 0.3 --resume-latency 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from load_test import APPS, TOOLS_DIR, share_runtime, stage_app
+
+DATA_ELEMENTS = {"metric", "arrow_data_frame", "arrow_table", "plotly_chart", "arrow_vega_lite_chart", "json"}
+
+# Runs in a fresh interpreter with the staged app directory as its working directory.
+# The backends are bare placeholder modules, so nothing is imported on the app's behalf.
+IMPORT_PROBE = r"""
+import ast, json, sys, time, types
+sys.path.insert(0, ".")
+context = types.ModuleType("snowflake.snowpark.context")
+context.get_active_session = lambda: None
+sys.modules["_snowflake"] = types.ModuleType("_snowflake")
+sys.modules["snowflake"] = types.ModuleType("snowflake")
+sys.modules["snowflake.snowpark"] = types.ModuleType("snowflake.snowpark")
+sys.modules["snowflake.snowpark.context"] = context
+timings = []
+with open("app.py") as f:
+    tree = ast.parse(f.read())
+for node in tree.body:
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        code = compile(ast.Module(body=[node], type_ignores=[]), "app.py", "exec")
+        started = time.perf_counter()
+        exec(code, {})
+        timings.append((ast.unparse(node).split("\n")[0], (time.perf_counter() - started) * 1000))
+print(json.dumps(timings))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(app, top=8):
+    """Import statements of the app by cost, and self import time per package"""
+    workdir = tempfile.mkdtemp(prefix=f"{app}_imports_")
+    try:
+        stage_app(app, workdir)
+        done = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_PROBE],
+                              cwd=workdir, capture_output=True, text=True, check=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    statements = [{"statement": s, "ms": ms} for s, ms in json.loads(done.stdout.strip().splitlines()[-1])]
+    packages = defaultdict(float)
+    for self_us, _, _, module in _IMPORTTIME.findall(done.stderr):
+        packages[module.split(".")[0]] += int(self_us) / 1000
+    return {
+        "total_ms": sum(s["ms"] for s in statements),
+        "statements": sorted(statements, key=lambda s: -s["ms"])[:top],
+        "packages": sorted(({"package": p, "ms": ms} for p, ms in packages.items()), key=lambda p: -p["ms"])[:top],
+    }
+
+
+def cold_warehouse(stubs, base, jitter, resume_s):
+    """Query latency of a suspended warehouse that resumes on its first query"""
+
+    class ColdWarehouse(stubs.Latency):
+        def __init__(self):
+            super().__init__(base, jitter)
+            self.ready_at = None
+            self._lock = threading.Lock()
+
+        def wait(self):
+            with self._lock:
+                now = time.monotonic()
+                if self.ready_at is None:
+                    self.ready_at = now + resume_s
+                resuming = max(0.0, self.ready_at - now)
+            if resuming:
+                time.sleep(resuming)
+            return resuming + super().wait()
+
+    return ColdWarehouse()
+
+
+def _session(app_path, backend, timeline, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    calls, waited = dict(backend.calls), dict(backend.wait_seconds)
+    timeline.clear()
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    started = time.perf_counter()
+    at.run()
+    ended = time.perf_counter() - started
+    data = [t for t, kind in timeline if kind in DATA_ELEMENTS]
+    return {
+        "first_element_s": timeline[0][0] - started if timeline else None,
+        "first_data_s": data[0] - started if data else None,
+        "script_s": ended,
+        "elements": len(timeline),
+        "sql_calls": backend.calls["sql"] - calls["sql"],
+        "sql_wait_s": backend.wait_seconds["sql"] - waited["sql"],
+        "stage_wait_s": backend.wait_seconds["stage"] - waited["stage"],
+        "exceptions": [e.value for e in at.exception],
+    }
+
+
+def paint_profile(app, latency_config, resume_s, timeout):
+    """Cold and warm first session of an app in the current (fresh) process"""
+    sys.path.insert(0, str(TOOLS_DIR))
+    import stubs
+
+    backend = stubs.install(stubs.StubBackend(
+        agent_latency=stubs.Latency(*latency_config["agent"]),
+        sql_latency=cold_warehouse(stubs, *latency_config["sql"], resume_s),
+        complete_latency=stubs.Latency(*latency_config["complete"]),
+        stage_latency=stubs.Latency(*latency_config["stage"]),
+    ))
+    workdir = tempfile.mkdtemp(prefix=f"{app}_paint_")
+    app_path = stage_app(app, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    share_runtime()
+
+    from streamlit.delta_generator import DeltaGenerator
+
+    timeline = []
+    enqueue = DeltaGenerator._enqueue
+
+    def recording_enqueue(self, delta_type, *args, **kwargs):
+        timeline.append((time.perf_counter(), delta_type))
+        return enqueue(self, delta_type, *args, **kwargs)
+
+    DeltaGenerator._enqueue = recording_enqueue
+    try:
+        return {"cold": _session(app_path, backend, timeline, timeout),
+                "warm": _session(app_path, backend, timeline, timeout)}
+    finally:
+        DeltaGenerator._enqueue = enqueue
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _seconds(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def format_report(rows):
+    header = (f"{'app':<26}{'session':>8}{'imports s':>10}{'first el s':>11}{'first data s':>13}"
+              f"{'script s':>9}{'sql calls':>10}{'sql wait s':>11}{'stage wait s':>13}")
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        for name in ("cold", "warm"):
+            s = r[name]
+            imports = _seconds(r["imports"]["total_ms"] / 1000) if name == "cold" else ""
+            lines.append(f"{r['app'] if name == 'cold' else '':<26}{name:>8}{imports:>10}"
+                         f"{_seconds(s['first_element_s']):>11}{_seconds(s['first_data_s']):>13}"
+                         f"{_seconds(s['script_s']):>9}{s['sql_calls']:>10}{_seconds(s['sql_wait_s']):>11}"
+                         f"{_seconds(s['stage_wait_s']):>13}")
+    for r in rows:
+        lines.append("")
+        lines.append(f"{r['app']} imports")
+        for s in r["imports"]["statements"]:
+            lines.append(f"  {s['ms']:>8.1f} ms  {s['statement']}")
+        lines.append("  self time by package: " + ", ".join(f"{p['package']} {p['ms']:.0f} ms"
+                                                             for p in r["imports"]["packages"]))
+        for name in ("cold", "warm"):
+            if r[name]["exceptions"]:
+                lines.append(f"  {name} session exceptions: {r[name]['exceptions']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=APPS + ["all"], default="all")
+    parser.add_argument("--sql-latency", type=float, default=0.3, help="warehouse query base latency (s)")
+    parser.add_argument("--resume-latency", type=float, default=5.0,
+                        help="seconds the suspended warehouse takes to resume on its first query")
+    parser.add_argument("--stage-latency", type=float, default=0.5, help="stage file read latency (s)")
+    parser.add_argument("--agent-latency", type=float, default=2.0, help="agent API base latency (s)")
+    parser.add_argument("--complete-latency", type=float, default=1.0, help="Cortex Complete base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.25, help="fraction of base latency added as jitter")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest run timeout (s)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    latency_config = {
+        "agent": (args.agent_latency, args.agent_latency * args.jitter),
+        "sql": (args.sql_latency, args.sql_latency * args.jitter),
+        "complete": (args.complete_latency, args.complete_latency * args.jitter),
+        "stage": (args.stage_latency, args.stage_latency * args.jitter),
+    }
+    apps = APPS if args.app == "all" else [args.app]
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for app in apps:
+        row = {"app": app, "imports": import_profile(app)}
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            row.update(pool.submit(paint_profile, app, latency_config, args.resume_latency, args.timeout).result())
+        rows.append(row)
+        print(f"profiled {app}", flush=True)
+
+    print()
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Stand-ins for the Snowflake backends the Streamlit apps talk to.
+
+The apps import ``_snowflake`` (agent REST calls) and
+``snowflake.snowpark.context.get_active_session`` (SQL and stage files). Outside of
+Streamlit-in-Snowflake neither exists, so the offline tools install these
+fakes into ``sys.modules`` before running an app script. Every backend call
+sleeps for a configurable latency so the tools see realistic waits.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+import uuid
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+Row = namedtuple("Row", ["RESPONSE"])
+
+# Stage files the apps read, such as the semantic model, by file name
+STAGE_FILES_DIR = Path(__file__).resolve().parents[2] / "analyst"
+
+CANNED_SQL = (
+    "SELECT region, AVG(latency_ms) AS avg_latency FROM network_performance "
+    "GROUP BY region ORDER BY avg_latency"
+)
+CANNED_CHART = "st.bar_chart(analysis_results, y='AVG_LATENCY', color='#29B5E8')"
+
+REGIONS = ["Northeast", "West_Coast", "Midwest", "Southeast", "Southwest", "Mountain"]
+PLANS = ["Premium_5G", "Standard", "Family_Plan", "Business_Pro", "IoT_Basic"]
+DEVICES = ["iPhone_15", "Samsung_S24", "Pixel_8", "IoT_Sensor", "Hotspot"]
+
+
+class Latency:
+    """Latency model for one backend: a base wait plus uniform jitter, in seconds"""
+
+    def __init__(self, base=0.0, jitter=0.0):
+        self.base = base
+        self.jitter = jitter
+
+    def wait(self):
+        delay = self.base + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def _status_frame():
+    return pd.DataFrame([{
+        "AVG_UPTIME": 99.81, "AVG_LATENCY": 14.2,
+        "ACTIVE_TOWERS": 412, "LAST_UPDATE": pd.Timestamp.now(),
+    }])
+
+
+def _incidents_frame():
+    now = pd.Timestamp.now().floor("h")
+    return pd.DataFrame({
+        "INCIDENT_ID": ["INC_001", "INC_002"],
+        "INCIDENT_TYPE": ["FIBER_CUT", "POWER_OUTAGE"],
+        "SEVERITY_LEVEL": ["CRITICAL", "CRITICAL"],
+        "AFFECTED_REGION": ["Northeast", "Midwest"],
+        "INCIDENT_START_TIME": [now - pd.Timedelta(hours=6), now - pd.Timedelta(hours=2)],
+        "INCIDENT_END_TIME": [now - pd.Timedelta(hours=5), pd.NaT],
+        "CUSTOMERS_AFFECTED": [15000, 4200],
+    })
+
+
+def _alert_state_frame():
+    return pd.DataFrame([{"VERSION": 1, "UPDATED_AT": pd.Timestamp.now()}])
+
+
+def _markers_frame():
+    tables = ["NETWORK_PERFORMANCE", "CUSTOMER_USAGE", "SERVICE_QUALITY_METRICS",
+              "NETWORK_INCIDENTS", "NETWORK_DOCUMENTATION", "ACTIVE_ALERTS", "CUSTOMER_CHURN_SCORES",
+              "ACTIVE_ALERTS_STREAM"]
+    dynamic = [f"{source}_ROLLUP_{suffix}" for source in ["NETWORK_PERFORMANCE", "SERVICE_QUALITY_METRICS"]
+               for suffix in ["1M", "15M", "1H", "1D"]] + ["INCIDENT_KPI_IMPACT"]
+    # Rows arrive continuously, so the big tables change between polls; the dynamic tables
+    # catch up on their own refresh schedule
+    minute = pd.Timestamp.now().floor("min")
+    return pd.DataFrame({
+        "TABLE_NAME": tables + dynamic,
+        "MARKER": [str(minute.value)] * 3 + [str(minute.floor("h").value)] * 4 + ["1"]
+                  + [str(minute.floor("15min").value)] * len(dynamic),
+    })
+
+
+def _query_history_frame(runs=40):
+    texts = [
+        "SELECT region, AVG(latency_ms) AS avg_latency FROM network_performance "
+        "WHERE measurement_timestamp >= DATEADD(day, -7, CURRENT_TIMESTAMP()) GROUP BY region",
+        "SELECT service_plan, COUNT(DISTINCT customer_id) AS customer_count FROM customer_usage "
+        "WHERE usage_date >= DATEADD(month, -1, CURRENT_DATE()) GROUP BY service_plan",
+        "SELECT * FROM customer_usage WHERE customer_id = 'CUST_1001234'",
+        "SELECT cell_tower_id, MAX(packet_loss_percent) FROM network_performance "
+        "WHERE network_type = '5G' GROUP BY cell_tower_id",
+    ]
+    picks = [random.randrange(len(texts)) for _ in range(runs)]
+    return pd.DataFrame({
+        "QUERY_ID": [f"q{i}" for i in range(runs)],
+        "QUERY_TEXT": [texts[p] for p in picks],
+        "QUERY_TAG": [random.choice(["telco_network_ops", "telco_customer_analytics", "cortex_chat"]) for _ in picks],
+        "WAREHOUSE_SIZE": "X-Small",
+        "TOTAL_ELAPSED_TIME": [random.randint(200, 4000) for _ in picks],
+        "BYTES_SCANNED": [random.randint(10 ** 6, 10 ** 8) for _ in picks],
+        "PARTITIONS_SCANNED": [random.randint(20, 64) for _ in picks],
+        "PARTITIONS_TOTAL": 64,
+        "START_TIME": pd.Timestamp.now(),
+    })
+
+
+def _overview_frame():
+    return pd.DataFrame([{
+        "TOTAL_CUSTOMERS": 1250, "AVG_MONTHLY_BILL": 78.4,
+        "TOTAL_DATA_USAGE": 18250.5, "ACTIVE_PLANS": len(PLANS),
+    }])
+
+
+def _plans_frame():
+    return pd.DataFrame({
+        "SERVICE_PLAN": PLANS,
+        "CUSTOMER_COUNT": [420, 380, 210, 150, 90],
+        "AVG_BILL": [119.9, 65.0, 145.5, 189.0, 15.0],
+    })
+
+
+def _trends_frame():
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=30)
+    return pd.DataFrame({
+        "USAGE_DATE": dates,
+        "AVG_DAILY_USAGE": [1.5 + 0.02 * i for i in range(30)],
+        "ACTIVE_CUSTOMERS": [900 + i for i in range(30)],
+    })
+
+
+def _segments_frame():
+    return pd.DataFrame({
+        "SEGMENT": ["Premium", "Standard", "Basic"],
+        "CUSTOMER_COUNT": [300, 600, 350],
+        "AVG_DATA_USAGE": [45.0, 18.0, 4.5],
+        "AVG_BILL": [130.0, 75.0, 35.0],
+    })
+
+
+def _devices_frame():
+    return pd.DataFrame({
+        "DEVICE_TYPE": DEVICES,
+        "USERS": [400, 350, 200, 180, 120],
+        "AVG_DATA_USAGE": [22.0, 20.5, 18.0, 0.4, 60.0],
+        "AVG_VOICE_MINUTES": [450, 420, 380, 0, 0],
+    })
+
+
+def _cube_frame():
+    hours = pd.date_range(end=pd.Timestamp.now().floor("h"), periods=48, freq="h")
+    towers = [f"TOWER_{region.upper()}_{i:03d}" for region in REGIONS for i in range(5)]
+    rows = []
+    for t, tower in enumerate(towers):
+        for h, hour in enumerate(hours):
+            latency = 10.0 + t % 7 + (h % 24) * 0.2
+            rows.append({
+                "REGION": REGIONS[t // 5], "NETWORK_TYPE": "5G" if t % 2 else "4G_LTE",
+                "CELL_TOWER_ID": tower, "HOUR_BUCKET": hour,
+                **{f"{m}_{k}": v for m, base in [("LATENCY_MS", latency), ("THROUGHPUT_MBPS", 800.0),
+                                                 ("PACKET_LOSS_PERCENT", 0.1), ("UPTIME_PERCENT", 99.9)]
+                   for k, v in [("N", 4), ("SUM", base * 4), ("SUMSQ", base * base * 4), ("MIN", base), ("MAX", base)]},
+            })
+    return pd.DataFrame(rows)
+
+
+def _rollup_frame():
+    buckets = pd.date_range(end=pd.Timestamp.now().floor("h"), periods=200, freq="4h")
+    return pd.DataFrame({
+        "BUCKET_START": buckets,
+        "SAMPLES": [60] * len(buckets),
+        "AVG_VALUE": [14.0 + (i % 24) * 0.3 for i in range(len(buckets))],
+        "MIN_VALUE": [6.0] * len(buckets),
+        "MAX_VALUE": [40.0 + (i % 7) for i in range(len(buckets))],
+        "STDDEV_VALUE": [3.5] * len(buckets),
+        "P50_VALUE": [13.0] * len(buckets),
+        "P95_VALUE": [24.0] * len(buckets),
+    })
+
+
+def _measurements_frame():
+    times = pd.date_range(end=pd.Timestamp.now().floor("min"), periods=30, freq="min")
+    towers = [f"TOWER_{region.upper()}_{i:03d}" for region in REGIONS for i in range(5)]
+    rows = []
+    for m, ts in enumerate(times):
+        for t, tower in enumerate(towers):
+            # One tower's latency spikes in the last minute
+            spike = m == len(times) - 1 and t == 7
+            rows.append({
+                "CELL_TOWER_ID": tower, "REGION": REGIONS[t // 5], "NETWORK_TYPE": "5G" if t % 2 else "4G_LTE",
+                "MEASUREMENT_TIMESTAMP": ts, "LATENCY_MS": 80.0 if spike else 12.0 + (m + t) % 3,
+                "PACKET_LOSS_PERCENT": 0.1 + (m % 2) * 0.02, "THROUGHPUT_MBPS": 800.0 + (m % 5) * 10,
+                "UPTIME_PERCENT": 99.9 - (m % 3) * 0.01,
+            })
+    return pd.DataFrame(rows)
+
+
+def _region_series_frame():
+    buckets = pd.date_range(end=pd.Timestamp.now().floor("15min"), periods=4 * 72, freq="15min")
+    rows = []
+    for region in REGIONS:
+        for b, bucket in enumerate(buckets):
+            # Northeast latency degrades during the stub fiber cut
+            latency = 40.0 if region == "Northeast" and 20 <= len(buckets) - b <= 24 else 12.0 + (b % 4) * 0.5
+            rows.append({
+                "BUCKET_START": bucket, "REGION": region,
+                **{f"{m}_{k}": v for m, base in [("LATENCY_MS", latency), ("PACKET_LOSS_PERCENT", 0.1 + (b % 3) * 0.01),
+                                                 ("THROUGHPUT_MBPS", 800.0 + (b % 5) * 5), ("UPTIME_PERCENT", 99.9 - (b % 2) * 0.01)]
+                   for k, v in [("N", 4), ("SUM", base * 4)]},
+            })
+    return pd.DataFrame(rows)
+
+
+def _document_frame():
+    return pd.DataFrame({"CONTENT": ["Stub documentation content."]})
+
+
+def _conversation_frame():
+    return pd.DataFrame({"TURN": pd.Series(dtype="int64"), "QUESTION": pd.Series(dtype="object"),
+                         "ANSWER": pd.Series(dtype="object"), "MINE": pd.Series(dtype="bool")})
+
+
+def _usage_report_frame(hours=24):
+    users = ["ANALYST_1", "ANALYST_2", "OPS_LEAD"]
+    rows = [(app, user, pd.Timestamp.now().floor("h") - pd.Timedelta(hours=h))
+            for app in ["telco_network_ops", "telco_customer_analytics", "cortex_chat"] for user in users
+            for h in range(hours)]
+    return pd.DataFrame({
+        "APP": [r[0] for r in rows],
+        "USER_NAME": [r[1] for r in rows],
+        "HOUR": [r[2] for r in rows],
+        "CALLS": [random.randint(0, 20) for _ in rows],
+        "TOKENS_IN": [random.randint(0, 60000) for _ in rows],
+        "TOKENS_OUT": [random.randint(0, 4000) for _ in rows],
+        "QUERIES": [random.randint(0, 50) for _ in rows],
+        "GB_SCANNED": [random.random() for _ in rows],
+        "CREDITS": [random.random() / 10 for _ in rows],
+    })
+
+
+def _presigned_url_frame():
+    return pd.DataFrame({"URL": ["https://stub.invalid/result_exports/result"]})
+
+
+def _latency_by_region_frame():
+    return pd.DataFrame({
+        "REGION": REGIONS,
+        "AVG_LATENCY": [9.5, 10.8, 18.7, 12.1, 13.5, 22.8],
+    })
+
+
+# First matching pattern wins; the last entry is the catch-all for agent SQL.
+FRAMES = [
+    (r"avg_uptime", _status_frame),
+    (r"from\s+(network_incidents|active_alerts)", _incidents_frame),
+    (r"system\$last_change_commit_time", _markers_frame),
+    (r"information_schema\.query_history", _query_history_frame),
+    (r"from\s+alert_feed_state", _alert_state_frame),
+    (r"conversation_history", _conversation_frame),
+    (r"from\s+usage_by_user_hour", _usage_report_frame),
+    (r"get_presigned_url", _presigned_url_frame),
+    (r"total_customers", _overview_frame),
+    (r"group\s+by\s+service_plan", _plans_frame),
+    (r"group\s+by\s+usage_date", _trends_frame),
+    (r"group\s+by\s+segment", _segments_frame),
+    (r"group\s+by\s+device_type", _devices_frame),
+    (r"hour_bucket", _cube_frame),
+    (r"\w+_n\) as \w+_n", _region_series_frame),
+    (r"_rollup_", _rollup_frame),
+    (r"measurement_timestamp\s*>\s*\?", _measurements_frame),
+    (r"document_id\s*=", _document_frame),
+    (r".", _latency_by_region_frame),
+]
+
+
+def frame_for(query):
+    """Pick the canned result frame for a SQL statement"""
+    for pattern, factory in FRAMES:
+        if re.search(pattern, query, re.IGNORECASE):
+            return factory()
+
+
+class FakeDataFrame:
+    """Lazy Snowpark DataFrame stand-in; the SQL latency is paid on materialization"""
+
+    def __init__(self, backend, query, params=None):
+        self._backend = backend
+        self._query = query
+        self._params = params
+
+    def to_pandas(self):
+        self._backend.record("sql", self._backend.sql_latency.wait())
+        return frame_for(self._query)
+
+    def to_arrow(self):
+        return pa.Table.from_pandas(self.to_pandas(), preserve_index=False)
+
+    def collect(self):
+        if "cortex.complete" in self._query.lower():
+            self._backend.record("complete", self._backend.complete_latency.wait())
+            if "object_construct()" not in self._query.lower():
+                return [Row(RESPONSE=CANNED_CHART)]
+            # With an options argument Complete answers in JSON, with token usage
+            prompt_tokens = len(str(self._params[-1] if self._params else "")) // 4
+            return [Row(RESPONSE=json.dumps({
+                "choices": [{"messages": CANNED_CHART}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20,
+                          "total_tokens": prompt_tokens + 20},
+            }))]
+        return [tuple(r) for r in self.to_pandas().itertuples(index=False)]
+
+    def collect_nowait(self):
+        job = FakeAsyncJob(self)
+        self._backend.jobs[job.query_id] = self
+        return job
+
+
+class FakeAsyncJob:
+    """Snowpark AsyncJob stand-in; the query runs when its result is fetched"""
+
+    def __init__(self, df):
+        self._df = df
+        self.query_id = str(uuid.uuid4())
+
+    def result(self, result_type="row"):
+        return self._df.to_pandas() if result_type == "pandas" else self._df.collect()
+
+
+class FakeCursor:
+    """Connector cursor stand-in that reads the result of an earlier async query"""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._df = None
+
+    def get_results_from_sfqid(self, query_id):
+        self._df = self._backend.jobs.pop(query_id)
+
+    def fetch_arrow_all(self):
+        table = self._df.to_arrow()
+        return table if table.num_rows else None
+
+    def close(self):
+        self._df = None
+
+
+class FakeConnection:
+    """``session.connection`` stand-in"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def cursor(self):
+        return FakeCursor(self._backend)
+
+
+class FakeFileOperation:
+    """``session.file`` stand-in serving stage files from the repository"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get_stream(self, stage_location, **kwargs):
+        self._backend.record("stage", self._backend.stage_latency.wait())
+        return open(STAGE_FILES_DIR / stage_location.rsplit("/", 1)[-1], "rb")
+
+
+class FakeSession:
+    """Snowpark Session stand-in returned by the patched ``get_active_session``"""
+
+    query_tag = None
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.file = FakeFileOperation(backend)
+        self.connection = FakeConnection(backend)
+
+    def get_current_warehouse(self):
+        return '"EVENT_WH"'
+
+    def sql(self, query, params=None):
+        return FakeDataFrame(self._backend, query, params)
+
+
+class StubBackend:
+    """Holds the latency models and counts calls made against each backend"""
+
+    def __init__(self, agent_latency=None, sql_latency=None, complete_latency=None, stage_latency=None):
+        self.agent_latency = agent_latency or Latency()
+        self.sql_latency = sql_latency or Latency()
+        self.complete_latency = complete_latency or Latency()
+        self.stage_latency = stage_latency or Latency()
+        self.calls = {"agent": 0, "sql": 0, "complete": 0, "stage": 0}
+        self.jobs = {}  # query ID -> FakeDataFrame of queries started with collect_nowait
+        self.wait_seconds = {"agent": 0.0, "sql": 0.0, "complete": 0.0, "stage": 0.0}
+        self._lock = threading.Lock()
+
+    def record(self, kind, waited):
+        with self._lock:
+            self.calls[kind] += 1
+            self.wait_seconds[kind] += waited
+
+    def send_snow_api_request(self, method, path, headers, params, body, request_guid, timeout):
+        self.record("agent", self.agent_latency.wait())
+        question = body["messages"][-1]["content"][0]["text"]
+        events = [{
+            "event": "message.delta",
+            "data": {"delta": {"content": [
+                {"type": "text", "text": f"Here is what I found for: {question}"},
+                {"type": "tool_results", "tool_results": {"content": [
+                    {"type": "json", "json": {"text": "", "sql": CANNED_SQL, "searchResults": []}},
+                ]}},
+            ]}},
+        }]
+        return {"status": 200, "content": json.dumps(events)}
+
+
+def install(backend):
+    """Register the fake ``_snowflake`` and Snowpark modules in ``sys.modules``"""
+    snowflake_api = types.ModuleType("_snowflake")
+    snowflake_api.send_snow_api_request = backend.send_snow_api_request
+
+    session = FakeSession(backend)
+    context = types.ModuleType("snowflake.snowpark.context")
+    context.get_active_session = lambda: session
+
+    snowflake_pkg = sys.modules.get("snowflake") or types.ModuleType("snowflake")
+    snowpark_pkg = sys.modules.get("snowflake.snowpark") or types.ModuleType("snowflake.snowpark")
+    snowflake_pkg.snowpark = snowpark_pkg
+    snowpark_pkg.context = context
+
+    sys.modules["_snowflake"] = snowflake_api
+    sys.modules.setdefault("snowflake", snowflake_pkg)
+    sys.modules.setdefault("snowflake.snowpark", snowpark_pkg)
+    sys.modules["snowflake.snowpark.context"] = context
+    return backend